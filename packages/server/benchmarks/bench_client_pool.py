@@ -0,0 +1,114 @@
+"""Compare per-request genai.Client construction with the pooled client.
+
+Runs against a local stand-in for the generateContent endpoint, so no
+credentials or network access are needed:
+
+    python benchmarks/bench_client_pool.py --requests 200
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import pathlib
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from google import genai  # noqa: E402
+
+from image_agent.client_pool import GenaiClientPool  # noqa: E402
+
+MODEL = "bench-image-model"
+RESPONSE_BODY = json.dumps(
+    {
+        "candidates": [
+            {
+                "content": {
+                    "role": "model",
+                    "parts": [{"inlineData": {"mimeType": "image/png", "data": base64.b64encode(b"\x89PNG" * 256).decode()}}],
+                }
+            }
+        ]
+    }
+).encode("utf-8")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:  # noqa: N802
+        self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE_BODY)))
+        self.end_headers()
+        self.wfile.write(RESPONSE_BODY)
+
+    def log_message(self, *_args) -> None:
+        return None
+
+
+def _client_factory(base_url: str):
+    def factory(_project: str, _location: str) -> genai.Client:
+        return genai.Client(api_key="bench", http_options={"base_url": base_url})
+
+    return factory
+
+
+async def _per_request(factory, requests: int) -> list[float]:
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        client = factory("bench", "local")
+        await client.aio.models.generate_content(model=MODEL, contents="wolf")
+        samples.append(time.perf_counter() - started)
+        await client.aio.aclose()
+    return samples
+
+
+async def _pooled(factory, requests: int) -> list[float]:
+    pool = GenaiClientPool(factory=factory)
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        client = await pool.get("bench", "local")
+        await client.aio.models.generate_content(model=MODEL, contents="wolf")
+        samples.append(time.perf_counter() - started)
+    await pool.aclose()
+    return samples
+
+
+def _report(label: str, samples: list[float]) -> None:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2] * 1000
+    p95 = ordered[int(len(ordered) * 0.95) - 1] * 1000
+    print(f"{label:<12} mean={statistics.fmean(samples) * 1000:7.3f}ms p50={p50:7.3f}ms p95={p95:7.3f}ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    factory = _client_factory(f"http://127.0.0.1:{server.server_address[1]}")
+    try:
+        await _pooled(factory, 5)
+        _report("per-request", await _per_request(factory, args.requests))
+        _report("pooled", await _pooled(factory, args.requests))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
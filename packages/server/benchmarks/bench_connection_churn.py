@@ -0,0 +1,112 @@
+"""Measure voice connection setup cost with per-connection vs shared runners.
+
+Each simulated connection runs the real handle_voice_session path against a
+client that disconnects straight away and a fake runner that streams nothing,
+so only setup and teardown are timed. The runner itself is still built through
+create_runner, which is a real ADK Runner when google-adk is installed:
+
+    python benchmarks/bench_connection_churn.py --connections 5000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import pathlib
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+import main  # noqa: E402
+from voice.live import LiveRuntime  # noqa: E402
+
+
+class ChurnRunner:
+    def __init__(self, wrapped: Any) -> None:
+        # Keep the constructed runner alive for the connection, as the websocket handler would.
+        self.wrapped = wrapped
+
+    async def run_live(self, **_kwargs):
+        if False:
+            yield {}
+
+
+class ChurnWebSocket:
+    scope: dict[str, Any] = {}
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        return None
+
+    async def receive(self) -> dict[str, Any]:
+        return {"type": "websocket.disconnect"}
+
+    async def send_text(self, _text: str) -> None:
+        return None
+
+    async def send_bytes(self, _data: bytes) -> None:
+        return None
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        return None
+
+
+def _runtime() -> LiveRuntime:
+    return LiveRuntime(lambda: ChurnRunner(main.create_runner(main.SESSION_SERVICE)), main.build_runtime_run_config)
+
+
+async def _connect(runtime: LiveRuntime, index: int) -> float:
+    started = time.perf_counter()
+    with patch.object(main, "VOICE_RUNTIME", runtime):
+        await main.handle_voice_session(
+            websocket=ChurnWebSocket(),
+            user_id=f"churn-{index % 64}",
+            session_id="churn",
+            session_service=main.SESSION_SERVICE,
+            runner=runtime.runner,
+            live_request_queue=main.create_live_request_queue(),
+        )
+    return time.perf_counter() - started
+
+
+async def churn(name: str, connections: int, shared: bool) -> None:
+    runtime = _runtime()
+    await _connect(runtime, 0)
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    latencies = []
+    for index in range(connections):
+        latencies.append(await _connect(runtime if shared else _runtime(), index))
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{name:<15} p50={statistics.median(latencies) * 1e6:7.1f}us  p99={p99 * 1e6:7.1f}us  "
+        f"retained={(after - before) / 1024:7.1f}KiB  peak={(peak - before) / 1024:7.1f}KiB"
+    )
+
+
+async def run(connections: int) -> None:
+    print(f"{connections} connects/disconnects, adk={main.ADK_AVAILABLE}")
+    await churn("per-connection", connections, shared=False)
+    await churn("shared", connections, shared=True)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.connections))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,188 @@
+"""Compare the old dump/normalise/send_json path with the single-pass event encoder.
+
+The binary row lifts audio into binary websocket frames, as negotiated by the
+ego.audio-frames.v1 subprotocol, and also reports bytes on the wire.
+
+Events mirror what ADK streams during a live turn: an audio chunk in
+inline data plus transcription and usage metadata. No credentials are needed:
+
+    python benchmarks/bench_event_encoder.py --events 2000 --audio-ms 40
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import pathlib
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Optional
+
+from pydantic import BaseModel, ConfigDict
+from pydantic.alias_generators import to_camel
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from voice.events import encode_adk_event  # noqa: E402
+from voice.frames import AudioFrameWriter  # noqa: E402
+
+OUTPUT_SAMPLE_RATE = 24000
+
+
+class _Model(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+
+class Blob(_Model):
+    mime_type: Optional[str] = None
+    data: Optional[bytes] = None
+
+
+class Part(_Model):
+    text: Optional[str] = None
+    inline_data: Optional[Blob] = None
+
+
+class Content(_Model):
+    role: Optional[str] = None
+    parts: Optional[list[Part]] = None
+
+
+class Transcription(_Model):
+    text: Optional[str] = None
+    finished: Optional[bool] = None
+
+
+class UsageMetadata(_Model):
+    prompt_token_count: Optional[int] = None
+    candidates_token_count: Optional[int] = None
+    total_token_count: Optional[int] = None
+
+
+class Event(_Model):
+    id: str
+    invocation_id: str
+    author: str
+    timestamp: float
+    content: Optional[Content] = None
+    output_transcription: Optional[Transcription] = None
+    usage_metadata: Optional[UsageMetadata] = None
+    partial: Optional[bool] = None
+    turn_complete: Optional[bool] = None
+    interrupted: Optional[bool] = None
+    error_code: Optional[str] = None
+
+
+def _make_json_safe(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("utf-8")
+    if isinstance(value, bytearray):
+        return base64.b64encode(bytes(value)).decode("utf-8")
+    if isinstance(value, memoryview):
+        return base64.b64encode(value.tobytes()).decode("utf-8")
+    if isinstance(value, dict):
+        return {str(key): _make_json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_make_json_safe(item) for item in value]
+    return value
+
+
+def legacy_frame(event: Any) -> str:
+    # The pre-encoder path: model_dump, a second walk for bytes, then send_json's json.dumps.
+    normalized = _make_json_safe(event.model_dump(by_alias=True, exclude_none=True))
+    payload: dict[str, Any] = {"type": "adkEvent", "payload": normalized}
+    if "turnComplete" in normalized:
+        payload["turnComplete"] = bool(normalized["turnComplete"])
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def encoded_frame(event: Any) -> str:
+    return encode_adk_event(event).frame
+
+
+def binary_frames(writer: AudioFrameWriter) -> Callable[[Any], list[Any]]:
+    def encode(event: Any) -> list[Any]:
+        encoded = encode_adk_event(event, binary_audio=True)
+        return [writer.frame(mime_type, data) for mime_type, data in encoded.audio] + [encoded.frame]
+
+    return encode
+
+
+def wire_bytes(frames: Any) -> int:
+    frames = frames if isinstance(frames, list) else [frames]
+    return sum(len(frame.encode("utf-8")) if isinstance(frame, str) else len(frame) for frame in frames)
+
+
+def make_events(count: int, audio_ms: int) -> list[Event]:
+    chunk = bytes(range(256)) * (OUTPUT_SAMPLE_RATE * 2 * audio_ms // 1000 // 256 + 1)
+    chunk = chunk[: OUTPUT_SAMPLE_RATE * 2 * audio_ms // 1000]
+    events = []
+    for index in range(count):
+        events.append(
+            Event(
+                id=f"evt-{index}",
+                invocation_id="e-bench",
+                author="ego_world_agent",
+                timestamp=1_700_000_000.0 + index,
+                content=Content(role="model", parts=[Part(inline_data=Blob(mime_type="audio/pcm;rate=24000", data=chunk))]),
+                output_transcription=Transcription(text="世界をネオンにしました", finished=False),
+                usage_metadata=UsageMetadata(prompt_token_count=812, candidates_token_count=64, total_token_count=876),
+                partial=True,
+            )
+        )
+    return events
+
+
+def measure(name: str, encode: Callable[[Any], Any], events: list[Event]) -> tuple[float, float]:
+    for event in events[:50]:
+        encode(event)
+
+    started = time.process_time()
+    for event in events:
+        encode(event)
+    cpu_us = (time.process_time() - started) / len(events) * 1e6
+
+    tracemalloc.start()
+    total = 0
+    for event in events[:200]:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        encode(event)
+        _, event_peak = tracemalloc.get_traced_memory()
+        total += event_peak - before
+    tracemalloc.stop()
+    per_event_kib = total / min(200, len(events)) / 1024
+
+    wire_kib = wire_bytes(encode(events[0])) / 1024
+    print(f"{name:<8} cpu/event={cpu_us:8.1f}us  peak alloc/event={per_event_kib:8.1f}KiB  wire={wire_kib:7.1f}KiB")
+    return cpu_us, per_event_kib
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--audio-ms", type=int, default=40, help="audio carried per event")
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.audio_ms)
+    if json.loads(legacy_frame(events[0])) != json.loads(encoded_frame(events[0])):
+        raise SystemExit("encoder output differs from the legacy path")
+
+    legacy_cpu, legacy_alloc = measure("legacy", legacy_frame, events)
+    encoded_cpu, encoded_alloc = measure("encoder", encoded_frame, events)
+    binary = binary_frames(AudioFrameWriter())
+    binary_cpu, binary_alloc = measure("binary", binary, events)
+    print(f"cpu reduction:   encoder {1 - encoded_cpu / legacy_cpu:6.1%}  binary {1 - binary_cpu / legacy_cpu:6.1%}")
+    print(
+        f"alloc reduction: encoder {1 - encoded_alloc / legacy_alloc:6.1%}  "
+        f"binary {1 - binary_alloc / legacy_alloc:6.1%}"
+    )
+    legacy_wire = wire_bytes(legacy_frame(events[0]))
+    print(f"wire reduction:  binary {1 - wire_bytes(binary(events[0])) / legacy_wire:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Drive generate_image at a target request rate against the local image backend.
+
+Requests arrive open-loop (a fixed schedule, not waiting for replies), so
+queueing and admission rejections show up the way they would under real load:
+
+    python benchmarks/bench_generate_image.py --rate 50 --duration 10 --distinct 200 \
+        --latency lognormal:1.5,0.35 --error-rate 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import logging
+import os
+import pathlib
+import sys
+import time
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+
+def _percentile(samples: list[float], percentile: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percentile / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _drive(args: argparse.Namespace) -> None:
+    import main
+    from fastapi import HTTPException
+
+    latencies: list[float] = []
+    outcomes: collections.Counter[str] = collections.Counter()
+
+    async def one(index: int) -> None:
+        request = main.GenerateImageRequest(entity_type=f"creature-{index % args.distinct}")
+        started = time.perf_counter()
+        try:
+            await main.generate_image(request)
+            outcomes["200"] += 1
+        except HTTPException as exc:
+            outcomes[str(exc.status_code)] += 1
+        latencies.append(time.perf_counter() - started)
+
+    total = int(args.rate * args.duration)
+    tasks = []
+    started = time.perf_counter()
+    for index in range(total):
+        delay = started + index / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(index)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    await main.IMAGE_BACKEND.aclose()
+
+    print(f"requests:   {total} at {args.rate:g}/s over {args.duration:g}s ({args.distinct} distinct prompts)")
+    print(f"backend:    {args.latency}, error rate {args.error_rate:g}, {main.IMAGE_BACKEND.primary.calls} backend calls")
+    print(f"hedging:    {main.IMAGE_BACKEND.metrics().as_dict()}")
+    print(f"outcomes:   {dict(sorted(outcomes.items()))}")
+    print(f"throughput: {outcomes['200'] / elapsed:.1f} ok/s ({total / elapsed:.1f} req/s)")
+    for percentile in (50, 95, 99):
+        print(f"p{percentile}:        {_percentile(latencies, percentile) * 1000:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=20.0, help="requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--distinct", type=int, default=100, help="number of distinct prompts")
+    parser.add_argument("--latency", default="lognormal:1.5,0.35", help="local backend latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--size", type=int, default=256, help="sprite edge in pixels")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hedge-percentile", type=float, default=95.0, help="0 disables hedging")
+    parser.add_argument("--fallback-model", default="", help="enable the circuit breaker fallback")
+    args = parser.parse_args()
+
+    os.environ.update(
+        {
+            "IMAGE_BACKEND": "local",
+            "LOCAL_IMAGE_LATENCY": args.latency,
+            "LOCAL_IMAGE_ERROR_RATE": str(args.error_rate),
+            "LOCAL_IMAGE_SIZE": str(args.size),
+            "LOCAL_IMAGE_SEED": str(args.seed),
+            "IMAGE_HEDGE_PERCENTILE": str(args.hedge_percentile),
+            "IMAGE_FALLBACK_MODEL": args.fallback_model,
+            "SPRITE_CACHE_DIR": "",
+            "SPRITE_PREWARM": "",
+        }
+    )
+    # Injected failures are logged with tracebacks by the endpoint; keep the report readable.
+    logging.disable(logging.ERROR)
+    asyncio.run(_drive(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Measure the per-call cost of the metrics used on the voice hot path.
+
+Each operation is timed in a tight loop against an empty loop baseline, so the
+numbers are the overhead one frame pays for being counted. The per-frame path
+is one counter increment per upstream message plus one per downstream frame;
+all of them should stay well under a microsecond:
+
+    python benchmarks/bench_metrics.py
+    python benchmarks/bench_metrics.py --iterations 2000000
+"""
+from __future__ import annotations
+
+import argparse
+import pathlib
+import sys
+import time
+from typing import Callable
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from runtime.metrics import MarkTimer, MetricsRegistry  # noqa: E402
+
+BUDGET_NS = 1000.0
+
+
+def _loop_ns(operation: Callable[[], None], iterations: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(iterations):
+        operation()
+    return (time.perf_counter_ns() - started) / iterations
+
+
+def measure(name: str, operation: Callable[[], None], iterations: int, baseline_ns: float) -> float:
+    per_op = max(0.0, _loop_ns(operation, iterations) - baseline_ns)
+    status = "ok" if per_op < BUDGET_NS else "OVER BUDGET"
+    print(f"{name:<24} {per_op:7.1f}ns/op  {status}")
+    return per_op
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500_000)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_messages_total", "bench")
+    frames = registry.counter("bench_frames_total", "bench", ("type",))
+    child = frames.labels("audio")
+    histogram = registry.histogram("bench_latency_seconds", "bench")
+    timer = MarkTimer(histogram)
+
+    def noop() -> None:
+        return None
+
+    def mark_and_stop() -> None:
+        timer.mark()
+        timer.stop()
+
+    baseline_ns = _loop_ns(noop, args.iterations)
+    results = [
+        measure("counter.inc", counter.inc, args.iterations, baseline_ns),
+        measure("counter.inc(bytes)", lambda: counter.inc(640), args.iterations, baseline_ns),
+        measure("labeled child.inc", child.inc, args.iterations, baseline_ns),
+        measure("labels().inc", lambda: frames.labels("audio").inc(), args.iterations, baseline_ns),
+        measure("histogram.observe", lambda: histogram.observe(0.3), args.iterations, baseline_ns),
+        measure("timer mark+stop", mark_and_stop, args.iterations, baseline_ns),
+    ]
+    started = time.perf_counter()
+    registry.render()
+    print(f"render: {(time.perf_counter() - started) * 1e6:.1f}us for {len(registry.render().splitlines())} lines")
+    if max(results) >= BUDGET_NS:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Compare the old recursive world patch search with the schema-directed extractor.
+
+By default the corpus is a synthetic live session shaped like a recorded one:
+audio chunks, streaming transcriptions, a tool call and its response, then
+turnComplete. Pass --corpus with a JSON-lines capture of events (one
+model_dump(by_alias=True) dict per line) to replay a real recording instead:
+
+    python benchmarks/bench_world_patch.py --turns 200
+    python benchmarks/bench_world_patch.py --corpus session.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import pathlib
+import sys
+import time
+from typing import Any, Callable
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from voice.world_patch import extract_world_patch, is_world_patch  # noqa: E402
+
+AUDIO_CHUNK = base64.b64encode(bytes(range(256)) * 8).decode("ascii")
+TRANSCRIPT = "ネオンの光が街を包み込み、遠くで狼の声が響いています。" * 4
+
+
+def legacy_find(candidate: Any) -> dict[str, Any] | None:
+    # The pre-extractor search: every dict and list in the event, audio and transcripts included.
+    if isinstance(candidate, dict):
+        if is_world_patch(candidate):
+            return candidate
+        patch_value = candidate.get("patch")
+        if is_world_patch(patch_value):
+            return patch_value
+        for value in candidate.values():
+            found = legacy_find(value)
+            if found is not None:
+                return found
+        return None
+    if isinstance(candidate, list):
+        for item in candidate:
+            found = legacy_find(item)
+            if found is not None:
+                return found
+    return None
+
+
+def _base(index: int) -> dict[str, Any]:
+    # ADK's model_dump always includes actions (a default EventActions), even on audio-only events.
+    return {
+        "id": f"evt-{index}",
+        "invocationId": "e-bench",
+        "author": "ego_world_agent",
+        "timestamp": float(index),
+        "actions": {"stateDelta": {}, "artifactDelta": {}, "requestedAuthConfigs": {}, "requestedToolConfirmations": {}},
+    }
+
+
+def synthetic_corpus(turns: int, audio_events: int) -> list[dict[str, Any]]:
+    events: list[dict[str, Any]] = []
+    for turn in range(turns):
+        events.append({**_base(len(events)), "inputTranscription": {"text": "ネオンにして", "finished": True}})
+        events.append(
+            {
+                **_base(len(events)),
+                "content": {
+                    "role": "model",
+                    "parts": [{"functionCall": {"name": "apply_world_patch", "args": {"effect": "neon"}}}],
+                },
+            }
+        )
+        patch = {"effect": "neon", "color": "#00FF99", "intensity": turn % 100, "spawn": None, "caption": "ネオン"}
+        events.append(
+            {
+                **_base(len(events)),
+                "content": {
+                    "role": "user",
+                    "parts": [
+                        {
+                            "functionResponse": {
+                                "name": "apply_world_patch",
+                                "response": {"status": "applied", "patch": patch},
+                            }
+                        }
+                    ],
+                },
+            }
+        )
+        for _ in range(audio_events):
+            events.append(
+                {
+                    **_base(len(events)),
+                    "partial": True,
+                    "content": {
+                        "role": "model",
+                        "parts": [{"inlineData": {"mimeType": "audio/pcm;rate=24000", "data": AUDIO_CHUNK}}],
+                    },
+                    "outputTranscription": {"text": TRANSCRIPT, "finished": False},
+                }
+            )
+        events.append({**_base(len(events)), "turnComplete": True, "usageMetadata": {"totalTokenCount": 812}})
+    return events
+
+
+def load_corpus(path: pathlib.Path) -> list[dict[str, Any]]:
+    with path.open(encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def measure(name: str, extract: Callable[[Any], Any], events: list[dict[str, Any]], repeat: int) -> tuple[float, int]:
+    found = sum(1 for event in events if extract(event) is not None)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for event in events:
+            extract(event)
+    per_event_us = (time.perf_counter() - started) / (repeat * len(events)) * 1e6
+    print(f"{name:<10} {per_event_us:7.2f}us/event  patches={found}")
+    return per_event_us, found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=pathlib.Path, help="JSON-lines file of recorded events")
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--audio-events", type=int, default=25, help="audio events per synthetic turn")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    events = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.turns, args.audio_events)
+    print(f"corpus: {len(events)} events")
+    legacy_us, legacy_found = measure("recursive", legacy_find, events, args.repeat)
+    directed_us, directed_found = measure("directed", extract_world_patch, events, args.repeat)
+    if legacy_found != directed_found:
+        print(f"warning: extractors disagree ({legacy_found} vs {directed_found} patches)")
+    print(f"speedup: {legacy_us / directed_us:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
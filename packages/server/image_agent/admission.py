@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from runtime.env import env_float, env_int
+
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_MAX_QUEUE = 32
+DEFAULT_SERVICE_TIME_SECONDS = 5.0
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after_seconds: int) -> None:
+        super().__init__("image generation queue is full")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        *,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        initial_service_time_seconds: float = DEFAULT_SERVICE_TIME_SECONDS,
+    ) -> None:
+        self._max_in_flight = max(1, max_in_flight)
+        self._max_queue = max(0, max_queue)
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._rejected = 0
+        self._service_time = initial_service_time_seconds
+
+    @property
+    def max_in_flight(self) -> int:
+        return self._max_in_flight
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def rejected(self) -> int:
+        return self._rejected
+
+    def retry_after_seconds(self) -> int:
+        backlog = self._in_flight + len(self._waiters)
+        return max(1, math.ceil(self._service_time * backlog / self._max_in_flight))
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        await self._acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release()
+            # Exponentially weighted service time keeps Retry-After close to current backend latency.
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+
+    def try_acquire(self) -> bool:
+        # Non-blocking slot for speculative work (e.g. hedged requests) that should only use spare capacity.
+        if self._in_flight < self._max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        self._release()
+
+    async def _acquire(self) -> None:
+        if self._in_flight < self._max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return
+        if len(self._waiters) >= self._max_queue:
+            self._rejected += 1
+            raise AdmissionRejected(self.retry_after_seconds())
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before cancellation; pass it on.
+                self._release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot straight to the next waiter so in_flight stays constant.
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+
+def create_admission_controller_from_env() -> AdmissionController:
+    return AdmissionController(
+        max_in_flight=env_int("IMAGE_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT),
+        max_queue=env_int("IMAGE_MAX_QUEUE", DEFAULT_MAX_QUEUE),
+        initial_service_time_seconds=env_float("IMAGE_EXPECTED_LATENCY_SECONDS", DEFAULT_SERVICE_TIME_SECONDS),
+    )
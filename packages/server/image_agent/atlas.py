@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from runtime.env import env_int
+
+try:
+    from PIL import Image
+
+    ATLAS_AVAILABLE = True
+except Exception:  # pragma: no cover
+    Image = None  # type: ignore[assignment]
+    ATLAS_AVAILABLE = False
+
+DEFAULT_INITIAL_SIZE = 256
+DEFAULT_MAX_SIZE = 2048
+DEFAULT_MAX_ATLASES = 32
+DEFAULT_MAX_ATLASES_PER_OWNER = 4
+DEFAULT_PADDING = 1
+# Longest edge of a packed frame; matches the largest default mip level, which is what the client draws.
+DEFAULT_FRAME_SIZE = 128
+
+
+@dataclass(frozen=True)
+class Rect:
+    x: int
+    y: int
+    width: int
+    height: int
+
+    @property
+    def right(self) -> int:
+        return self.x + self.width
+
+    @property
+    def bottom(self) -> int:
+        return self.y + self.height
+
+    def intersects(self, other: Rect) -> bool:
+        return self.x < other.right and other.x < self.right and self.y < other.bottom and other.y < self.bottom
+
+    def contains(self, other: Rect) -> bool:
+        return self.x <= other.x and self.y <= other.y and self.right >= other.right and self.bottom >= other.bottom
+
+
+class MaxRectsPacker:
+    def __init__(self, *, width: int = DEFAULT_INITIAL_SIZE, height: int = DEFAULT_INITIAL_SIZE, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        self.width = width
+        self.height = height
+        self.max_size = max_size
+        self._free: list[Rect] = [Rect(0, 0, width, height)]
+
+    def insert(self, width: int, height: int) -> Rect | None:
+        while True:
+            placed = self._find_position(width, height)
+            if placed is not None:
+                self._split_free_rects(placed)
+                return placed
+            if not self._grow():
+                return None
+
+    def _find_position(self, width: int, height: int) -> Rect | None:
+        # Best short side fit: prefer the free rectangle that leaves the smallest leftover edge.
+        best: Rect | None = None
+        best_score = (self.max_size + 1, self.max_size + 1)
+        for free in self._free:
+            if free.width < width or free.height < height:
+                continue
+            leftover_x = free.width - width
+            leftover_y = free.height - height
+            score = (min(leftover_x, leftover_y), max(leftover_x, leftover_y))
+            if score < best_score:
+                best_score = score
+                best = Rect(free.x, free.y, width, height)
+        return best
+
+    def _split_free_rects(self, used: Rect) -> None:
+        next_free: list[Rect] = []
+        for free in self._free:
+            if not free.intersects(used):
+                next_free.append(free)
+                continue
+            if used.x > free.x:
+                next_free.append(Rect(free.x, free.y, used.x - free.x, free.height))
+            if used.right < free.right:
+                next_free.append(Rect(used.right, free.y, free.right - used.right, free.height))
+            if used.y > free.y:
+                next_free.append(Rect(free.x, free.y, free.width, used.y - free.y))
+            if used.bottom < free.bottom:
+                next_free.append(Rect(free.x, used.bottom, free.width, free.bottom - used.bottom))
+        self._free = _prune_contained(next_free)
+
+    def _grow(self) -> bool:
+        # Grow the shorter side so existing placements (and their pixels) stay where they are.
+        if self.width <= self.height and self.width * 2 <= self.max_size:
+            self._free.append(Rect(self.width, 0, self.width, self.height))
+            self.width *= 2
+        elif self.height * 2 <= self.max_size:
+            self._free.append(Rect(0, self.height, self.width, self.height))
+            self.height *= 2
+        elif self.width * 2 <= self.max_size:
+            self._free.append(Rect(self.width, 0, self.width, self.height))
+            self.width *= 2
+        else:
+            return False
+        self._free = _prune_contained(self._free)
+        return True
+
+
+def _prune_contained(rects: list[Rect]) -> list[Rect]:
+    pruned: list[Rect] = []
+    for index, rect in enumerate(rects):
+        if rect.width <= 0 or rect.height <= 0:
+            continue
+        contained = False
+        for other_index, other in enumerate(rects):
+            if other_index == index or not other.contains(rect):
+                continue
+            # Keep the first of two identical rectangles.
+            if other != rect or other_index < index:
+                contained = True
+                break
+        if not contained:
+            pruned.append(rect)
+    return pruned
+
+
+class SpriteAtlas:
+    def __init__(
+        self,
+        *,
+        padding: int = DEFAULT_PADDING,
+        initial_size: int = DEFAULT_INITIAL_SIZE,
+        max_size: int = DEFAULT_MAX_SIZE,
+        frame_size: int = DEFAULT_FRAME_SIZE,
+    ) -> None:
+        if not ATLAS_AVAILABLE:
+            raise RuntimeError("pillow is required to build sprite atlases")
+        self._padding = max(0, padding)
+        self._frame_size = max(0, frame_size)
+        self._packer = MaxRectsPacker(width=initial_size, height=initial_size, max_size=max_size)
+        self._canvas = Image.new("RGBA", (initial_size, initial_size))
+        self._frames: dict[str, Rect] = {}
+        self._encoded: bytes | None = None
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._frames
+
+    def add(self, key: str, data: bytes) -> bool:
+        with self._lock:
+            if key in self._frames:
+                return False
+            with Image.open(io.BytesIO(data)) as source:
+                sprite = source.convert("RGBA")
+            if self._frame_size and max(sprite.size) > self._frame_size:
+                sprite.thumbnail((self._frame_size, self._frame_size), Image.Resampling.BOX)
+            slot = self._packer.insert(sprite.width + self._padding, sprite.height + self._padding)
+            if slot is None:
+                raise ValueError("sprite atlas is full")
+            if (self._packer.width, self._packer.height) != self._canvas.size:
+                grown = Image.new("RGBA", (self._packer.width, self._packer.height))
+                grown.paste(self._canvas, (0, 0))
+                self._canvas = grown
+            self._canvas.paste(sprite, (slot.x, slot.y))
+            self._frames[key] = Rect(slot.x, slot.y, sprite.width, sprite.height)
+            self._encoded = None
+            self.version += 1
+            return True
+
+    def snapshot(self) -> tuple[bytes, int, int, dict[str, Rect]]:
+        with self._lock:
+            if self._encoded is None:
+                buffer = io.BytesIO()
+                self._canvas.save(buffer, format="PNG", optimize=True)
+                self._encoded = buffer.getvalue()
+            width, height = self._canvas.size
+            return self._encoded, width, height, dict(self._frames)
+
+
+def frame_uv(frame: Rect, width: int, height: int) -> dict[str, Any]:
+    return {
+        "x": frame.x,
+        "y": frame.y,
+        "width": frame.width,
+        "height": frame.height,
+        "uv": [frame.x / width, frame.y / height, frame.right / width, frame.bottom / height],
+    }
+
+
+class SpriteAtlasStore:
+    def __init__(
+        self,
+        *,
+        max_atlases: int = DEFAULT_MAX_ATLASES,
+        max_atlases_per_owner: int = DEFAULT_MAX_ATLASES_PER_OWNER,
+        padding: int = DEFAULT_PADDING,
+        max_size: int = DEFAULT_MAX_SIZE,
+        frame_size: int = DEFAULT_FRAME_SIZE,
+    ) -> None:
+        self._max_atlases = max(1, max_atlases)
+        self._max_atlases_per_owner = max(1, max_atlases_per_owner)
+        self._padding = padding
+        self._max_size = max_size
+        self.frame_size = frame_size
+        # Keyed by (owner, atlas_id) so callers cannot reach, or crowd out, each other's atlases.
+        self._atlases: OrderedDict[tuple[str, str], SpriteAtlas] = OrderedDict()
+        self._owned: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, atlas_id: str, owner: str = "") -> SpriteAtlas:
+        key = (owner, atlas_id)
+        with self._lock:
+            atlas = self._atlases.get(key)
+            if atlas is None:
+                if self._owned.get(owner, 0) >= self._max_atlases_per_owner:
+                    # A caller past its quota recycles its own least recently used atlas.
+                    self._remove(next(other for other in self._atlases if other[0] == owner))
+                atlas = SpriteAtlas(padding=self._padding, max_size=self._max_size, frame_size=self.frame_size)
+                self._atlases[key] = atlas
+                self._owned[owner] = self._owned.get(owner, 0) + 1
+            self._atlases.move_to_end(key)
+            while len(self._atlases) > self._max_atlases:
+                self._remove(next(iter(self._atlases)))
+            return atlas
+
+    def __len__(self) -> int:
+        return len(self._atlases)
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        del self._atlases[key]
+        remaining = self._owned[key[0]] - 1
+        if remaining:
+            self._owned[key[0]] = remaining
+        else:
+            del self._owned[key[0]]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._atlases.clear()
+            self._owned.clear()
+
+
+def create_sprite_atlas_store_from_env() -> SpriteAtlasStore:
+    return SpriteAtlasStore(
+        max_atlases=env_int("SPRITE_ATLAS_MAX_ATLASES", DEFAULT_MAX_ATLASES),
+        max_atlases_per_owner=env_int("SPRITE_ATLAS_MAX_PER_CALLER", DEFAULT_MAX_ATLASES_PER_OWNER),
+        padding=env_int("SPRITE_ATLAS_PADDING", DEFAULT_PADDING),
+        max_size=env_int("SPRITE_ATLAS_MAX_SIZE", DEFAULT_MAX_SIZE),
+        frame_size=env_int("SPRITE_ATLAS_FRAME_SIZE", DEFAULT_FRAME_SIZE),
+    )
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import logging
+import math
+import os
+import random
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from image_agent.client_pool import GenaiClientPool
+from runtime.env import env_float, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+LOCAL_IMAGE_MODEL = "local-stand-in"
+DEFAULT_LOCAL_LATENCY = "lognormal:1.5,0.35"
+DEFAULT_LOCAL_FALLBACK_LATENCY = "lognormal:0.5,0.2"
+DEFAULT_LOCAL_IMAGE_SIZE = 256
+LOCAL_SPRITE_CELLS = 16
+LOCAL_ERROR_CODE = 503
+
+
+BLOCKED_FINISH_REASONS = {"SAFETY", "IMAGE_SAFETY", "PROHIBITED_CONTENT", "BLOCKLIST", "SPII", "RECITATION"}
+
+
+class NoImageDataError(RuntimeError):
+    pass
+
+
+class ImageBlockedError(NoImageDataError):
+    pass
+
+
+class ImageBackend(Protocol):
+    model: str
+
+    async def generate(self, prompt: str) -> tuple[str, str]: ...
+
+    async def aclose(self) -> None: ...
+
+
+def extract_inline_image(response: Any) -> tuple[str, str]:
+    for candidate in getattr(response, "candidates", []) or []:
+        content = getattr(candidate, "content", None)
+        for part in getattr(content, "parts", []) or []:
+            inline_data = getattr(part, "inline_data", None)
+            if inline_data is None:
+                continue
+            data = getattr(inline_data, "data", None)
+            mime_type = getattr(inline_data, "mime_type", "image/png")
+            if not data:
+                continue
+            if isinstance(data, bytes):
+                encoded = base64.b64encode(data).decode("utf-8")
+            else:
+                encoded = str(data)
+            return encoded, str(mime_type or "image/png")
+
+    reason = _blocked_reason(response)
+    if reason:
+        raise ImageBlockedError(f"Image generation was blocked by Gemini ({reason})")
+    raise NoImageDataError("No image data returned from Gemini")
+
+
+def _reason_name(value: Any) -> str:
+    return str(getattr(value, "name", None) or value or "").rsplit(".", 1)[-1].upper()
+
+
+def _blocked_reason(response: Any) -> str:
+    block_reason = _reason_name(getattr(getattr(response, "prompt_feedback", None), "block_reason", None))
+    if block_reason and block_reason != "BLOCK_REASON_UNSPECIFIED":
+        return block_reason
+    for candidate in getattr(response, "candidates", []) or []:
+        finish_reason = _reason_name(getattr(candidate, "finish_reason", None))
+        if finish_reason in BLOCKED_FINISH_REASONS:
+            return finish_reason
+    return ""
+
+
+class VertexImageBackend:
+    def __init__(self, pool: GenaiClientPool, *, model: str) -> None:
+        self.pool = pool
+        self.model = model
+
+    async def generate(self, prompt: str) -> tuple[str, str]:
+        project = os.getenv("GOOGLE_CLOUD_PROJECT")
+        location = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
+        if not project:
+            raise RuntimeError("GOOGLE_CLOUD_PROJECT is required")
+
+        async with self.pool.lease(project, location) as client:
+            try:
+                response = await client.aio.models.generate_content(model=self.model, contents=prompt)
+            except Exception as exc:
+                if self.pool.is_auth_error(exc):
+                    await self.pool.invalidate(project, location, client)
+                raise
+        return extract_inline_image(response)
+
+    async def aclose(self) -> None:
+        await self.pool.aclose()
+
+
+@dataclass(frozen=True)
+class LatencyDistribution:
+    kind: str
+    a: float = 0.0
+    b: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(self.a, self.b))
+        if self.kind == "lognormal":
+            # a is the median, b the sigma of the underlying normal.
+            return rng.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+        return self.a
+
+
+def parse_latency_spec(spec: str | None) -> LatencyDistribution:
+    # "fixed:0.5", "uniform:0.2,1.5", "normal:1.0,0.2", "lognormal:1.5,0.35" (seconds).
+    kind, _, raw_args = (spec or "").strip().partition(":")
+    kind = kind.strip().lower() or "fixed"
+    try:
+        args = [float(arg) for arg in raw_args.split(",") if arg.strip()]
+    except ValueError as exc:
+        raise ValueError(f"invalid latency spec: {spec!r}") from exc
+    if kind not in {"fixed", "uniform", "normal", "lognormal"}:
+        raise ValueError(f"unknown latency distribution: {kind!r}")
+    if kind != "fixed" and len(args) != 2:
+        raise ValueError(f"{kind} latency needs two parameters: {spec!r}")
+    if any(arg < 0 for arg in args):
+        raise ValueError(f"latency parameters must be non-negative: {spec!r}")
+    return LatencyDistribution(kind, *(args or [0.0])[:2])
+
+
+class LocalBackendError(RuntimeError):
+    def __init__(self, message: str, code: int = LOCAL_ERROR_CODE) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+def _png_chunk(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", zlib.crc32(kind + payload))
+
+
+def render_local_sprite(prompt: str, size: int = DEFAULT_LOCAL_IMAGE_SIZE) -> bytes:
+    # A mirrored 16x16 pixel-art glyph seeded by the prompt, upscaled with hard
+    # edges like the real model output so post-processing sees a pixel grid.
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    cells = LOCAL_SPRITE_CELLS
+    cell = max(1, size // cells)
+    edge = cell * cells
+    colours = [bytes((0, 0, 0, 0))] + [bytes((digest[i], digest[i + 1], digest[i + 2], 255)) for i in (0, 3, 6)]
+    bits = int.from_bytes(hashlib.sha256(digest).digest(), "big")
+
+    rows = []
+    for y in range(cells):
+        half = []
+        for x in range(cells // 2):
+            shift = 2 * (y * (cells // 2) + x)
+            half.append(colours[(bits >> shift) & 0b11])
+        row = b"".join(pixel * cell for pixel in half + half[::-1])
+        rows.extend([b"\x00" + row] * cell)
+
+    header = struct.pack(">IIBBBBB", edge, edge, 8, 6, 0, 0, 0)
+    return b"".join(
+        (
+            b"\x89PNG\r\n\x1a\n",
+            _png_chunk(b"IHDR", header),
+            _png_chunk(b"IDAT", zlib.compress(b"".join(rows), 6)),
+            _png_chunk(b"IEND", b""),
+        )
+    )
+
+
+class LocalImageBackend:
+    def __init__(
+        self,
+        *,
+        latency: LatencyDistribution | None = None,
+        error_rate: float = 0.0,
+        size: int = DEFAULT_LOCAL_IMAGE_SIZE,
+        seed: int = 0,
+        model: str = LOCAL_IMAGE_MODEL,
+    ) -> None:
+        self.latency = latency or LatencyDistribution("fixed")
+        self.error_rate = min(1.0, max(0.0, error_rate))
+        self.size = max(LOCAL_SPRITE_CELLS, size)
+        self.model = model
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    async def generate(self, prompt: str) -> tuple[str, str]:
+        self.calls += 1
+        delay = self.latency.sample(self._rng)
+        failed = self._rng.random() < self.error_rate
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if failed:
+            raise LocalBackendError("local image backend injected failure")
+        return base64.b64encode(render_local_sprite(prompt, self.size)).decode("ascii"), "image/png"
+
+    async def aclose(self) -> None:
+        return None
+
+
+def _local_latency_from_env(name: str, default: str) -> LatencyDistribution:
+    try:
+        return parse_latency_spec(env_str(name, default))
+    except ValueError:
+        logger.warning("invalid %s, using %s", name, default, exc_info=True)
+        return parse_latency_spec(default)
+
+
+def create_image_backend_from_env(pool: GenaiClientPool, *, model: str) -> ImageBackend:
+    kind = (env_str("IMAGE_BACKEND", "vertex") or "vertex").lower()
+    if kind == "local":
+        return LocalImageBackend(
+            latency=_local_latency_from_env("LOCAL_IMAGE_LATENCY", DEFAULT_LOCAL_LATENCY),
+            error_rate=env_float("LOCAL_IMAGE_ERROR_RATE", 0.0),
+            size=env_int("LOCAL_IMAGE_SIZE", DEFAULT_LOCAL_IMAGE_SIZE),
+            seed=env_int("LOCAL_IMAGE_SEED", 0),
+        )
+    if kind != "vertex":
+        logger.warning("unknown IMAGE_BACKEND=%r, using vertex", kind)
+    return VertexImageBackend(pool, model=model)
+
+
+def create_fallback_image_backend_from_env(pool: GenaiClientPool) -> ImageBackend | None:
+    model = env_str("IMAGE_FALLBACK_MODEL")
+    if not model:
+        return None
+    if (env_str("IMAGE_BACKEND", "vertex") or "vertex").lower() == "local":
+        return LocalImageBackend(
+            latency=_local_latency_from_env("LOCAL_IMAGE_FALLBACK_LATENCY", DEFAULT_LOCAL_FALLBACK_LATENCY),
+            size=env_int("LOCAL_IMAGE_SIZE", DEFAULT_LOCAL_IMAGE_SIZE),
+            seed=env_int("LOCAL_IMAGE_SEED", 0) + 1,
+            model=f"{LOCAL_IMAGE_MODEL}:{model}",
+        )
+    return VertexImageBackend(pool, model=model)
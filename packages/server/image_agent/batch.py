@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Iterable, TypeVar
+
+from runtime.env import env_int
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_BATCH_CONCURRENCY = 4
+DEFAULT_BATCH_MAX_ITEMS = 64
+
+_EXHAUSTED = object()
+
+
+async def iterate_bounded(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[R]],
+    *,
+    concurrency: int,
+) -> AsyncIterator[tuple[T, R | BaseException]]:
+    pending_items = iter(items)
+    running: dict[asyncio.Task[R], T] = {}
+
+    def fill() -> None:
+        while len(running) < max(1, concurrency):
+            item = next(pending_items, _EXHAUSTED)
+            if item is _EXHAUSTED:
+                return
+            running[asyncio.ensure_future(worker(item))] = item  # type: ignore[arg-type]
+
+    fill()
+    try:
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = running.pop(task)
+                error = task.exception()
+                yield item, (error if error is not None else task.result())
+            fill()
+    finally:
+        # Stop outstanding work when the consumer goes away (e.g. a streaming client disconnects).
+        for task in running:
+            task.cancel()
+
+
+def batch_concurrency_from_env() -> int:
+    return max(1, env_int("IMAGE_BATCH_CONCURRENCY", DEFAULT_BATCH_CONCURRENCY))
+
+
+def batch_max_items_from_env() -> int:
+    return max(1, env_int("IMAGE_BATCH_MAX_ITEMS", DEFAULT_BATCH_MAX_ITEMS))
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CLIENT_AGE_SECONDS = 45 * 60
+
+AUTH_ERROR_CODES = (401, 403)
+
+ClientFactory = Callable[[str, str], Any]
+
+
+def create_vertex_client(project: str, location: str) -> Any:
+    try:
+        from google import genai  # type: ignore
+    except Exception as exc:  # pragma: no cover
+        raise RuntimeError("google-genai dependency is not installed") from exc
+
+    return genai.Client(vertexai=True, project=project, location=location)
+
+
+@dataclass
+class _PooledClient:
+    client: Any
+    created_at: float
+    # Calls still running on this client; a replaced client is only closed once they finish.
+    leases: int = 0
+    retired: bool = False
+
+
+def _credentials_expired(client: Any) -> bool:
+    credentials = getattr(getattr(client, "_api_client", None), "_credentials", None)
+    return bool(getattr(credentials, "expired", False))
+
+
+async def _close_client(client: Any) -> None:
+    aio = getattr(client, "aio", None)
+    aclose = getattr(aio, "aclose", None)
+    close = getattr(client, "close", None)
+    try:
+        if callable(aclose):
+            await aclose()
+        if callable(close):
+            close()
+    except Exception:
+        logger.warning("failed to close genai client", exc_info=True)
+
+
+class GenaiClientPool:
+    def __init__(
+        self,
+        *,
+        factory: ClientFactory = create_vertex_client,
+        max_client_age_seconds: float = DEFAULT_MAX_CLIENT_AGE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._factory = factory
+        self._max_client_age_seconds = max_client_age_seconds
+        self._clock = clock
+        self._clients: dict[tuple[str, str], _PooledClient] = {}
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+        self.created = 0
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    async def get(self, project: str, location: str) -> Any:
+        return (await self._current(project, location)).client
+
+    @asynccontextmanager
+    async def lease(self, project: str, location: str) -> AsyncIterator[Any]:
+        pooled = await self._current(project, location)
+        pooled.leases += 1
+        try:
+            yield pooled.client
+        finally:
+            pooled.leases -= 1
+            if pooled.retired and pooled.leases == 0:
+                await _close_client(pooled.client)
+
+    async def _current(self, project: str, location: str) -> _PooledClient:
+        key = (project, location)
+        pooled = self._clients.get(key)
+        if pooled is not None and not self._is_stale(pooled):
+            return pooled
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            pooled = self._clients.get(key)
+            if pooled is not None and not self._is_stale(pooled):
+                return pooled
+            if pooled is not None:
+                del self._clients[key]
+                await self._retire(pooled)
+
+            # Client construction resolves credentials, which may touch the filesystem or metadata server.
+            client = await asyncio.to_thread(self._factory, project, location)
+            pooled = self._clients[key] = _PooledClient(client=client, created_at=self._clock())
+            self.created += 1
+            return pooled
+
+    def is_auth_error(self, exc: BaseException) -> bool:
+        return getattr(exc, "code", None) in AUTH_ERROR_CODES
+
+    async def invalidate(self, project: str, location: str, client: Any = None) -> None:
+        # Passing the failed client keeps a late error from retiring a replacement made in the meantime.
+        key = (project, location)
+        pooled = self._clients.get(key)
+        if pooled is None or (client is not None and pooled.client is not client):
+            return
+        del self._clients[key]
+        await self._retire(pooled)
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        self._locks.clear()
+        for pooled in clients:
+            await self._retire(pooled)
+
+    async def _retire(self, pooled: _PooledClient) -> None:
+        pooled.retired = True
+        if pooled.leases == 0:
+            await _close_client(pooled.client)
+
+    def _is_stale(self, pooled: _PooledClient) -> bool:
+        if self._clock() - pooled.created_at >= self._max_client_age_seconds:
+            return True
+        return _credentials_expired(pooled.client)
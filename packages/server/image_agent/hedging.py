@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+from image_agent.admission import AdmissionController
+from image_agent.backends import ImageBackend
+from image_agent.negative_cache import FAILURE_PERMANENT, classify_failure
+from runtime.env import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEDGE_PERCENTILE = 95.0
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+DEFAULT_HEDGE_MIN_DELAY_SECONDS = 0.5
+DEFAULT_LATENCY_WINDOW = 200
+DEFAULT_BREAKER_WINDOW = 20
+DEFAULT_BREAKER_ERROR_RATE = 0.5
+DEFAULT_BREAKER_LATENCY_SECONDS = 30.0
+DEFAULT_BREAKER_COOLDOWN_SECONDS = 30.0
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class LatencyTracker:
+    def __init__(self, *, window: int = DEFAULT_LATENCY_WINDOW) -> None:
+        self._samples: deque[float] = deque(maxlen=max(1, window))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, percentile: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, round(percentile / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        *,
+        window: int = DEFAULT_BREAKER_WINDOW,
+        error_rate: float = DEFAULT_BREAKER_ERROR_RATE,
+        latency_seconds: float = DEFAULT_BREAKER_LATENCY_SECONDS,
+        cooldown_seconds: float = DEFAULT_BREAKER_COOLDOWN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._window: deque[tuple[bool, float]] = deque(maxlen=max(1, window))
+        self._error_rate = error_rate
+        self._latency_seconds = latency_seconds
+        self._cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._opened_at = 0.0
+        self._probing = False
+        self.state = BREAKER_CLOSED
+        self.opened = 0
+
+    def allow(self) -> bool:
+        if self.state == BREAKER_CLOSED:
+            return True
+        if self.state == BREAKER_OPEN and self._clock() - self._opened_at >= self._cooldown_seconds:
+            self.state = BREAKER_HALF_OPEN
+        if self.state == BREAKER_HALF_OPEN and not self._probing:
+            # Let exactly one request through to find out whether the primary recovered.
+            self._probing = True
+            return True
+        return False
+
+    def record(self, ok: bool, seconds: float) -> None:
+        if self.state == BREAKER_HALF_OPEN:
+            self._probing = False
+            if ok and seconds < self._latency_seconds:
+                self.state = BREAKER_CLOSED
+                self._window.clear()
+            else:
+                self._open()
+            return
+        if self.state == BREAKER_OPEN:
+            return
+
+        self._window.append((ok, seconds))
+        if len(self._window) < self._window.maxlen:
+            return
+        errors = sum(1 for sample_ok, _ in self._window if not sample_ok)
+        latencies = sorted(sample_seconds for sample_ok, sample_seconds in self._window if sample_ok)
+        median = latencies[len(latencies) // 2] if latencies else 0.0
+        if errors / len(self._window) >= self._error_rate or median >= self._latency_seconds:
+            self._open()
+
+    def release(self) -> None:
+        # A probe that was cancelled (e.g. lost a hedge race) frees the slot for the next one.
+        if self.state == BREAKER_HALF_OPEN:
+            self._probing = False
+
+    def _open(self) -> None:
+        self.state = BREAKER_OPEN
+        self._opened_at = self._clock()
+        self._probing = False
+        self._window.clear()
+        self.opened += 1
+        logger.warning("image backend circuit breaker opened; using the fallback model")
+
+
+@dataclass
+class HedgingMetrics:
+    primary_calls: int = 0
+    fallback_calls: int = 0
+    errors: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    hedges_skipped: int = 0
+    breaker_opened: int = 0
+    breaker_state: str = BREAKER_CLOSED
+    hedge_delay_seconds: float | None = None
+
+    def as_dict(self) -> dict[str, object]:
+        return asdict(self)
+
+
+class HedgedImageBackend:
+    def __init__(
+        self,
+        primary: ImageBackend,
+        *,
+        fallback: ImageBackend | None = None,
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        hedge_min_samples: int = DEFAULT_HEDGE_MIN_SAMPLES,
+        hedge_min_delay_seconds: float = DEFAULT_HEDGE_MIN_DELAY_SECONDS,
+        latency: LatencyTracker | None = None,
+        breaker: CircuitBreaker | None = None,
+        admission: AdmissionController | None = None,
+    ) -> None:
+        self.primary = primary
+        self.fallback = fallback
+        # Cache keys stay tied to the primary model so a breaker flip does not empty the cache.
+        self.model = primary.model
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = max(1, hedge_min_samples)
+        self.hedge_min_delay_seconds = max(0.0, hedge_min_delay_seconds)
+        self.latency = latency or LatencyTracker()
+        self.breaker = breaker or CircuitBreaker()
+        self.admission = admission
+        self._metrics = HedgingMetrics()
+
+    def hedge_delay(self) -> float | None:
+        if self.hedge_percentile <= 0 or len(self.latency) < self.hedge_min_samples:
+            return None
+        delay = self.latency.percentile(self.hedge_percentile)
+        return None if delay is None else max(self.hedge_min_delay_seconds, delay)
+
+    def metrics(self) -> HedgingMetrics:
+        self._metrics.breaker_opened = self.breaker.opened
+        self._metrics.breaker_state = self.breaker.state
+        self._metrics.hedge_delay_seconds = self.hedge_delay()
+        return HedgingMetrics(**asdict(self._metrics))
+
+    async def generate(self, prompt: str) -> tuple[str, str]:
+        use_primary = self.fallback is None or self.breaker.allow()
+        backend = self.primary if use_primary else self.fallback
+        assert backend is not None
+        if use_primary:
+            self._metrics.primary_calls += 1
+        else:
+            self._metrics.fallback_calls += 1
+
+        first = asyncio.ensure_future(self._call(backend, prompt, use_primary))
+        delay = self.hedge_delay()
+        if delay is None:
+            return await first
+
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                hedge = self._start_hedge(backend, prompt, use_primary)
+                if hedge is not None:
+                    pending.add(hedge)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self._metrics.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                    if classify_failure(error) == FAILURE_PERMANENT:
+                        # A blocked or rejected prompt fails the same way on the hedge, so don't wait for it.
+                        raise error
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _start_hedge(self, backend: ImageBackend, prompt: str, primary: bool) -> asyncio.Future[tuple[str, str]] | None:
+        # A half-open breaker allows a single probe, so a second primary call would bypass it.
+        if primary and self.breaker.state == BREAKER_HALF_OPEN:
+            self._metrics.hedges_skipped += 1
+            return None
+        # The hedge only runs on a spare admission slot so in-flight calls stay within the configured limit.
+        admission = self.admission
+        if admission is not None and not admission.try_acquire():
+            self._metrics.hedges_skipped += 1
+            return None
+        self._metrics.hedges += 1
+        hedge = asyncio.ensure_future(self._call(backend, prompt, primary))
+        if admission is not None:
+            hedge.add_done_callback(lambda _task: admission.release())
+        return hedge
+
+    async def _call(self, backend: ImageBackend, prompt: str, primary: bool) -> tuple[str, str]:
+        started = time.monotonic()
+        try:
+            result = await backend.generate(prompt)
+        except asyncio.CancelledError:
+            if primary:
+                self.breaker.release()
+            raise
+        except Exception as exc:
+            self._metrics.errors += 1
+            if primary:
+                # Blocked or empty responses are about the prompt; the backend answered, so it counts as healthy.
+                healthy = classify_failure(exc) == FAILURE_PERMANENT
+                self.breaker.record(healthy, time.monotonic() - started)
+            raise
+        elapsed = time.monotonic() - started
+        if primary:
+            self.latency.record(elapsed)
+            self.breaker.record(True, elapsed)
+        return result
+
+    async def aclose(self) -> None:
+        await self.primary.aclose()
+        if self.fallback is not None:
+            await self.fallback.aclose()
+
+
+def create_hedged_image_backend_from_env(
+    primary: ImageBackend, fallback: ImageBackend | None, *, admission: AdmissionController | None = None
+) -> HedgedImageBackend:
+    return HedgedImageBackend(
+        primary,
+        fallback=fallback,
+        admission=admission,
+        hedge_percentile=env_float("IMAGE_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE),
+        hedge_min_samples=env_int("IMAGE_HEDGE_MIN_SAMPLES", DEFAULT_HEDGE_MIN_SAMPLES),
+        hedge_min_delay_seconds=env_float("IMAGE_HEDGE_MIN_DELAY_SECONDS", DEFAULT_HEDGE_MIN_DELAY_SECONDS),
+        breaker=CircuitBreaker(
+            window=env_int("IMAGE_BREAKER_WINDOW", DEFAULT_BREAKER_WINDOW),
+            error_rate=env_float("IMAGE_BREAKER_ERROR_RATE", DEFAULT_BREAKER_ERROR_RATE),
+            latency_seconds=env_float("IMAGE_BREAKER_LATENCY_SECONDS", DEFAULT_BREAKER_LATENCY_SECONDS),
+            cooldown_seconds=env_float("IMAGE_BREAKER_COOLDOWN_SECONDS", DEFAULT_BREAKER_COOLDOWN_SECONDS),
+        ),
+    )
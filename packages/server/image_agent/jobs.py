@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from runtime.env import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_WORKERS = 4
+DEFAULT_JOB_MAX_PENDING = 256
+DEFAULT_JOB_RESULT_TTL_SECONDS = 600.0
+DEFAULT_JOB_MAX_FINISHED = 256
+DEFAULT_JOB_PRIORITY = 10
+# Lower runs first. Clients may only defer their own work; anything more urgent is reserved for the server.
+CLIENT_PRIORITY_RANGE = (DEFAULT_JOB_PRIORITY, DEFAULT_JOB_PRIORITY + 10)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    def __init__(self) -> None:
+        super().__init__("image job queue is full")
+
+
+@dataclass
+class ImageJob:
+    job_id: str
+    prompt: str
+    entity_type: str
+    prompt_hint: str | None = None
+    user_id: str | None = None
+    session_id: str | None = None
+    priority: int = DEFAULT_JOB_PRIORITY
+    status: str = JOB_QUEUED
+    result: Any = None
+    error: dict[str, Any] | None = None
+    created_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+
+JobRunner = Callable[[ImageJob], Awaitable[Any]]
+JobErrorMapper = Callable[[Exception], dict[str, Any]]
+JobListener = Callable[[ImageJob], Awaitable[None]]
+
+
+class ImageJobQueue:
+    def __init__(
+        self,
+        *,
+        workers: int = DEFAULT_JOB_WORKERS,
+        max_pending: int = DEFAULT_JOB_MAX_PENDING,
+        result_ttl_seconds: float = DEFAULT_JOB_RESULT_TTL_SECONDS,
+        max_finished: int = DEFAULT_JOB_MAX_FINISHED,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._worker_count = max(1, workers)
+        self._max_pending = max(1, max_pending)
+        self._max_finished = max(1, max_finished)
+        self._result_ttl_seconds = result_ttl_seconds
+        self._clock = clock
+        self._jobs: dict[str, ImageJob] = {}
+        self._finished: OrderedDict[str, float] = OrderedDict()
+        self._queue: asyncio.PriorityQueue[tuple[int, int, str]] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._sequence = itertools.count()
+        self._workers: list[asyncio.Task[None]] = []
+        self._runner: JobRunner | None = None
+        self._error_mapper: JobErrorMapper = lambda exc: {"status_code": 503, "message": str(exc)}
+        self._listeners: list[JobListener] = []
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def configure(self, runner: JobRunner, *, error_mapper: JobErrorMapper | None = None) -> None:
+        self._runner = runner
+        if error_mapper is not None:
+            self._error_mapper = error_mapper
+
+    def add_listener(self, listener: JobListener) -> None:
+        self._listeners.append(listener)
+
+    def submit(self, job: ImageJob) -> ImageJob:
+        self._expire_finished()
+        if self._pending >= self._max_pending:
+            raise JobQueueFull()
+        self._ensure_workers()
+        assert self._queue is not None
+        job.created_at = self._clock()
+        self._jobs[job.job_id] = job
+        self._pending += 1
+        self._queue.put_nowait((job.priority, next(self._sequence), job.job_id))
+        return job
+
+    def get(self, job_id: str) -> ImageJob | None:
+        self._expire_finished()
+        return self._jobs.get(job_id)
+
+    async def aclose(self) -> None:
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        for worker in workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._queue = None
+        self._loop = None
+
+    def _ensure_workers(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Workers are bound to the loop that started them.
+            self._loop = loop
+            self._queue = None
+            self._workers = []
+            self._pending = 0
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        if not self._workers:
+            self._workers = [asyncio.ensure_future(self._work()) for _ in range(self._worker_count)]
+
+    async def _work(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            _, _, job_id = await queue.get()
+            job = self._jobs.get(job_id)
+            self._pending -= 1
+            if job is None:
+                continue
+            await self._run(job)
+
+    async def _run(self, job: ImageJob) -> None:
+        job.status = JOB_RUNNING
+        try:
+            if self._runner is None:
+                raise RuntimeError("image job runner is not configured")
+            job.result = await self._runner(job)
+            job.status = JOB_DONE
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            job.error = self._error_mapper(exc)
+            job.status = JOB_FAILED
+        job.finished_at = self._clock()
+        self._finished[job.job_id] = job.finished_at
+        # Finished jobs hold sprite bytes, so the count is bounded as well as the age.
+        while len(self._finished) > self._max_finished:
+            expired_id, _ = self._finished.popitem(last=False)
+            self._jobs.pop(expired_id, None)
+
+        for listener in self._listeners:
+            try:
+                await listener(job)
+            except Exception:
+                logger.warning("image job listener failed for %s", job.job_id, exc_info=True)
+
+    def _expire_finished(self) -> None:
+        cutoff = self._clock() - self._result_ttl_seconds
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at > cutoff:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+
+
+def clamp_client_priority(priority: int) -> int:
+    low, high = CLIENT_PRIORITY_RANGE
+    return min(high, max(low, priority))
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def create_image_job_queue_from_env() -> ImageJobQueue:
+    return ImageJobQueue(
+        workers=env_int("IMAGE_JOB_WORKERS", DEFAULT_JOB_WORKERS),
+        max_pending=env_int("IMAGE_JOB_MAX_PENDING", DEFAULT_JOB_MAX_PENDING),
+        result_ttl_seconds=env_float("IMAGE_JOB_RESULT_TTL_SECONDS", DEFAULT_JOB_RESULT_TTL_SECONDS),
+        max_finished=env_int("IMAGE_JOB_MAX_FINISHED", DEFAULT_JOB_MAX_FINISHED),
+    )
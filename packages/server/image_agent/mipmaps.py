@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+
+from image_agent.sprite_cache import SpriteCacheEntry
+from runtime.env import env_str
+
+try:
+    from PIL import Image
+
+    MIPMAPS_AVAILABLE = True
+except Exception:  # pragma: no cover
+    Image = None  # type: ignore[assignment]
+    MIPMAPS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIP_SIZES = (128, 64, 32, 16)
+
+
+def parse_mip_sizes(raw: str | None) -> tuple[int, ...]:
+    sizes: set[int] = set()
+    for chunk in (raw or "").split(","):
+        chunk = chunk.strip()
+        if chunk.isdigit() and int(chunk) > 0:
+            sizes.add(int(chunk))
+    return tuple(sorted(sizes, reverse=True))
+
+
+def build_mip_chain(data: bytes, sizes: tuple[int, ...]) -> list[tuple[int, bytes]]:
+    if not MIPMAPS_AVAILABLE:
+        raise RuntimeError("pillow is required to build sprite mip chains")
+
+    with Image.open(io.BytesIO(data)) as source:
+        current = source.convert("RGBA")
+    original_edge = max(current.size)
+
+    chain: list[tuple[int, bytes]] = []
+    for edge in sorted(sizes, reverse=True):
+        if edge >= original_edge:
+            continue
+        # Each level is box-filtered from the previous one, like a GPU mip chain.
+        while max(current.size) >= edge * 2:
+            current = current.reduce(2)
+        if max(current.size) != edge:
+            scale = edge / max(current.size)
+            width, height = current.size
+            current = current.resize(
+                (max(1, round(width * scale)), max(1, round(height * scale))),
+                Image.Resampling.BOX,
+            )
+        buffer = io.BytesIO()
+        current.save(buffer, format="PNG", optimize=True)
+        chain.append((edge, buffer.getvalue()))
+    return chain
+
+
+async def build_sprite_variants(data: bytes, sizes: tuple[int, ...]) -> tuple[tuple[int, SpriteCacheEntry], ...]:
+    if not sizes or not MIPMAPS_AVAILABLE:
+        return ()
+    try:
+        chain = await asyncio.to_thread(build_mip_chain, data, sizes)
+    except Exception:
+        logger.warning("sprite mip chain generation failed; serving the full size only", exc_info=True)
+        return ()
+    return tuple((edge, SpriteCacheEntry(data=level, mime_type="image/png")) for edge, level in chain)
+
+
+def mip_sizes_from_env() -> tuple[int, ...]:
+    raw = env_str("SPRITE_MIP_SIZES", ",".join(str(size) for size in DEFAULT_MIP_SIZES))
+    if raw in {"0", "off", "none"}:
+        return ()
+    return parse_mip_sizes(raw)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+from image_agent.admission import AdmissionRejected
+from image_agent.backends import NoImageDataError
+from image_agent.client_pool import AUTH_ERROR_CODES
+from runtime.env import env_float, env_int
+
+DEFAULT_NEGATIVE_TTL_SECONDS = 300.0
+DEFAULT_RETRY_BACKOFF_SECONDS = 1.0
+DEFAULT_RETRY_BACKOFF_MAX_SECONDS = 30.0
+DEFAULT_NEGATIVE_MAX_ENTRIES = 10_000
+
+FAILURE_PERMANENT = "permanent"
+FAILURE_TRANSIENT = "transient"
+
+PERMANENT_FAILURE_STATUS = 422
+TRANSIENT_FAILURE_STATUS = 503
+
+
+def classify_failure(exc: BaseException) -> str | None:
+    if isinstance(exc, NoImageDataError):
+        return FAILURE_PERMANENT
+    if isinstance(exc, (AdmissionRejected, asyncio.CancelledError)):
+        # Our own load shedding says nothing about the prompt.
+        return None
+    code = getattr(exc, "code", None)
+    if not isinstance(code, int):
+        code = getattr(exc, "status_code", None)
+    if isinstance(code, int):
+        if code in AUTH_ERROR_CODES:
+            return None
+        if code in (408, 429) or code >= 500:
+            return FAILURE_TRANSIENT
+        if 400 <= code < 500:
+            return FAILURE_PERMANENT
+    return FAILURE_TRANSIENT
+
+
+class CachedSpriteFailure(Exception):
+    def __init__(self, kind: str, message: str, retry_after_seconds: int) -> None:
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after_seconds = retry_after_seconds
+
+    @property
+    def status_code(self) -> int:
+        return PERMANENT_FAILURE_STATUS if self.kind == FAILURE_PERMANENT else TRANSIENT_FAILURE_STATUS
+
+
+@dataclass
+class _Failure:
+    kind: str
+    message: str
+    until: float
+    failures: int
+
+
+class NegativeSpriteCache:
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = DEFAULT_NEGATIVE_TTL_SECONDS,
+        backoff_seconds: float = DEFAULT_RETRY_BACKOFF_SECONDS,
+        backoff_max_seconds: float = DEFAULT_RETRY_BACKOFF_MAX_SECONDS,
+        max_entries: int = DEFAULT_NEGATIVE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+        rng: random.Random | None = None,
+    ) -> None:
+        self._ttl_seconds = max(0.0, ttl_seconds)
+        self._backoff_seconds = max(0.0, backoff_seconds)
+        self._backoff_max_seconds = max(self._backoff_seconds, backoff_max_seconds)
+        self._max_entries = max(1, max_entries)
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._failures: OrderedDict[str, _Failure] = OrderedDict()
+        self.fast_failures = 0
+
+    def __len__(self) -> int:
+        return len(self._failures)
+
+    def check(self, key: str) -> None:
+        failure = self._failures.get(key)
+        if failure is None:
+            return
+        remaining = failure.until - self._clock()
+        if remaining <= 0:
+            if failure.kind == FAILURE_PERMANENT:
+                del self._failures[key]
+            # Transient entries stay past their window so the next failure backs off further.
+            return
+        self.fast_failures += 1
+        raise CachedSpriteFailure(failure.kind, failure.message, max(1, math.ceil(remaining)))
+
+    def record_failure(self, key: str, exc: BaseException) -> str | None:
+        kind = classify_failure(exc)
+        if kind is None:
+            return None
+        now = self._clock()
+        previous = self._failures.pop(key, None)
+        if kind == FAILURE_PERMANENT:
+            failure = _Failure(kind, str(exc), now + self._ttl_seconds, 1)
+        else:
+            failures = previous.failures + 1 if previous is not None and previous.kind == kind else 1
+            delay = min(self._backoff_max_seconds, self._backoff_seconds * 2 ** (failures - 1))
+            # Equal jitter: spread retries of a popular prompt without ever retrying immediately.
+            failure = _Failure(kind, str(exc), now + delay * self._rng.uniform(0.5, 1.0), failures)
+        self._failures[key] = failure
+        self._prune(now)
+        return kind
+
+    def record_success(self, key: str) -> None:
+        self._failures.pop(key, None)
+
+    def clear(self) -> None:
+        self._failures.clear()
+        self.fast_failures = 0
+
+    def _prune(self, now: float) -> None:
+        while len(self._failures) > self._max_entries:
+            self._failures.popitem(last=False)
+        # Oldest-first order means expired permanent entries cluster at the front.
+        while self._failures:
+            key, failure = next(iter(self._failures.items()))
+            horizon = failure.until if failure.kind == FAILURE_PERMANENT else failure.until + self._backoff_max_seconds
+            if horizon > now:
+                break
+            del self._failures[key]
+
+
+def create_negative_sprite_cache_from_env() -> NegativeSpriteCache:
+    return NegativeSpriteCache(
+        ttl_seconds=env_float("SPRITE_NEGATIVE_TTL_SECONDS", DEFAULT_NEGATIVE_TTL_SECONDS),
+        backoff_seconds=env_float("SPRITE_RETRY_BACKOFF_SECONDS", DEFAULT_RETRY_BACKOFF_SECONDS),
+        backoff_max_seconds=env_float("SPRITE_RETRY_BACKOFF_MAX_SECONDS", DEFAULT_RETRY_BACKOFF_MAX_SECONDS),
+        max_entries=env_int("SPRITE_NEGATIVE_MAX_ENTRIES", DEFAULT_NEGATIVE_MAX_ENTRIES),
+    )
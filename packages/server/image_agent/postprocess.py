@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+from runtime.env import env_bool, env_int
+
+try:
+    import numpy as np
+    from PIL import Image
+
+    POSTPROCESS_AVAILABLE = True
+except Exception:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+    Image = None  # type: ignore[assignment]
+    POSTPROCESS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PALETTE_SIZE = 16
+DEFAULT_MIN_SPRITE_SIZE = 16
+DEFAULT_FALLBACK_SIZE = 64
+GRID_SCORE_THRESHOLD = 0.85
+EDGE_NOISE_FLOOR = 48
+PALETTE_KMEANS_ITERATIONS = 8
+
+
+@dataclass(frozen=True)
+class SpritePostprocessConfig:
+    enabled: bool = False
+    palette_size: int = DEFAULT_PALETTE_SIZE
+    min_sprite_size: int = DEFAULT_MIN_SPRITE_SIZE
+    fallback_size: int = DEFAULT_FALLBACK_SIZE
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and POSTPROCESS_AVAILABLE
+
+    @property
+    def signature(self) -> str:
+        if not self.active:
+            return ""
+        return f"pp:{self.palette_size}:{self.min_sprite_size}:{self.fallback_size}"
+
+
+@dataclass(frozen=True)
+class ProcessedSprite:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    cell_size: int
+
+
+def _grid_period(profile: Any, max_period: int) -> tuple[int, int]:
+    # profile[i] is the edge energy between pixel i and i + 1; cell boundaries of
+    # period k with offset o sit at i where (i + 1 - o) % k == 0.
+    total = float(profile.sum())
+    if total <= 0 or max_period < 2:
+        return 1, 0
+    boundaries = np.arange(1, profile.shape[0] + 1)
+    for period in range(max_period, 1, -1):
+        energy = np.bincount(boundaries % period, weights=profile, minlength=period)
+        offset = int(energy.argmax())
+        if energy[offset] / total >= GRID_SCORE_THRESHOLD:
+            return period, offset
+    return 1, 0
+
+
+def detect_pixel_grid(pixels: Any, *, min_sprite_size: int = DEFAULT_MIN_SPRITE_SIZE) -> tuple[int, int, int]:
+    height, width = pixels.shape[:2]
+    signal = pixels.astype(np.int16)
+    column_edges = np.abs(np.diff(signal, axis=1)).sum(axis=2)
+    row_edges = np.abs(np.diff(signal, axis=0)).sum(axis=2)
+    # Drop compression noise and antialiasing so only real colour steps vote for the grid.
+    column_edges[column_edges < EDGE_NOISE_FLOOR] = 0
+    row_edges[row_edges < EDGE_NOISE_FLOOR] = 0
+    column_profile = column_edges.sum(axis=0).astype(np.float64)
+    row_profile = row_edges.sum(axis=1).astype(np.float64)
+
+    max_period = max(1, min(width, height) // max(1, min_sprite_size))
+    column_period, column_offset = _grid_period(column_profile, max_period)
+    row_period, row_offset = _grid_period(row_profile, max_period)
+    if column_period != row_period or column_period < 2:
+        return 1, 0, 0
+    return column_period, column_offset % column_period, row_offset % row_period
+
+
+def _encode_png(pixels: Any, palette_size: int) -> bytes:
+    colors = max(2, min(256, palette_size))
+    transparent = pixels[..., 3] < 128
+    has_transparency = bool(transparent.any())
+    opaque_colors = pixels[~transparent][:, :3]
+    if opaque_colors.shape[0] == 0:
+        opaque_colors = np.zeros((1, 3), dtype=np.uint8)
+
+    # Pixel art alpha is binary: build the palette from opaque pixels only and
+    # reserve one extra slot for transparency.
+    opaque_strip = Image.fromarray(np.ascontiguousarray(opaque_colors[np.newaxis, :, :]), mode="RGB")
+    palette_image = opaque_strip.quantize(
+        colors=colors - 1 if has_transparency else colors,
+        method=Image.Quantize.MEDIANCUT,
+        kmeans=PALETTE_KMEANS_ITERATIONS,
+    )
+    rgb = Image.fromarray(np.ascontiguousarray(pixels[..., :3]), mode="RGB")
+    quantized = rgb.quantize(palette=palette_image, dither=Image.Dither.NONE)
+
+    save_options: dict[str, Any] = {"format": "PNG", "optimize": True}
+    if has_transparency:
+        used = len(palette_image.getpalette() or []) // 3
+        transparent_index = min(used, colors - 1)
+        indices = np.asarray(quantized).copy()
+        indices[transparent] = transparent_index
+        palette = (palette_image.getpalette() or [])[: 3 * transparent_index] + [0, 0, 0]
+        quantized = Image.fromarray(indices, mode="P")
+        quantized.putpalette(palette)
+        save_options["transparency"] = transparent_index
+    buffer = io.BytesIO()
+    quantized.save(buffer, **save_options)
+    return buffer.getvalue()
+
+
+def postprocess_sprite(data: bytes, config: SpritePostprocessConfig) -> ProcessedSprite:
+    if not POSTPROCESS_AVAILABLE:
+        raise RuntimeError("numpy and pillow are required for sprite post-processing")
+
+    with Image.open(io.BytesIO(data)) as source:
+        pixels = np.asarray(source.convert("RGBA"))
+
+    cell, column_offset, row_offset = detect_pixel_grid(pixels, min_sprite_size=config.min_sprite_size)
+    if cell >= 2:
+        # Sample each cell at its centre; borders are where upscalers leave blur.
+        height, width = pixels.shape[:2]
+        rows = (height - row_offset) // cell
+        columns = (width - column_offset) // cell
+        centre = cell // 2
+        sprite = pixels[
+            row_offset + centre : row_offset + rows * cell : cell,
+            column_offset + centre : column_offset + columns * cell : cell,
+        ]
+    else:
+        height, width = pixels.shape[:2]
+        scale = max(1, -(-max(height, width) // max(1, config.fallback_size)))
+        sprite = pixels[scale // 2 :: scale, scale // 2 :: scale]
+
+    sprite = np.ascontiguousarray(sprite)
+    return ProcessedSprite(
+        data=_encode_png(sprite, config.palette_size),
+        mime_type="image/png",
+        width=int(sprite.shape[1]),
+        height=int(sprite.shape[0]),
+        cell_size=cell,
+    )
+
+
+async def apply_sprite_postprocess(data: bytes, mime_type: str, config: SpritePostprocessConfig) -> tuple[bytes, str]:
+    if not config.active:
+        return data, mime_type
+    try:
+        processed = await asyncio.to_thread(postprocess_sprite, data, config)
+    except Exception:
+        logger.warning("sprite post-processing failed; keeping the original image", exc_info=True)
+        return data, mime_type
+    return processed.data, processed.mime_type
+
+
+def sprite_postprocess_config_from_env() -> SpritePostprocessConfig:
+    config = SpritePostprocessConfig(
+        enabled=env_bool("SPRITE_POSTPROCESS", False),
+        palette_size=env_int("SPRITE_PALETTE_SIZE", DEFAULT_PALETTE_SIZE),
+        min_sprite_size=env_int("SPRITE_MIN_SIZE", DEFAULT_MIN_SPRITE_SIZE),
+        fallback_size=env_int("SPRITE_FALLBACK_SIZE", DEFAULT_FALLBACK_SIZE),
+    )
+    if config.enabled and not POSTPROCESS_AVAILABLE:
+        logger.warning("SPRITE_POSTPROCESS is enabled but numpy/pillow are not installed; skipping post-processing")
+    return config
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from runtime.env import env_bool, env_float, env_str
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREWARM_INTERVAL_SECONDS = 1.0
+DEFAULT_IDLE_POLL_SECONDS = 0.25
+
+
+@dataclass(frozen=True)
+class PrewarmItem:
+    entity_type: str
+    prompt_hint: str | None = None
+
+
+def parse_prewarm_list(raw: str | None) -> list[PrewarmItem]:
+    items: list[PrewarmItem] = []
+    seen: set[PrewarmItem] = set()
+    for chunk in (raw or "").split(","):
+        entity_type, _, prompt_hint = chunk.partition(":")
+        item = PrewarmItem(entity_type=entity_type.strip(), prompt_hint=prompt_hint.strip() or None)
+        if item.entity_type and item not in seen:
+            seen.add(item)
+            items.append(item)
+    return items
+
+
+class SpritePrewarmer:
+    def __init__(
+        self,
+        items: list[PrewarmItem],
+        *,
+        interval_seconds: float = DEFAULT_PREWARM_INTERVAL_SECONDS,
+        idle_poll_seconds: float = DEFAULT_IDLE_POLL_SECONDS,
+        gates_readiness: bool = False,
+    ) -> None:
+        self.items = list(items)
+        self.interval_seconds = max(0.0, interval_seconds)
+        self.idle_poll_seconds = max(0.001, idle_poll_seconds)
+        self.gates_readiness = gates_readiness
+        self.completed = 0
+        self.failed = 0
+        self._task: asyncio.Task[None] | None = None
+        self._finished = not self.items
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    @property
+    def ready(self) -> bool:
+        return self._finished or not self.gates_readiness
+
+    def start(self, resolve: Callable[[PrewarmItem], Awaitable[Any]], admission: Any) -> asyncio.Task[None] | None:
+        if self._task is None and self.items:
+            self._task = asyncio.ensure_future(self.run(resolve, admission))
+        return self._task
+
+    async def run(self, resolve: Callable[[PrewarmItem], Awaitable[Any]], admission: Any) -> None:
+        try:
+            for index, item in enumerate(self.items):
+                await self._wait_for_idle_backend(admission)
+                try:
+                    await resolve(item)
+                    self.completed += 1
+                except Exception:
+                    self.failed += 1
+                    logger.warning("sprite prewarm failed for %s", item.entity_type, exc_info=True)
+                if index + 1 < len(self.items):
+                    await asyncio.sleep(self.interval_seconds)
+        finally:
+            self._finished = True
+
+    async def _wait_for_idle_backend(self, admission: Any) -> None:
+        # Interactive requests always win: only take a slot when nobody is queued and
+        # at least one more slot stays free for a player.
+        while admission.waiting > 0 or admission.in_flight >= max(1, admission.max_in_flight - 1):
+            await asyncio.sleep(self.idle_poll_seconds)
+
+    async def aclose(self) -> None:
+        if self._task is None or self._task.done():
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def create_sprite_prewarmer_from_env() -> SpritePrewarmer:
+    return SpritePrewarmer(
+        parse_prewarm_list(env_str("SPRITE_PREWARM")),
+        interval_seconds=env_float("SPRITE_PREWARM_INTERVAL_SECONDS", DEFAULT_PREWARM_INTERVAL_SECONDS),
+        gates_readiness=env_bool("SPRITE_PREWARM_GATES_HEALTH", False),
+    )
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from runtime.env import env_bool, env_float, env_int
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.8
+DEFAULT_MAX_INDEXED_SPRITES = 50_000
+MINHASH_PERMUTATIONS = 64
+LSH_ROWS_PER_BAND = 4
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+SPRITE_ALIASES = {
+    "wolves": "wolf",
+    "狼": "wolf",
+    "オオカミ": "wolf",
+    "おおかみ": "wolf",
+    "木": "tree",
+    "樹": "tree",
+    "スライム": "slime",
+    "ドラゴン": "dragon",
+    "竜": "dragon",
+    "龍": "dragon",
+    "水晶": "crystal",
+    "クリスタル": "crystal",
+    "岩": "rock",
+    "花": "flower",
+    "猫": "cat",
+    "ねこ": "cat",
+    "犬": "dog",
+    "いぬ": "dog",
+    "鳥": "bird",
+    "魚": "fish",
+    "剣": "sword",
+    "宝箱": "chest",
+    "骸骨": "skeleton",
+    "赤い": "red",
+    "赤": "red",
+    "あかい": "red",
+    "青い": "blue",
+    "青": "blue",
+    "緑": "green",
+    "黄色い": "yellow",
+    "黄色": "yellow",
+    "黒い": "black",
+    "黒": "black",
+    "白い": "white",
+    "白": "white",
+    "大きい": "big",
+    "小さい": "small",
+    "large": "big",
+    "huge": "big",
+    "tiny": "small",
+    "little": "small",
+    "crimson": "red",
+    "scarlet": "red",
+}
+
+STOPWORDS = {"a", "an", "the", "of", "and", "with", "in", "on", "の", "と", "な"}
+
+# Tokens that change what the sprite looks like; a near-duplicate only counts when these match exactly.
+ATTRIBUTE_TOKENS = {
+    "red", "blue", "green", "yellow", "black", "white", "purple", "orange", "pink", "brown", "gray", "grey",
+    "gold", "golden", "silver", "rainbow", "dark", "neon",
+    "fire", "ice", "water", "stone", "rock", "wood", "wooden", "iron", "steel", "metal", "crystal", "glass",
+    "bone", "shadow", "lava", "poison",
+}
+
+# Singular words that only look plural.
+_NOT_PLURAL = {"lens", "atlas", "canvas", "chaos", "gas", "bus", "octopus", "walrus", "pegasus"}
+_PLURAL_ES_STEMS = ("ss", "sh", "ch", "x", "z")
+
+_MAX_ALIAS_LENGTH = max(len(alias) for alias in SPRITE_ALIASES)
+
+
+def _segment(token: str) -> list[str]:
+    # Japanese has no spaces: "赤い狼" has to be split on known aliases, longest first.
+    if token.isascii() or token in SPRITE_ALIASES:
+        return [token]
+    pieces: list[str] = []
+    rest = ""
+    index = 0
+    while index < len(token):
+        for length in range(min(_MAX_ALIAS_LENGTH, len(token) - index), 0, -1):
+            if token[index : index + length] in SPRITE_ALIASES:
+                if rest:
+                    pieces.append(rest)
+                    rest = ""
+                pieces.append(token[index : index + length])
+                index += length
+                break
+        else:
+            rest += token[index]
+            index += 1
+    if rest:
+        pieces.append(rest)
+    return pieces
+
+
+def _canonical_token(token: str) -> str:
+    token = SPRITE_ALIASES.get(token, token)
+    if not token.isascii() or len(token) <= 3 or not token.endswith("s") or token in _NOT_PLURAL:
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("es") and token[:-2].endswith(_PLURAL_ES_STEMS):
+        return token[:-2]
+    if token.endswith(("ss", "us", "is")):
+        return token
+    return token[:-1]
+
+
+def canonical_sprite_tokens(entity_type: str, prompt_hint: str | None = None) -> tuple[str, ...]:
+    text = unicodedata.normalize("NFKC", f"{entity_type} {prompt_hint or ''}").casefold()
+    tokens = {
+        _canonical_token(piece)
+        for token in _TOKEN_PATTERN.findall(text)
+        for piece in _segment(token)
+    }
+    return tuple(sorted(token for token in tokens if token and token not in STOPWORDS))
+
+
+def _shingles(tokens: tuple[str, ...]) -> frozenset[str]:
+    shingles = {f"w:{token}" for token in tokens}
+    for token in tokens:
+        padded = f"#{token}#"
+        shingles.update(padded[index : index + 3] for index in range(max(1, len(padded) - 2)))
+    return frozenset(shingles)
+
+
+def jaccard(left: frozenset[str], right: frozenset[str]) -> float:
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+class MinHasher:
+    def __init__(self, *, num_perm: int = MINHASH_PERMUTATIONS, seed: int = 1) -> None:
+        rng = random.Random(seed)
+        self._params = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    def signature(self, shingles: frozenset[str]) -> tuple[int, ...]:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+            for shingle in shingles
+        ]
+        return tuple(min((a * value + b) % _MERSENNE_PRIME for value in hashes) for a, b in self._params)
+
+
+@dataclass(frozen=True)
+class _IndexedSprite:
+    namespace: str
+    canonical: str
+    attributes: frozenset[str]
+    shingles: frozenset[str]
+    buckets: tuple[tuple[str, int, tuple[int, ...]], ...]
+
+
+@dataclass(frozen=True)
+class SimilarMatch:
+    cache_key: str
+    score: float
+
+
+class SimilarSpriteIndex:
+    def __init__(
+        self,
+        *,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_INDEXED_SPRITES,
+        enabled: bool = True,
+        num_perm: int = MINHASH_PERMUTATIONS,
+        rows_per_band: int = LSH_ROWS_PER_BAND,
+    ) -> None:
+        self.threshold = min(1.0, max(0.0, threshold))
+        self.enabled = enabled
+        self._max_entries = max(1, max_entries)
+        self._rows = max(1, rows_per_band)
+        self._hasher = MinHasher(num_perm=max(self._rows, num_perm))
+        self._entries: OrderedDict[str, _IndexedSprite] = OrderedDict()
+        self._exact: dict[tuple[str, str], str] = {}
+        self._buckets: dict[tuple[str, int, tuple[int, ...]], set[str]] = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, namespace: str, entity_type: str, prompt_hint: str | None, cache_key: str) -> None:
+        if not self.enabled:
+            return
+        if cache_key in self._entries:
+            self._entries.move_to_end(cache_key)
+            return
+        tokens = canonical_sprite_tokens(entity_type, prompt_hint)
+        if not tokens:
+            return
+        shingles = _shingles(tokens)
+        indexed = _IndexedSprite(
+            namespace=namespace,
+            canonical=" ".join(tokens),
+            attributes=ATTRIBUTE_TOKENS.intersection(tokens),
+            shingles=shingles,
+            buckets=self._bucket_keys(namespace, shingles),
+        )
+        self._entries[cache_key] = indexed
+        self._exact.setdefault((namespace, indexed.canonical), cache_key)
+        for bucket in indexed.buckets:
+            self._buckets.setdefault(bucket, set()).add(cache_key)
+        while len(self._entries) > self._max_entries:
+            self.discard(next(iter(self._entries)))
+
+    def discard(self, cache_key: str) -> None:
+        indexed = self._entries.pop(cache_key, None)
+        if indexed is None:
+            return
+        if self._exact.get((indexed.namespace, indexed.canonical)) == cache_key:
+            del self._exact[(indexed.namespace, indexed.canonical)]
+        for bucket in indexed.buckets:
+            members = self._buckets.get(bucket)
+            if members is None:
+                continue
+            members.discard(cache_key)
+            if not members:
+                del self._buckets[bucket]
+
+    def lookup(self, namespace: str, entity_type: str, prompt_hint: str | None = None) -> SimilarMatch | None:
+        if not self.enabled:
+            return None
+        tokens = canonical_sprite_tokens(entity_type, prompt_hint)
+        if not tokens:
+            return None
+        self.lookups += 1
+        exact = self._exact.get((namespace, " ".join(tokens)))
+        if exact is not None:
+            self.hits += 1
+            self._entries.move_to_end(exact)
+            return SimilarMatch(exact, 1.0)
+        if self.threshold >= 1.0:
+            return None
+
+        shingles = _shingles(tokens)
+        attributes = ATTRIBUTE_TOKENS.intersection(tokens)
+        candidates: set[str] = set()
+        for bucket in self._bucket_keys(namespace, shingles):
+            candidates.update(self._buckets.get(bucket, ()))
+        best: SimilarMatch | None = None
+        for cache_key in candidates:
+            indexed = self._entries[cache_key]
+            if indexed.attributes != attributes:
+                continue
+            score = jaccard(shingles, indexed.shingles)
+            if score >= self.threshold and (best is None or score > best.score):
+                best = SimilarMatch(cache_key, score)
+        if best is not None:
+            self.hits += 1
+            self._entries.move_to_end(best.cache_key)
+        return best
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._exact.clear()
+        self._buckets.clear()
+        self.lookups = 0
+        self.hits = 0
+
+    def _bucket_keys(self, namespace: str, shingles: frozenset[str]) -> tuple[tuple[str, int, tuple[int, ...]], ...]:
+        signature = self._hasher.signature(shingles)
+        rows = self._rows
+        return tuple(
+            (namespace, band, signature[band * rows : (band + 1) * rows]) for band in range(len(signature) // rows)
+        )
+
+
+def create_similar_sprite_index_from_env() -> SimilarSpriteIndex:
+    return SimilarSpriteIndex(
+        threshold=env_float("SPRITE_SIMILARITY_THRESHOLD", DEFAULT_SIMILARITY_THRESHOLD),
+        max_entries=env_int("SPRITE_SIMILARITY_MAX_ENTRIES", DEFAULT_MAX_INDEXED_SPRITES),
+        enabled=env_bool("SPRITE_SIMILARITY", True),
+    )
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+
+from runtime.env import env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BUDGET_BYTES = 64 * 1024 * 1024
+DEFAULT_DISK_BUDGET_BYTES = 512 * 1024 * 1024
+
+
+def sprite_cache_key(prompt: str, model: str, variant: str = "") -> str:
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(prompt.encode("utf-8"))
+    if variant:
+        digest.update(b"\x00")
+        digest.update(variant.encode("utf-8"))
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class SpriteCacheEntry:
+    data: bytes
+    mime_type: str
+    # Downscaled copies keyed by their longest edge in pixels, largest first.
+    variants: tuple[tuple[int, SpriteCacheEntry], ...] = ()
+
+    @property
+    def size(self) -> int:
+        return len(self.data) + sum(variant.size for _, variant in self.variants)
+
+    def variant(self, size: int | None) -> SpriteCacheEntry:
+        # Smallest stored level that still covers the requested size; never upscale.
+        best = self
+        if size and size > 0:
+            for edge, variant in self.variants:
+                if edge >= size:
+                    best = variant
+        return best
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.data).decode("utf-8")
+
+    @cached_property
+    def etag(self) -> str:
+        return f'"{hashlib.sha256(self.data).hexdigest()[:32]}"'
+
+
+@dataclass
+class SpriteCacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    memory_bytes: int = 0
+    memory_entries: int = 0
+    disk_evictions: int = 0
+    disk_bytes: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "memory_bytes": self.memory_bytes,
+            "memory_entries": self.memory_entries,
+            "disk_evictions": self.disk_evictions,
+            "disk_bytes": self.disk_bytes,
+        }
+
+
+class SpriteCache:
+    def __init__(
+        self,
+        *,
+        max_memory_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES,
+        disk_dir: str | Path | None = None,
+        max_disk_bytes: int = DEFAULT_DISK_BUDGET_BYTES,
+    ) -> None:
+        self._max_memory_bytes = max(0, max_memory_bytes)
+        self._max_disk_bytes = max(0, max_disk_bytes)
+        self._disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries: OrderedDict[str, SpriteCacheEntry] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = SpriteCacheStats()
+        # Bytes per key on disk, oldest first; built from the directory on first use.
+        self._disk_index: OrderedDict[str, int] | None = None
+        self._disk_bytes = 0
+        self._disk_lock = threading.Lock()
+
+    @property
+    def disk_dir(self) -> Path | None:
+        return self._disk_dir
+
+    def stats(self) -> SpriteCacheStats:
+        with self._lock:
+            return SpriteCacheStats(
+                memory_hits=self._stats.memory_hits,
+                disk_hits=self._stats.disk_hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                memory_bytes=self._memory_bytes,
+                memory_entries=len(self._entries),
+                disk_evictions=self._stats.disk_evictions,
+                disk_bytes=self._disk_bytes,
+            )
+
+    def get_memory(self, key: str) -> SpriteCacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats.memory_hits += 1
+            return entry
+
+    async def get(self, key: str) -> SpriteCacheEntry | None:
+        entry = self.get_memory(key)
+        if entry is not None:
+            return entry
+
+        if self._disk_dir is not None:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                with self._lock:
+                    self._stats.disk_hits += 1
+                self._store_memory(key, entry)
+                return entry
+
+        with self._lock:
+            self._stats.misses += 1
+        return None
+
+    async def put(self, key: str, entry: SpriteCacheEntry) -> None:
+        self._store_memory(key, entry)
+        if self._disk_dir is None:
+            return
+        try:
+            await asyncio.to_thread(self._write_disk, key, entry)
+        except OSError:
+            logger.warning("failed to persist sprite cache entry %s", key, exc_info=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            self._stats = SpriteCacheStats()
+
+    def _store_memory(self, key: str, entry: SpriteCacheEntry) -> None:
+        if entry.size > self._max_memory_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous.size
+            self._entries[key] = entry
+            self._memory_bytes += entry.size
+            while self._memory_bytes > self._max_memory_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._memory_bytes -= evicted.size
+                self._stats.evictions += 1
+
+    def _entry_paths(self, key: str) -> tuple[Path, Path]:
+        assert self._disk_dir is not None
+        shard = self._disk_dir / key[:2]
+        return shard / f"{key}.bin", shard / f"{key}.json"
+
+    def _read_disk(self, key: str) -> SpriteCacheEntry | None:
+        data_path, meta_path = self._entry_paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            data = data_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        if not data or not isinstance(meta, dict):
+            return None
+        variants = []
+        for edge in meta.get("variants") or []:
+            try:
+                variant_data = self._variant_path(data_path, int(edge)).read_bytes()
+            except (OSError, TypeError, ValueError):
+                continue
+            variants.append((int(edge), SpriteCacheEntry(data=variant_data, mime_type="image/png")))
+        self._touch_disk(key)
+        return SpriteCacheEntry(
+            data=data,
+            mime_type=str(meta.get("mime_type") or "image/png"),
+            variants=tuple(sorted(variants, key=lambda item: item[0], reverse=True)),
+        )
+
+    @staticmethod
+    def _variant_path(data_path: Path, edge: int) -> Path:
+        return data_path.with_name(f"{data_path.stem}.{edge}.bin")
+
+    def _write_disk(self, key: str, entry: SpriteCacheEntry) -> None:
+        meta = {"mime_type": entry.mime_type, "variants": [edge for edge, _ in entry.variants]}
+        meta_bytes = json.dumps(meta).encode("utf-8")
+        size = entry.size + len(meta_bytes)
+        if size > self._max_disk_bytes:
+            return
+        data_path, meta_path = self._entry_paths(key)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write the payload before the metadata so a reader never sees metadata without data.
+        _atomic_write(data_path, entry.data)
+        for edge, variant in entry.variants:
+            _atomic_write(self._variant_path(data_path, edge), variant.data)
+        _atomic_write(meta_path, meta_bytes)
+
+        with self._disk_lock:
+            index = self._load_disk_index()
+            self._disk_bytes += size - index.pop(key, 0)
+            index[key] = size
+            while self._disk_bytes > self._max_disk_bytes and index:
+                evicted_key, evicted_size = index.popitem(last=False)
+                self._disk_bytes -= evicted_size
+                self._remove_disk(evicted_key)
+                with self._lock:
+                    self._stats.disk_evictions += 1
+
+    def _touch_disk(self, key: str) -> None:
+        with self._disk_lock:
+            index = self._load_disk_index()
+            if key in index:
+                index.move_to_end(key)
+
+    def _load_disk_index(self) -> OrderedDict[str, int]:
+        if self._disk_index is not None:
+            return self._disk_index
+        assert self._disk_dir is not None
+        sizes: dict[str, int] = {}
+        touched: dict[str, float] = {}
+        for path in self._disk_dir.glob("*/*"):
+            if path.name.endswith(".tmp"):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            key = path.name.split(".", 1)[0]
+            sizes[key] = sizes.get(key, 0) + stat.st_size
+            touched[key] = max(touched.get(key, 0.0), stat.st_mtime)
+        self._disk_index = OrderedDict((key, sizes[key]) for key in sorted(sizes, key=touched.__getitem__))
+        self._disk_bytes = sum(sizes.values())
+        return self._disk_index
+
+    def _remove_disk(self, key: str) -> None:
+        data_path, meta_path = self._entry_paths(key)
+        # Metadata goes first so a concurrent reader sees a miss rather than a partial entry.
+        for path in (meta_path, *data_path.parent.glob(f"{key}.*")):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            except OSError:
+                logger.warning("failed to evict sprite cache file %s", path, exc_info=True)
+
+
+def _atomic_write(path: Path, payload: bytes) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, path)
+
+
+def create_sprite_cache_from_env() -> SpriteCache:
+    return SpriteCache(
+        max_memory_bytes=env_int("SPRITE_CACHE_MAX_BYTES", DEFAULT_MEMORY_BUDGET_BYTES),
+        disk_dir=env_str("SPRITE_CACHE_DIR"),
+        max_disk_bytes=env_int("SPRITE_CACHE_DISK_MAX_BYTES", DEFAULT_DISK_BUDGET_BYTES),
+    )
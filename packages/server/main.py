@@ -4,18 +4,22 @@ import asyncio
 import base64
 import json
 import logging
+import math
 import os
-from typing import Any, AsyncIterable, Optional
+import time
+from typing import Annotated, Any, AsyncIterable, Optional
 
 try:
-    from fastapi import FastAPI, HTTPException, WebSocket
+    from fastapi import FastAPI, Header, HTTPException, Query, Request, WebSocket
+    from fastapi.responses import Response, StreamingResponse
     from pydantic import BaseModel
 except Exception:  # pragma: no cover
     class HTTPException(Exception):  # type: ignore[override]
-        def __init__(self, status_code: int, detail: str):
+        def __init__(self, status_code: int, detail: str, headers: dict[str, str] | None = None):
             super().__init__(detail)
             self.status_code = status_code
             self.detail = detail
+            self.headers = headers
 
     class WebSocket:  # type: ignore[override]
         pass
@@ -27,7 +31,7 @@ except Exception:  # pragma: no cover
 
             return decorator
 
-        def post(self, _path: str):
+        def post(self, _path: str, **_kwargs: Any):
             def decorator(func):
                 return func
 
@@ -39,9 +43,42 @@ except Exception:  # pragma: no cover
 
             return decorator
 
+        def on_event(self, _event_type: str):
+            def decorator(func):
+                return func
+
+            return decorator
+
     class BaseModel:  # type: ignore[override]
         pass
 
+    class Response:  # type: ignore[override]
+        def __init__(
+            self,
+            content: bytes = b"",
+            status_code: int = 200,
+            headers: dict[str, str] | None = None,
+            media_type: str | None = None,
+        ):
+            self.body = content
+            self.status_code = status_code
+            self.headers = dict(headers or {})
+            self.media_type = media_type
+
+    class Request:  # type: ignore[override]
+        client = None
+
+    def Header(*_args: Any, **_kwargs: Any) -> Any:  # type: ignore[override]  # noqa: N802
+        return None
+
+    def Query(*_args: Any, **_kwargs: Any) -> Any:  # type: ignore[override]  # noqa: N802
+        return None
+
+    class StreamingResponse:  # type: ignore[override]
+        def __init__(self, content: Any, media_type: str | None = None):
+            self.body_iterator = content
+            self.media_type = media_type
+
 
 try:
     from google.adk.agents.live_request_queue import LiveRequestQueue as AdkLiveRequestQueue
@@ -62,12 +99,63 @@ except Exception:  # pragma: no cover
 
 
 from agent.world_agent import create_world_agent
+from image_agent.atlas import ATLAS_AVAILABLE, create_sprite_atlas_store_from_env, frame_uv
+from image_agent.backends import create_fallback_image_backend_from_env, create_image_backend_from_env
+from image_agent.batch import batch_concurrency_from_env, batch_max_items_from_env, iterate_bounded
+from image_agent.admission import AdmissionRejected, create_admission_controller_from_env
+from image_agent.client_pool import GenaiClientPool
+from image_agent.hedging import create_hedged_image_backend_from_env
+from image_agent.jobs import (
+    DEFAULT_JOB_PRIORITY,
+    JOB_DONE,
+    JOB_FAILED,
+    ImageJob,
+    JobQueueFull,
+    clamp_client_priority,
+    create_image_job_queue_from_env,
+    new_job_id,
+)
+from image_agent.mipmaps import build_sprite_variants, mip_sizes_from_env
+from image_agent.negative_cache import (
+    FAILURE_PERMANENT,
+    PERMANENT_FAILURE_STATUS,
+    CachedSpriteFailure,
+    classify_failure,
+    create_negative_sprite_cache_from_env,
+)
+from image_agent.postprocess import apply_sprite_postprocess, sprite_postprocess_config_from_env
+from image_agent.prewarm import PrewarmItem, create_sprite_prewarmer_from_env
+from image_agent.similarity import create_similar_sprite_index_from_env
+from image_agent.singleflight import SingleFlight
+from image_agent.sprite_cache import SpriteCacheEntry, create_sprite_cache_from_env, sprite_cache_key
+from runtime.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, MarkTimer
+from runtime.rate_limit import (
+    WS_CLOSE_POLICY_VIOLATION,
+    WS_CLOSE_TRY_AGAIN_LATER,
+    RateLimitExceeded,
+    client_address,
+    concurrency_limiter_from_env,
+    retry_after_header,
+    token_bucket_from_env,
+    trusted_proxy_hops_from_env,
+)
+from voice.events import encode_adk_event
+from voice.frames import AudioFrameWriter, negotiated_audio_subprotocol
+from voice.live import LiveRuntime
+from voice.sessions import bounded_session_service_from_env, call_session_api
+from voice.sender import DownstreamSender, SlowConsumerError, sender_config_from_env
+from voice.upstream import CoalescingAudioSink, upstream_audio_config_from_env
+from voice.vad import VoiceActivityGate, vad_config_from_env
+from voice.world_patch import extract_world_patch
 
 logger = logging.getLogger(__name__)
 app = FastAPI()
 
 APP_NAME = "ego-voice-agent"
 IMAGE_GENERATION_MODEL = "gemini-2.0-flash-preview-image-generation"
+SPRITE_CACHE_CONTROL = os.getenv("SPRITE_CACHE_CONTROL", "public, max-age=86400")
+# The sprite routes negotiate JSON vs raw bytes on Accept, so shared caches must key on it.
+SPRITE_VARY = "Accept"
 
 
 class GenerateImageRequest(BaseModel):
@@ -75,6 +163,22 @@ class GenerateImageRequest(BaseModel):
     prompt_hint: Optional[str] = None
 
 
+class GenerateImagesRequest(BaseModel):
+    items: list[GenerateImageRequest]
+    stream: bool = False
+
+
+class ImageJobRequest(GenerateImageRequest):
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
+    priority: int = DEFAULT_JOB_PRIORITY
+
+
+class SpriteAtlasRequest(BaseModel):
+    items: list[GenerateImageRequest]
+    atlas_id: str = "default"
+
+
 class InMemorySessionService:
     def __init__(self) -> None:
         self._sessions: dict[tuple[str, str], dict[str, str]] = {}
@@ -87,6 +191,9 @@ class InMemorySessionService:
         self._sessions[(user_id, session_id)] = session
         return session
 
+    async def delete_session(self, user_id: str, session_id: str) -> None:
+        self._sessions.pop((user_id, session_id), None)
+
 
 class _LiveRequestQueue:
     async def send_realtime(self, _payload: dict[str, Any]) -> None:
@@ -106,7 +213,87 @@ class _Runner:
 
 
 VOICE_AGENT = create_world_agent()
-SESSION_SERVICE = AdkInMemorySessionService() if ADK_AVAILABLE and AdkInMemorySessionService is not None else InMemorySessionService()
+SPRITE_CACHE = create_sprite_cache_from_env()
+SPRITE_FLIGHTS: SingleFlight[SpriteCacheEntry] = SingleFlight()
+IMAGE_ADMISSION = create_admission_controller_from_env()
+IMAGE_CLIENT_POOL = GenaiClientPool()
+IMAGE_BACKEND = create_hedged_image_backend_from_env(
+    create_image_backend_from_env(IMAGE_CLIENT_POOL, model=IMAGE_GENERATION_MODEL),
+    create_fallback_image_backend_from_env(IMAGE_CLIENT_POOL),
+    admission=IMAGE_ADMISSION,
+)
+IMAGE_BATCH_CONCURRENCY = batch_concurrency_from_env()
+IMAGE_BATCH_MAX_ITEMS = batch_max_items_from_env()
+SPRITE_POSTPROCESS = sprite_postprocess_config_from_env()
+SPRITE_MIP_SIZES = mip_sizes_from_env()
+SPRITE_SIMILARITY = create_similar_sprite_index_from_env()
+SPRITE_FAILURES = create_negative_sprite_cache_from_env()
+SPRITE_ATLASES = create_sprite_atlas_store_from_env()
+SPRITE_PREWARMER = create_sprite_prewarmer_from_env()
+IMAGE_JOBS = create_image_job_queue_from_env()
+VOICE_CONNECTIONS: dict[tuple[str, str], DownstreamSender] = {}
+IMAGE_RATE_LIMIT = token_bucket_from_env("IMAGE_RATE_LIMIT", 1.0, 30)
+TRUSTED_PROXY_HOPS = trusted_proxy_hops_from_env()
+VOICE_SESSION_LIMIT = concurrency_limiter_from_env("VOICE_MAX_SESSIONS_PER_USER", 2)
+# Charged in bytes so the limit is independent of how the client frames its audio: 16 kHz PCM16 is 32 KB/s, and
+# every message costs at least one 128-sample worklet frame so floods of tiny messages are still bounded.
+VOICE_UPSTREAM_RATE_LIMIT = token_bucket_from_env("VOICE_UPSTREAM_BYTE_LIMIT", 64_000.0, 128_000)
+VOICE_UPSTREAM_MIN_MESSAGE_BYTES = 256
+UPSTREAM_AUDIO = upstream_audio_config_from_env()
+VOICE_VAD = vad_config_from_env()
+VOICE_SENDER = sender_config_from_env()
+VOICE_SESSION_METRICS: dict[tuple[str, str], dict[str, Any]] = {}
+VOICE_UPSTREAM_BYTES = REGISTRY.counter("ego_voice_upstream_bytes_total", "Bytes received from voice clients.")
+VOICE_UPSTREAM_MESSAGES = REGISTRY.counter("ego_voice_upstream_messages_total", "Messages received from voice clients.")
+VOICE_DOWNSTREAM_EVENTS = REGISTRY.counter(
+    "ego_voice_downstream_events_total", "Frames queued for voice clients by frame type.", ("type",)
+)
+VOICE_ADK_FRAMES = VOICE_DOWNSTREAM_EVENTS.labels("adkEvent")
+VOICE_AUDIO_FRAMES = VOICE_DOWNSTREAM_EVENTS.labels("audio")
+VOICE_PATCH_FRAMES = VOICE_DOWNSTREAM_EVENTS.labels("worldPatch")
+VOICE_WORLD_PATCHES = REGISTRY.counter("ego_voice_world_patches_total", "World patches emitted to voice clients.")
+VOICE_RESPONSE_LATENCY = REGISTRY.histogram(
+    "ego_voice_response_latency_seconds",
+    "Time from the end of user speech to the first model audio. Only recorded with VOICE_VAD, which detects the end.",
+)
+IMAGE_GENERATION_LATENCY = REGISTRY.histogram(
+    "ego_image_generation_seconds", "Image backend generation latency by outcome.", ("outcome",)
+)
+REGISTRY.gauge_callback("ego_voice_sessions_active", "Open voice sessions.", lambda: len(VOICE_CONNECTIONS))
+REGISTRY.counter_callback("ego_image_cache_hits_total", "Sprite cache hits.", lambda: SPRITE_CACHE.stats().hits)
+REGISTRY.counter_callback("ego_image_cache_misses_total", "Sprite cache misses.", lambda: SPRITE_CACHE.stats().misses)
+REGISTRY.gauge_callback("ego_image_generations_in_flight", "Admitted generations.", lambda: IMAGE_ADMISSION.in_flight)
+REGISTRY.gauge_callback("ego_image_generations_waiting", "Queued generations.", lambda: IMAGE_ADMISSION.waiting)
+REGISTRY.counter_callback(
+    "ego_image_generations_rejected_total", "Generations shed by admission.", lambda: IMAGE_ADMISSION.rejected
+)
+REGISTRY.gauge_callback("ego_image_sprite_flights", "Distinct sprites being generated.", SPRITE_FLIGHTS.in_flight)
+VOICE_SESSIONS_EVICTED = REGISTRY.counter("ego_voice_sessions_evicted_total", "Idle sessions evicted from the store.")
+
+
+def _release_evicted_session(user_id: str, session_id: str) -> None:
+    # Held sessions are never evicted, so anything still keyed on this one outlived its connection.
+    key = (user_id, session_id)
+    VOICE_CONNECTIONS.pop(key, None)
+    VOICE_SESSION_METRICS.pop(key, None)
+    # The upstream bucket is per user, so it goes only once none of the user's sessions is connected.
+    if not any(connected_user == user_id for connected_user, _ in VOICE_CONNECTIONS):
+        VOICE_UPSTREAM_RATE_LIMIT.discard(user_id)
+    VOICE_SESSIONS_EVICTED.inc()
+    logger.debug("evicted idle voice session %s/%s", user_id, session_id)
+
+
+def create_session_service() -> Any:
+    if ADK_AVAILABLE and AdkInMemorySessionService is not None:
+        inner = AdkInMemorySessionService()
+    else:
+        inner = InMemorySessionService()
+    return bounded_session_service_from_env(inner, app_name=APP_NAME, on_evict=_release_evicted_session)
+
+
+SESSION_SERVICE = create_session_service()
+REGISTRY.gauge_callback("ego_voice_sessions_stored", "Sessions in the session store.", lambda: len(SESSION_SERVICE))
+VOICE_RUNTIME = LiveRuntime(lambda: create_runner(SESSION_SERVICE), lambda: build_runtime_run_config())
 
 
 def create_runner(session_service: Any) -> Any:
@@ -132,58 +319,451 @@ def build_pixel_art_prompt(entity_type: str, prompt_hint: str | None = None) ->
 
 
 async def _generate_image_base64(prompt: str) -> tuple[str, str]:
-    project = os.getenv("GOOGLE_CLOUD_PROJECT")
-    location = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
-    if not project:
-        raise RuntimeError("GOOGLE_CLOUD_PROJECT is required")
+    return await IMAGE_BACKEND.generate(prompt)
+
 
+async def _generate_sprite_entry(prompt: str, cache_key: str) -> SpriteCacheEntry:
     try:
-        from google import genai  # type: ignore
-    except Exception as exc:  # pragma: no cover
-        raise RuntimeError("google-genai dependency is not installed") from exc
-
-    client = genai.Client(vertexai=True, project=project, location=location)
-    response = client.models.generate_content(model=IMAGE_GENERATION_MODEL, contents=prompt)
-
-    for candidate in getattr(response, "candidates", []) or []:
-        content = getattr(candidate, "content", None)
-        for part in getattr(content, "parts", []) or []:
-            inline_data = getattr(part, "inline_data", None)
-            if inline_data is None:
-                continue
-            data = getattr(inline_data, "data", None)
-            mime_type = getattr(inline_data, "mime_type", "image/png")
-            if not data:
-                continue
-            if isinstance(data, bytes):
-                encoded = base64.b64encode(data).decode("utf-8")
-            else:
-                encoded = str(data)
-            return encoded, str(mime_type or "image/png")
+        async with IMAGE_ADMISSION.admit():
+            started = time.perf_counter()
+            try:
+                image_base64, mime_type = await _generate_image_base64(prompt)
+            except Exception:
+                IMAGE_GENERATION_LATENCY.labels("error").observe(time.perf_counter() - started)
+                raise
+            IMAGE_GENERATION_LATENCY.labels("ok").observe(time.perf_counter() - started)
+    except Exception as exc:
+        SPRITE_FAILURES.record_failure(cache_key, exc)
+        raise
+    SPRITE_FAILURES.record_success(cache_key)
+    data, mime_type = await apply_sprite_postprocess(base64.b64decode(image_base64), mime_type, SPRITE_POSTPROCESS)
+    variants = await build_sprite_variants(data, SPRITE_MIP_SIZES)
+    entry = SpriteCacheEntry(data=data, mime_type=mime_type, variants=variants)
+    await SPRITE_CACHE.put(cache_key, entry)
+    return entry
 
-    raise RuntimeError("No image data returned from Gemini")
 
+def _sprite_key(prompt: str) -> str:
+    return sprite_cache_key(prompt, IMAGE_BACKEND.model, SPRITE_POSTPROCESS.signature)
 
-@app.post("/api/generate-image")
-async def generate_image(request: GenerateImageRequest) -> dict[str, str]:
+
+def _sprite_namespace() -> str:
+    return f"{IMAGE_BACKEND.model}\x00{SPRITE_POSTPROCESS.signature}"
+
+
+async def _resolve_similar_sprite(entity_type: str, prompt_hint: str | None) -> SpriteCacheEntry | None:
+    match = SPRITE_SIMILARITY.lookup(_sprite_namespace(), entity_type, prompt_hint)
+    if match is None:
+        return None
+    cached = await SPRITE_CACHE.get(match.cache_key)
+    if cached is None:
+        SPRITE_SIMILARITY.discard(match.cache_key)
+    return cached
+
+
+async def _resolve_sprite(
+    prompt: str,
+    entity_type: str | None = None,
+    prompt_hint: str | None = None,
+) -> SpriteCacheEntry:
+    cache_key = _sprite_key(prompt)
+    cached = await SPRITE_CACHE.get(cache_key)
+    if cached is None and entity_type:
+        similar = await _resolve_similar_sprite(entity_type, prompt_hint)
+        if similar is not None:
+            return similar
+    if cached is None:
+        SPRITE_FAILURES.check(cache_key)
+    entry = cached or await SPRITE_FLIGHTS.run(cache_key, lambda: _generate_sprite_entry(prompt, cache_key))
+    if entity_type:
+        SPRITE_SIMILARITY.add(_sprite_namespace(), entity_type, prompt_hint, cache_key)
+    return entry
+
+
+def _sprite_prompt(request: GenerateImageRequest) -> str:
     entity_type = request.entity_type.strip() if request.entity_type else ""
     if not entity_type:
         raise HTTPException(status_code=400, detail="entity_type is required")
+    return build_pixel_art_prompt(entity_type, request.prompt_hint)
+
+
+def _sprite_http_error(exc: Exception) -> HTTPException:
+    if isinstance(exc, HTTPException):
+        return exc
+    if isinstance(exc, AdmissionRejected):
+        return HTTPException(
+            status_code=503,
+            detail=str(exc),
+            headers={"Retry-After": str(exc.retry_after_seconds)},
+        )
+    if isinstance(exc, CachedSpriteFailure):
+        return HTTPException(
+            status_code=exc.status_code,
+            detail=str(exc),
+            headers={"Retry-After": str(exc.retry_after_seconds)},
+        )
+    if classify_failure(exc) == FAILURE_PERMANENT:
+        return HTTPException(status_code=PERMANENT_FAILURE_STATUS, detail=str(exc))
+    logger.error("image generation failed", exc_info=exc)
+    return HTTPException(status_code=503, detail=str(exc))
+
+
+def _rate_limit_key(forwarded_for: str | None, http_request: Any = None) -> str | None:
+    # User ids are caller-supplied and unauthenticated, so callers are keyed by address only.
+    peer = getattr(getattr(http_request, "client", None), "host", None)
+    address = client_address(forwarded_for, peer, TRUSTED_PROXY_HOPS)
+    return f"ip:{address}" if address else None
+
 
-    prompt = build_pixel_art_prompt(entity_type, request.prompt_hint)
+def _check_image_rate(key: str | None, cost: int = 1) -> None:
+    if key is None:
+        return
+    wait = IMAGE_RATE_LIMIT.acquire(key, cost)
+    if wait == math.inf:
+        raise HTTPException(status_code=400, detail=f"at most {IMAGE_RATE_LIMIT.burst:g} items are allowed per request")
+    if wait > 0:
+        raise HTTPException(status_code=429, detail="image rate limit exceeded", headers=retry_after_header(wait))
+
+
+def _wants_binary(response_format: str | None, accept: str | None) -> bool:
+    if response_format:
+        return response_format.strip().lower() in {"binary", "raw", "image"}
+    accepted = (accept or "").lower()
+    return "image/" in accepted and "application/json" not in accepted
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _binary_sprite_response(entry: SpriteCacheEntry, if_none_match: str | None) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": SPRITE_CACHE_CONTROL, "Vary": SPRITE_VARY}
+    if _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.data, media_type=entry.mime_type, headers=headers)
+
+
+async def _serve_sprite(
+    request: GenerateImageRequest,
+    response_format: str | None,
+    accept: str | None,
+    if_none_match: str | None,
+    size: int | None = None,
+    rate_key: str | None = None,
+    response: Response | None = None,
+) -> Any:
+    prompt = _sprite_prompt(request)
+    _check_image_rate(rate_key)
     try:
-        image_base64, mime_type = await _generate_image_base64(prompt)
-    except HTTPException:
-        raise
+        entry = await _resolve_sprite(prompt, request.entity_type.strip(), request.prompt_hint)
     except Exception as exc:
-        logger.exception("image generation failed")
-        raise HTTPException(status_code=503, detail=str(exc)) from exc
+        raise _sprite_http_error(exc) from exc
+    entry = entry.variant(size)
+
+    if _wants_binary(response_format, accept):
+        return _binary_sprite_response(entry, if_none_match)
+    if response is not None:
+        response.headers["Vary"] = SPRITE_VARY
+    return {"image_base64": entry.to_base64(), "mime_type": entry.mime_type}
+
+
+@app.post("/api/generate-image")
+async def generate_image(
+    request: GenerateImageRequest,
+    response_format: Annotated[Optional[str], Query(alias="format")] = None,
+    size: Annotated[Optional[int], Query()] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    x_forwarded_for: Annotated[Optional[str], Header()] = None,
+    http_request: Request = None,  # type: ignore[assignment]
+    response: Response = None,  # type: ignore[assignment]
+) -> Any:
+    rate_key = _rate_limit_key(x_forwarded_for, http_request)
+    return await _serve_sprite(request, response_format, accept, if_none_match, size, rate_key, response)
+
+
+@app.get("/api/generate-image")
+async def get_generated_image(
+    entity_type: str,
+    prompt_hint: Optional[str] = None,
+    response_format: Annotated[Optional[str], Query(alias="format")] = None,
+    size: Annotated[Optional[int], Query()] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    x_forwarded_for: Annotated[Optional[str], Header()] = None,
+    http_request: Request = None,  # type: ignore[assignment]
+    response: Response = None,  # type: ignore[assignment]
+) -> Any:
+    request = GenerateImageRequest(entity_type=entity_type, prompt_hint=prompt_hint)
+    rate_key = _rate_limit_key(x_forwarded_for, http_request)
+    return await _serve_sprite(request, response_format, accept, if_none_match, size, rate_key, response)
+
+
+def _batch_result(item: dict[str, Any], outcome: SpriteCacheEntry | BaseException) -> dict[str, Any]:
+    result: dict[str, Any] = {"indices": item["indices"], "entity_type": item["entity_type"]}
+    if isinstance(outcome, SpriteCacheEntry):
+        result.update(status="ok", image_base64=outcome.to_base64(), mime_type=outcome.mime_type)
+        return result
+
+    error = _sprite_http_error(outcome if isinstance(outcome, Exception) else RuntimeError(str(outcome)))
+    result.update(status="error", error={"status_code": error.status_code, "message": str(error.detail)})
+    retry_after = (getattr(error, "headers", None) or {}).get("Retry-After")
+    if retry_after is not None:
+        result["error"]["retry_after"] = int(retry_after)
+    return result
+
+
+def _dedupe_sprite_requests(requests: list[GenerateImageRequest]) -> list[dict[str, Any]]:
+    if not requests:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+    if len(requests) > IMAGE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"at most {IMAGE_BATCH_MAX_ITEMS} items are allowed")
+
+    unique: dict[str, dict[str, Any]] = {}
+    for index, item_request in enumerate(requests):
+        try:
+            key = _sprite_prompt(item_request)
+            item: dict[str, Any] = {"prompt": key}
+        except HTTPException as exc:
+            key = f"invalid:{index}"
+            item = {"error": exc}
+        item = unique.setdefault(
+            key,
+            {**item, "indices": [], "entity_type": item_request.entity_type, "prompt_hint": item_request.prompt_hint},
+        )
+        item["indices"].append(index)
+    return list(unique.values())
+
+
+async def _iterate_sprite_outcomes(items: list[dict[str, Any]]):
+    async def worker(item: dict[str, Any]) -> SpriteCacheEntry:
+        if "error" in item:
+            raise item["error"]
+        return await _resolve_sprite(item["prompt"], item["entity_type"].strip(), item["prompt_hint"])
+
+    async for item, outcome in iterate_bounded(items, worker, concurrency=IMAGE_BATCH_CONCURRENCY):
+        yield item, outcome
+
+
+async def _iterate_batch(items: list[dict[str, Any]]):
+    async for item, outcome in _iterate_sprite_outcomes(items):
+        yield _batch_result(item, outcome)
+
+
+@app.post("/api/generate-images")
+async def generate_images(
+    request: GenerateImagesRequest,
+    x_forwarded_for: Annotated[Optional[str], Header()] = None,
+    http_request: Request = None,  # type: ignore[assignment]
+) -> Any:
+    items = _dedupe_sprite_requests(request.items)
+    _check_image_rate(_rate_limit_key(x_forwarded_for, http_request), len(items))
+
+    if request.stream:
+        async def ndjson_lines():
+            async for result in _iterate_batch(items):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    results = [result async for result in _iterate_batch(items)]
+    results.sort(key=lambda result: result["indices"][0])
+    return {"results": results}
+
+
+@app.post("/api/sprite-atlas")
+async def build_sprite_atlas(
+    request: SpriteAtlasRequest,
+    x_forwarded_for: Annotated[Optional[str], Header()] = None,
+    http_request: Request = None,  # type: ignore[assignment]
+) -> dict[str, Any]:
+    if not ATLAS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="sprite atlases are not available on this server")
+    atlas_id = request.atlas_id.strip() or "default"
+    items = _dedupe_sprite_requests(request.items)
+    rate_key = _rate_limit_key(x_forwarded_for, http_request)
+    _check_image_rate(rate_key, len(items))
+    atlas = SPRITE_ATLASES.get_or_create(atlas_id, owner=rate_key or "")
+
+    results: list[dict[str, Any]] = []
+    packed: list[tuple[dict[str, Any], str]] = []
+    async for item, outcome in _iterate_sprite_outcomes(items):
+        if isinstance(outcome, SpriteCacheEntry):
+            key = _sprite_key(item["prompt"])
+            try:
+                if key not in atlas:
+                    # Pack the mip level the client draws, not the full generated image.
+                    await asyncio.to_thread(atlas.add, key, outcome.variant(SPRITE_ATLASES.frame_size).data)
+            except Exception as exc:
+                outcome = HTTPException(status_code=422, detail=f"sprite could not be packed: {exc}")
+            else:
+                packed.append((item, key))
+                continue
+        results.append(_batch_result(item, outcome))
+
+    image, width, height, frames = await asyncio.to_thread(atlas.snapshot)
+    for item, key in packed:
+        results.append(
+            {
+                "indices": item["indices"],
+                "entity_type": item["entity_type"],
+                "status": "ok",
+                "key": key,
+                **frame_uv(frames[key], width, height),
+            }
+        )
+    results.sort(key=lambda result: result["indices"][0])
+    return {
+        "atlas_id": atlas_id,
+        "version": atlas.version,
+        "width": width,
+        "height": height,
+        "mime_type": "image/png",
+        "image_base64": base64.b64encode(image).decode("utf-8"),
+        "frames": results,
+    }
+
+
+def _job_payload(job: ImageJob) -> dict[str, Any]:
+    payload: dict[str, Any] = {"job_id": job.job_id, "status": job.status, "entity_type": job.entity_type}
+    if job.status == JOB_DONE and isinstance(job.result, SpriteCacheEntry):
+        payload.update(image_base64=job.result.to_base64(), mime_type=job.result.mime_type)
+    if job.status == JOB_FAILED and job.error is not None:
+        payload["error"] = job.error
+    return payload
+
+
+def _job_error(exc: Exception) -> dict[str, Any]:
+    error = _sprite_http_error(exc)
+    return {"status_code": error.status_code, "message": str(error.detail)}
+
+
+async def _run_image_job(job: ImageJob) -> SpriteCacheEntry:
+    return await _resolve_sprite(job.prompt, job.entity_type, job.prompt_hint)
+
+
+def _json_frame(message: dict[str, Any]) -> str:
+    # Same encoding as WebSocket.send_json, for frames that go through the session's DownstreamSender.
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+async def _notify_sprite_ready(job: ImageJob) -> None:
+    if not job.user_id or not job.session_id:
+        return
+    sender = VOICE_CONNECTIONS.get((job.user_id, job.session_id))
+    if sender is None:
+        return
+    payload = _job_payload(job)
+    message: dict[str, Any] = {
+        "type": "spriteReady",
+        "jobId": job.job_id,
+        "entityType": job.entity_type,
+        "status": job.status,
+    }
+    if "image_base64" in payload:
+        message.update(imageBase64=payload["image_base64"], mimeType=payload["mime_type"])
+    if "error" in payload:
+        message["error"] = payload["error"]
+    await sender.put(_json_frame(message))
+
+
+IMAGE_JOBS.configure(_run_image_job, error_mapper=_job_error)
+IMAGE_JOBS.add_listener(_notify_sprite_ready)
+
+
+@app.post("/api/image-jobs", status_code=202)
+async def submit_image_job(
+    request: ImageJobRequest,
+    x_forwarded_for: Annotated[Optional[str], Header()] = None,
+    http_request: Request = None,  # type: ignore[assignment]
+) -> dict[str, Any]:
+    prompt = _sprite_prompt(request)
+    _check_image_rate(_rate_limit_key(x_forwarded_for, http_request))
+    job = ImageJob(
+        job_id=new_job_id(),
+        prompt=prompt,
+        entity_type=request.entity_type.strip(),
+        prompt_hint=request.prompt_hint,
+        user_id=request.user_id,
+        session_id=request.session_id,
+        priority=clamp_client_priority(request.priority),
+    )
+    try:
+        IMAGE_JOBS.submit(job)
+    except JobQueueFull as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"}) from exc
+    return _job_payload(job)
+
 
-    return {"image_base64": image_base64, "mime_type": mime_type}
+@app.get("/api/image-jobs/{job_id}")
+async def get_image_job(job_id: str) -> dict[str, Any]:
+    job = IMAGE_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="image job not found")
+    return _job_payload(job)
+
+
+async def _prewarm_sprite(item: PrewarmItem) -> SpriteCacheEntry:
+    request = GenerateImageRequest(entity_type=item.entity_type, prompt_hint=item.prompt_hint)
+    return await _resolve_sprite(_sprite_prompt(request), item.entity_type, item.prompt_hint)
+
+
+@app.on_event("startup")
+async def start_sprite_prewarm() -> None:
+    SPRITE_PREWARMER.start(_prewarm_sprite, IMAGE_ADMISSION)
+
+
+@app.on_event("startup")
+async def start_voice_runtime() -> None:
+    VOICE_RUNTIME.start()
+
+
+@app.on_event("shutdown")
+async def close_voice_runtime() -> None:
+    await VOICE_RUNTIME.aclose()
+
+
+@app.on_event("shutdown")
+async def close_image_clients() -> None:
+    await SPRITE_PREWARMER.aclose()
+    await IMAGE_JOBS.aclose()
+    await IMAGE_BACKEND.aclose()
+
+
+@app.get("/api/image-metrics")
+async def image_metrics() -> dict[str, Any]:
+    metrics = getattr(IMAGE_BACKEND, "metrics", None)
+    return {
+        "backend": metrics().as_dict() if callable(metrics) else {},
+        "cache": SPRITE_CACHE.stats().as_dict(),
+    }
+
+
+@app.get("/api/voice-metrics")
+async def voice_metrics() -> dict[str, Any]:
+    # Totals only: user and session ids are enough to join someone else's live session, so they are never listed.
+    totals: dict[str, dict[str, Any]] = {}
+    for metrics in VOICE_SESSION_METRICS.values():
+        for name, stats in metrics.items():
+            total = totals.setdefault(name, {})
+            for field, value in stats.as_dict().items():
+                previous = total.get(field, 0)
+                total[field] = max(previous, value) if field.startswith("max_") else previous + value
+    return {"sessions": len(VOICE_SESSION_METRICS), **totals}
+
+
+@app.get("/metrics")
+async def prometheus_metrics() -> Response:
+    return Response(content=REGISTRY.render().encode("utf-8"), media_type=PROMETHEUS_CONTENT_TYPE)
 
 
 @app.get("/health")
 async def health_check() -> dict[str, str]:
+    if not SPRITE_PREWARMER.ready:
+        raise HTTPException(status_code=503, detail="sprite prewarm in progress")
     return {"status": "ok"}
 
 
@@ -204,11 +784,18 @@ def build_runtime_run_config() -> Any:
     if not ADK_AVAILABLE or RunConfig is None or StreamingMode is None or genai_types is None:
         return build_run_config()
 
+    realtime_input_config = None
+    if VOICE_VAD.enabled:
+        # The server-side gate drops trailing silence, so turn boundaries come from explicit activity signals.
+        realtime_input_config = genai_types.RealtimeInputConfig(
+            automatic_activity_detection=genai_types.AutomaticActivityDetection(disabled=True)
+        )
     return RunConfig(
         streaming_mode=StreamingMode.BIDI,
         response_modalities=["AUDIO"],
         input_audio_transcription=genai_types.AudioTranscriptionConfig(),
         output_audio_transcription=genai_types.AudioTranscriptionConfig(),
+        realtime_input_config=realtime_input_config,
     )
 
 
@@ -225,100 +812,30 @@ def _build_audio_payload(binary: bytes) -> Any:
     return {"mime_type": "audio/pcm;rate=16000", "data": binary}
 
 
+async def _send_activity_signal(live_request_queue: Any, started: bool) -> None:
+    # Pairs with the automatic activity detection that build_runtime_run_config() turns off under the gate.
+    method = getattr(live_request_queue, "send_activity_start" if started else "send_activity_end", None)
+    if callable(method):
+        await _call_maybe_await(method)
+
+
 def _build_text_payload(text: str) -> Any:
     if genai_types is not None:
         return genai_types.Content(parts=[genai_types.Part(text=text)])
     return text
 
 
-def _make_json_safe(value: Any) -> Any:
-    if isinstance(value, bytes):
-        return base64.b64encode(value).decode("utf-8")
-    if isinstance(value, bytearray):
-        return base64.b64encode(bytes(value)).decode("utf-8")
-    if isinstance(value, memoryview):
-        return base64.b64encode(value.tobytes()).decode("utf-8")
-    if isinstance(value, dict):
-        return {str(key): _make_json_safe(item) for key, item in value.items()}
-    if isinstance(value, (list, tuple)):
-        return [_make_json_safe(item) for item in value]
-    return value
-
-
-def _normalize_event(event: Any) -> dict[str, Any]:
-    if isinstance(event, dict):
-        safe_event = _make_json_safe(event)
-        return safe_event if isinstance(safe_event, dict) else {}
-
-    model_dump = getattr(event, "model_dump", None)
-    if callable(model_dump):
-        dumped = model_dump(by_alias=True, exclude_none=True)
-        if isinstance(dumped, dict):
-            safe_dumped = _make_json_safe(dumped)
-            return safe_dumped if isinstance(safe_dumped, dict) else {}
-
-    model_dump_json = getattr(event, "model_dump_json", None)
-    if callable(model_dump_json):
-        try:
-            dumped_json = model_dump_json(by_alias=True, exclude_none=True)
-            if isinstance(dumped_json, str):
-                parsed = json.loads(dumped_json)
-                if isinstance(parsed, dict):
-                    safe_parsed = _make_json_safe(parsed)
-                    return safe_parsed if isinstance(safe_parsed, dict) else {}
-        except Exception:
-            pass
-
-    return {}
-
-
-def _is_world_patch(candidate: Any) -> bool:
-    if not isinstance(candidate, dict):
-        return False
-    return all(key in candidate for key in ("effect", "color", "intensity", "spawn", "caption"))
-
-
-def _find_world_patch(candidate: Any) -> dict[str, Any] | None:
-    if isinstance(candidate, dict):
-        if _is_world_patch(candidate):
-            return candidate
-
-        patch_value = candidate.get("patch")
-        if _is_world_patch(patch_value):
-            return patch_value
-
-        for value in candidate.values():
-            found = _find_world_patch(value)
-            if found is not None:
-                return found
-        return None
-
-    if isinstance(candidate, list):
-        for item in candidate:
-            found = _find_world_patch(item)
-            if found is not None:
-                return found
-
-    return None
-
-
-def extract_world_patch(event: dict[str, Any]) -> dict[str, Any] | None:
-    return _find_world_patch(event)
-
-
 async def _ensure_session(session_service: Any, user_id: str, session_id: str) -> None:
-    try:
-        session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
-    except TypeError:
-        session = await session_service.get_session(user_id, session_id)
+    session = await call_session_api(session_service.get_session, APP_NAME, user_id, session_id)
+    if session is None:
+        await call_session_api(session_service.create_session, APP_NAME, user_id, session_id)
 
-    if session is not None:
-        return
 
-    try:
-        await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
-    except TypeError:
-        await session_service.create_session(user_id, session_id)
+def _hold_session(session_service: Any, user_id: str, session_id: str, held: bool) -> None:
+    # Only the bounded store pins sessions; other services have nothing to evict.
+    method = getattr(session_service, "hold_session" if held else "release_session", None)
+    if callable(method):
+        method(user_id, session_id)
 
 
 def _build_run_live_stream(runner: Any, user_id: str, session_id: str, live_request_queue: Any, run_config: Any):
@@ -344,43 +861,110 @@ async def _close_live_request_queue(live_request_queue: Any) -> None:
         await _call_maybe_await(close)
 
 
-async def process_upstream_messages(websocket: Any, live_request_queue: Any) -> None:
-    while True:
-        message = await websocket.receive()
-        message_type = message.get("type")
-        if message_type == "websocket.disconnect":
-            break
-
-        if message_type != "websocket.receive":
-            continue
-
-        binary = message.get("bytes")
-        if binary is not None:
-            await _call_maybe_await(live_request_queue.send_realtime, _build_audio_payload(binary))
-            continue
+async def process_upstream_messages(
+    websocket: Any,
+    live_request_queue: Any,
+    rate_key: str | None = None,
+    vad: VoiceActivityGate | None = None,
+    response_timer: MarkTimer | None = None,
+) -> None:
+    async def send_audio(chunk: bytes) -> None:
+        was_speaking = vad is not None and vad.speaking
+        voiced_chunks = vad.process(chunk) if vad is not None else (chunk,)
+        if vad is not None and vad.speaking and not was_speaking:
+            await _send_activity_signal(live_request_queue, started=True)
+        for voiced in voiced_chunks:
+            await _call_maybe_await(live_request_queue.send_realtime, _build_audio_payload(voiced))
+        if was_speaking and not vad.speaking:
+            await _send_activity_signal(live_request_queue, started=False)
+            if response_timer is not None:
+                response_timer.mark()
+
+    audio = CoalescingAudioSink(send_audio, UPSTREAM_AUDIO)
+    try:
+        while True:
+            message = await websocket.receive()
+            message_type = message.get("type")
+            if message_type == "websocket.disconnect":
+                break
 
-        text = message.get("text")
-        if not text:
-            continue
-        try:
-            payload = json.loads(text)
-        except json.JSONDecodeError:
-            continue
-        if payload.get("type") == "text" and isinstance(payload.get("text"), str):
-            await _call_maybe_await(live_request_queue.send_content, _build_text_payload(payload["text"]))
+            if message_type != "websocket.receive":
+                continue
+            binary = message.get("bytes")
+            text = message.get("text")
+            size = len(binary) if binary is not None else len(text or "")
+            if rate_key is not None:
+                wait = VOICE_UPSTREAM_RATE_LIMIT.acquire(rate_key, max(size, VOICE_UPSTREAM_MIN_MESSAGE_BYTES))
+                if wait > 0:
+                    raise RateLimitExceeded("upstream rate limit exceeded", wait)
+
+            VOICE_UPSTREAM_MESSAGES.inc()
+            VOICE_UPSTREAM_BYTES.inc(size)
+            if binary is not None:
+                await audio.write(binary)
+                continue
 
+            if not text:
+                continue
+            try:
+                payload = json.loads(text)
+            except json.JSONDecodeError:
+                continue
+            if payload.get("type") == "text" and isinstance(payload.get("text"), str):
+                # Buffered speech precedes the typed text, so it has to reach the model first.
+                await audio.flush()
+                await _call_maybe_await(live_request_queue.send_content, _build_text_payload(payload["text"]))
+    finally:
+        await audio.aclose()
 
-async def process_downstream_events(websocket: Any, events: AsyncIterable[Any]) -> None:
-    async for event in events:
-        normalized_event = _normalize_event(event)
-        forward_payload: dict[str, Any] = {"type": "adkEvent", "payload": normalized_event}
-        if "turnComplete" in normalized_event:
-            forward_payload["turnComplete"] = bool(normalized_event["turnComplete"])
-        await websocket.send_json(forward_payload)
 
-        patch = extract_world_patch(normalized_event)
-        if patch is not None:
-            await websocket.send_json({"type": "worldPatch", "patch": patch})
+async def process_downstream_events(
+    websocket: Any,
+    events: AsyncIterable[Any],
+    audio_frames: AudioFrameWriter | None = None,
+    sender: DownstreamSender | None = None,
+    response_timer: MarkTimer | None = None,
+) -> None:
+    owns_sender = sender is None
+    if sender is None:
+        sender = DownstreamSender(websocket, VOICE_SENDER)
+    sender.start()
+    awaiting_model_audio = True
+    try:
+        async for event in events:
+            encoded = encode_adk_event(
+                event,
+                binary_audio=audio_frames is not None,
+                world_patch=extract_world_patch(event),
+            )
+            if encoded.interrupted:
+                sender.discard_audio()
+            if encoded.carries_audio and awaiting_model_audio:
+                awaiting_model_audio = False
+                if response_timer is not None:
+                    response_timer.stop()
+            if audio_frames is not None:
+                for mime_type, data in encoded.audio:
+                    VOICE_AUDIO_FRAMES.inc()
+                    await sender.put(audio_frames.frame(mime_type, data), droppable=True)
+
+            patch_frame = encoded.world_patch_frame()
+            # Audio-bearing events may be dropped under backlog; turn boundaries and patches never are.
+            droppable = encoded.carries_audio and not (encoded.turn_complete or encoded.interrupted or patch_frame)
+            VOICE_ADK_FRAMES.inc()
+            await sender.put(encoded.frame, droppable=droppable)
+            if patch_frame is not None:
+                VOICE_PATCH_FRAMES.inc()
+                VOICE_WORLD_PATCHES.inc()
+                await sender.put(patch_frame)
+            if encoded.turn_complete or encoded.interrupted:
+                awaiting_model_audio = True
+                if audio_frames is not None:
+                    audio_frames.end_turn()
+        await sender.drain()
+    finally:
+        if owns_sender:
+            await sender.aclose()
 
 
 async def handle_voice_session(
@@ -392,23 +976,91 @@ async def handle_voice_session(
     runner: Any,
     live_request_queue: Any,
 ) -> None:
-    await websocket.accept()
+    subprotocol = negotiated_audio_subprotocol(websocket)
+    if subprotocol is not None:
+        await websocket.accept(subprotocol=subprotocol)
+    else:
+        await websocket.accept()
+    if not VOICE_SESSION_LIMIT.acquire(user_id):
+        await _close_live_request_queue(live_request_queue)
+        await websocket.close(code=WS_CLOSE_TRY_AGAIN_LATER, reason="too many live sessions")
+        return
+
+    try:
+        audio_frames = AudioFrameWriter() if subprotocol is not None else None
+        await _run_voice_session(
+            websocket, user_id, session_id, session_service, runner, live_request_queue, audio_frames
+        )
+    finally:
+        VOICE_SESSION_LIMIT.release(user_id)
+
+
+async def _send_session_error(sender: DownstreamSender, exc: BaseException) -> None:
+    # Queued behind whatever is still pending so the error is the last frame the client sees before the close.
+    sender.start()
+    try:
+        await sender.put(_json_frame({"error": {"message": str(exc)}}))
+        await asyncio.wait_for(sender.drain(), timeout=VOICE_SENDER.backlog_seconds or None)
+    except Exception:
+        logger.warning("could not deliver the voice session error", exc_info=True)
+
+
+async def _run_voice_session(
+    websocket: Any,
+    user_id: str,
+    session_id: str,
+    session_service: Any,
+    runner: Any,
+    live_request_queue: Any,
+    audio_frames: AudioFrameWriter | None = None,
+) -> None:
+    connection_key = (user_id, session_id)
+    vad = VoiceActivityGate(VOICE_VAD) if VOICE_VAD.enabled else None
+    sender = DownstreamSender(websocket, VOICE_SENDER)
+    VOICE_CONNECTIONS[connection_key] = sender
+    metrics = VOICE_SESSION_METRICS[connection_key] = {"sender": sender.stats}
+    if vad is not None:
+        metrics["vad"] = vad.stats
+    # Without the gate there is no end-of-speech point to measure from, so the latency histogram is left alone.
+    response_timer = MarkTimer(VOICE_RESPONSE_LATENCY) if vad is not None else None
 
     await _ensure_session(session_service, user_id, session_id)
-    run_config = build_runtime_run_config()
+    _hold_session(session_service, user_id, session_id, True)
+    run_config = VOICE_RUNTIME.run_config
     events = _build_run_live_stream(runner, user_id, session_id, live_request_queue, run_config)
 
+    close_code: int | None = None
+    close_reason = ""
     try:
         await asyncio.gather(
-            process_upstream_messages(websocket, live_request_queue),
-            process_downstream_events(websocket, events),
+            process_upstream_messages(
+                websocket, live_request_queue, rate_key=user_id, vad=vad, response_timer=response_timer
+            ),
+            process_downstream_events(websocket, events, audio_frames, sender, response_timer),
         )
+    except RateLimitExceeded as exc:
+        logger.warning("closing voice session for %s: %s", user_id, exc)
+        close_code, close_reason = WS_CLOSE_POLICY_VIOLATION, str(exc)
+    except SlowConsumerError as exc:
+        logger.warning("closing voice session for %s: %s", user_id, exc)
+        close_code, close_reason = WS_CLOSE_TRY_AGAIN_LATER, str(exc)
     except Exception as exc:
         logger.exception("voice session failed")
-        await websocket.send_json({"error": {"message": str(exc)}})
+        await _send_session_error(sender, exc)
     finally:
+        if VOICE_CONNECTIONS.get(connection_key) is sender:
+            del VOICE_CONNECTIONS[connection_key]
+        if VOICE_SESSION_METRICS.get(connection_key) is metrics:
+            del VOICE_SESSION_METRICS[connection_key]
+        _hold_session(session_service, user_id, session_id, False)
+        if vad is not None:
+            logger.info("voice session %s/%s vad: %s", user_id, session_id, vad.stats.as_dict())
+        await sender.aclose()
         await _close_live_request_queue(live_request_queue)
-        await websocket.close()
+        if close_code is None:
+            await websocket.close()
+        else:
+            await websocket.close(code=close_code, reason=close_reason)
 
 
 @app.websocket("/ws/{user_id}/{session_id}")
@@ -418,6 +1070,6 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str, session_id: str
         user_id=user_id,
         session_id=session_id,
         session_service=SESSION_SERVICE,
-        runner=create_runner(SESSION_SERVICE),
+        runner=VOICE_RUNTIME.runner,
         live_request_queue=create_live_request_queue(),
     )
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# Hot-path updates are plain attribute arithmetic on the event loop thread, so no locks are taken;
+# label lookups are meant to be done once and the child metric kept by the caller.
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # One slot per bound plus +Inf; cumulative counts are only built when rendering.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._children: dict[LabelValues, object] = {}
+        if not self.label_names:
+            self._default = self.labels()
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> object:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self) -> Iterable[str]:
+        for values, child in self._children.items():
+            labels = _label_text(self.label_names, values)
+            yield f"{self.name}{labels} {_number(child.value)}"  # type: ignore[attr-defined]
+
+
+class CounterFamily(_Family):
+    kind = "counter"
+
+    def _new_child(self) -> Counter:
+        return Counter()
+
+    def labels(self, *values: str) -> Counter:
+        return super().labels(*values)  # type: ignore[return-value]
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.value += amount  # type: ignore[attr-defined]
+
+
+class GaugeFamily(_Family):
+    kind = "gauge"
+
+    def _new_child(self) -> Gauge:
+        return Gauge()
+
+    def labels(self, *values: str) -> Gauge:
+        return super().labels(*values)  # type: ignore[return-value]
+
+    def set(self, value: float) -> None:
+        self._default.value = value  # type: ignore[attr-defined]
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.value += amount  # type: ignore[attr-defined]
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.value -= amount  # type: ignore[attr-defined]
+
+
+class HistogramFamily(_Family):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, label_names)
+
+    def _new_child(self) -> Histogram:
+        return Histogram(self.buckets)
+
+    def labels(self, *values: str) -> Histogram:
+        return super().labels(*values)  # type: ignore[return-value]
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)  # type: ignore[attr-defined]
+
+    def samples(self) -> Iterable[str]:
+        for values, child in self._children.items():
+            histogram: Histogram = child  # type: ignore[assignment]
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), histogram.counts):
+                cumulative += count
+                labels = _label_text(self.label_names, values, f'le="{_number(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _label_text(self.label_names, values)
+            yield f"{self.name}_sum{labels} {_number(histogram.sum)}"
+            yield f"{self.name}_count{labels} {histogram.count}"
+
+
+class CallbackFamily(_Family):
+    # Sampled at scrape time, so values already tracked elsewhere cost nothing on the hot path.
+    def __init__(self, name: str, documentation: str, kind: str, callback: Callable[[], float]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self._callback = callback
+
+    def samples(self) -> Iterable[str]:
+        yield f"{self.name} {_number(float(self._callback()))}"
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._families: dict[str, _Family] = {}
+
+    def _register(self, family: _Family) -> _Family:
+        if family.name in self._families:
+            raise ValueError(f"metric {family.name} is already registered")
+        self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, documentation: str, label_names: Iterable[str] = ()) -> CounterFamily:
+        return self._register(CounterFamily(name, documentation, label_names))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, label_names: Iterable[str] = ()) -> GaugeFamily:
+        return self._register(GaugeFamily(name, documentation, label_names))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> HistogramFamily:
+        return self._register(HistogramFamily(name, documentation, label_names, buckets))  # type: ignore[return-value]
+
+    def gauge_callback(self, name: str, documentation: str, callback: Callable[[], float]) -> None:
+        self._register(CallbackFamily(name, documentation, "gauge", callback))
+
+    def counter_callback(self, name: str, documentation: str, callback: Callable[[], float]) -> None:
+        self._register(CallbackFamily(name, documentation, "counter", callback))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for family in self._families.values():
+            lines.append(f"# HELP {family.name} {family.documentation}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            lines.extend(family.samples())
+        return "\n".join(lines) + "\n"
+
+
+class MarkTimer:
+    # Measures from the latest mark() to the next stop(), e.g. last user audio to first model audio.
+    __slots__ = ("_histogram", "_clock", "_marked_at")
+
+    def __init__(self, histogram: Histogram | HistogramFamily, clock: Callable[[], float] = time.perf_counter) -> None:
+        self._histogram = histogram
+        self._clock = clock
+        self._marked_at: float | None = None
+
+    def mark(self) -> None:
+        self._marked_at = self._clock()
+
+    def stop(self) -> None:
+        # Only the first stop after a mark is observed.
+        if self._marked_at is not None:
+            self._histogram.observe(self._clock() - self._marked_at)
+            self._marked_at = None
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import math
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from runtime.env import env_float, env_int
+
+DEFAULT_IDLE_SECONDS = 300.0
+DEFAULT_MAX_KEYS = 100_000
+
+# Close codes sent to voice websockets that break a limit.
+WS_CLOSE_POLICY_VIOLATION = 1008
+WS_CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, message: str, retry_after_seconds: float = 0.0) -> None:
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float) -> None:
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+class TokenBucketLimiter:
+    def __init__(
+        self,
+        *,
+        rate_per_second: float,
+        burst: float,
+        idle_seconds: float = DEFAULT_IDLE_SECONDS,
+        max_keys: int = DEFAULT_MAX_KEYS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate_per_second = max(0.0, rate_per_second)
+        self.burst = max(1.0, burst)
+        self._idle_seconds = max(0.0, idle_seconds)
+        self._max_keys = max(1, max_keys)
+        self._clock = clock
+        # Least recently used first, so idle buckets are always at the front.
+        self._buckets: OrderedDict[str, _Bucket] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_second > 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, tokens: float = 1.0) -> float:
+        # Returns 0 when the tokens were taken, otherwise the seconds until they would be.
+        if not self.enabled:
+            return 0.0
+        now = self._clock()
+        self._evict_idle(now)
+        if tokens > self.burst:
+            # More than a full bucket can never be granted; discounting it to the burst would undercharge it.
+            return math.inf
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _Bucket(self.burst, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate_per_second)
+            bucket.updated_at = now
+            self._buckets.move_to_end(key)
+
+        if bucket.tokens >= tokens:
+            bucket.tokens -= tokens
+            return 0.0
+        return (tokens - bucket.tokens) / self.rate_per_second
+
+    def discard(self, key: str) -> None:
+        self._buckets.pop(key, None)
+
+    def _evict_idle(self, now: float) -> None:
+        # A bucket idle this long has refilled, so dropping it is indistinguishable from keeping it.
+        horizon = now - max(self._idle_seconds, self.burst / self.rate_per_second)
+        while self._buckets:
+            bucket = next(iter(self._buckets.values()))
+            if bucket.updated_at > horizon:
+                break
+            self._buckets.popitem(last=False)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, *, max_per_key: int) -> None:
+        self.max_per_key = max_per_key
+        self._active: dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_per_key > 0
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def active(self, key: str) -> int:
+        return self._active.get(key, 0)
+
+    def acquire(self, key: str) -> bool:
+        if not self.enabled:
+            return True
+        active = self._active.get(key, 0)
+        if active >= self.max_per_key:
+            return False
+        self._active[key] = active + 1
+        return True
+
+    def release(self, key: str) -> None:
+        if not self.enabled:
+            return
+        active = self._active.get(key, 0) - 1
+        if active > 0:
+            self._active[key] = active
+        else:
+            self._active.pop(key, None)
+
+
+def retry_after_header(seconds: float) -> dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+def client_address(forwarded_for: str | None, peer: str | None, trusted_hops: int) -> str | None:
+    # Each trusted proxy appends the address it received the request from, so the caller is the trusted_hops-th
+    # entry from the right and anything further left is client-supplied. Without trusted proxies the header is ignored.
+    if trusted_hops > 0:
+        hops = [hop.strip() for hop in (forwarded_for or "").split(",") if hop.strip()]
+        if hops:
+            return hops[-min(trusted_hops, len(hops))]
+    return peer or None
+
+
+def trusted_proxy_hops_from_env() -> int:
+    return max(0, env_int("TRUSTED_PROXY_HOPS", 1))
+
+
+def token_bucket_from_env(prefix: str, rate_per_second: float, burst: float) -> TokenBucketLimiter:
+    return TokenBucketLimiter(
+        rate_per_second=env_float(f"{prefix}_RATE_PER_SECOND", rate_per_second),
+        burst=env_float(f"{prefix}_BURST", burst),
+        idle_seconds=env_float("RATE_LIMIT_IDLE_SECONDS", DEFAULT_IDLE_SECONDS),
+        max_keys=env_int("RATE_LIMIT_MAX_KEYS", DEFAULT_MAX_KEYS),
+    )
+
+
+def concurrency_limiter_from_env(name: str, max_per_key: int) -> ConcurrencyLimiter:
+    return ConcurrencyLimiter(max_per_key=env_int(name, max_per_key))
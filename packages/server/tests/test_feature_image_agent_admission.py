@@ -0,0 +1,135 @@
+import asyncio
+import os
+import pathlib
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.admission import AdmissionController, AdmissionRejected  # type: ignore  # noqa: E402
+from image_agent.backends import VertexImageBackend  # type: ignore  # noqa: E402
+from image_agent.client_pool import GenaiClientPool  # type: ignore  # noqa: E402
+from main import (  # type: ignore  # noqa: E402
+    SPRITE_CACHE,
+    SPRITE_FAILURES,
+    GenerateImageRequest,
+    _generate_image_base64,
+    generate_image,
+)
+
+
+class FakeAsyncModels:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def generate_content(self, **_kwargs):
+        await asyncio.sleep(self.delay)
+        part = SimpleNamespace(inline_data=SimpleNamespace(data=b"png", mime_type="image/png"))
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+class FakeClient:
+    def __init__(self, **_kwargs):
+        self.aio = SimpleNamespace(models=FakeAsyncModels(delay=0.05))
+
+    @property
+    def models(self):
+        raise AssertionError("synchronous client must not be used")
+
+
+class TestAdmissionController(unittest.IsolatedAsyncioTestCase):
+    async def test_rejects_when_in_flight_and_queue_are_full(self) -> None:
+        controller = AdmissionController(max_in_flight=1, max_queue=1, initial_service_time_seconds=3)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit():
+                await release.wait()
+
+        running = asyncio.create_task(hold())
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        self.assertEqual((controller.in_flight, controller.waiting), (1, 1))
+
+        with self.assertRaises(AdmissionRejected) as context:
+            async with controller.admit():
+                pass
+        self.assertGreaterEqual(context.exception.retry_after_seconds, 1)
+        self.assertEqual(controller.rejected, 1)
+
+        release.set()
+        await asyncio.gather(running, queued)
+        self.assertEqual((controller.in_flight, controller.waiting), (0, 0))
+
+    async def test_cancelled_waiter_frees_its_queue_slot(self) -> None:
+        controller = AdmissionController(max_in_flight=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit():
+                await release.wait()
+
+        running = asyncio.create_task(hold())
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued.cancel()
+        await asyncio.sleep(0)
+        self.assertEqual(controller.waiting, 0)
+
+        release.set()
+        await running
+        self.assertEqual(controller.in_flight, 0)
+
+    async def test_generate_image_returns_503_with_retry_after_when_saturated(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+        controller = AdmissionController(max_in_flight=1, max_queue=0, initial_service_time_seconds=4)
+        release = asyncio.Event()
+
+        async def slow_backend(_prompt):
+            await release.wait()
+            return ("ZmFrZQ==", "image/png")
+
+        with patch("main.IMAGE_ADMISSION", controller), patch("main._generate_image_base64", slow_backend):
+            first = asyncio.create_task(generate_image(GenerateImageRequest(entity_type="wolf")))
+            await asyncio.sleep(0)
+            with self.assertRaises(HTTPException) as context:
+                await generate_image(GenerateImageRequest(entity_type="tree"))
+            release.set()
+            await first
+
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(context.exception.headers["Retry-After"], "4")
+
+
+class TestImageGenerationDoesNotBlockEventLoop(unittest.IsolatedAsyncioTestCase):
+    async def test_event_loop_keeps_running_during_generation(self) -> None:
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticker_task = asyncio.create_task(ticker())
+        with patch.dict(os.environ, {"GOOGLE_CLOUD_PROJECT": "demo"}), patch(
+            "main.IMAGE_BACKEND",
+            VertexImageBackend(GenaiClientPool(factory=lambda _project, _location: FakeClient()), model="image-model"),
+        ):
+            encoded, mime_type = await _generate_image_base64("prompt")
+        ticker_task.cancel()
+
+        self.assertEqual(encoded, "cG5n")
+        self.assertEqual(mime_type, "image/png")
+        self.assertGreater(ticks, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import base64
+import io
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.atlas import ATLAS_AVAILABLE, MaxRectsPacker, SpriteAtlas, SpriteAtlasStore  # type: ignore  # noqa: E402
+from main import (SPRITE_ATLASES, SPRITE_CACHE, SPRITE_FAILURES, GenerateImageRequest, SpriteAtlasRequest,  # type: ignore  # noqa: E402
+                  build_sprite_atlas)
+
+if ATLAS_AVAILABLE:
+    from PIL import Image
+
+
+def _png(width, height, color):
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestMaxRectsPacker(unittest.TestCase):
+    def test_placements_never_overlap_and_growth_keeps_existing_positions(self) -> None:
+        packer = MaxRectsPacker(width=64, height=64, max_size=1024)
+        placed = []
+        for index in range(40):
+            rect = packer.insert(16 + (index % 3) * 8, 16 + (index % 5) * 4)
+            self.assertIsNotNone(rect)
+            placed.append(rect)
+
+        for index, rect in enumerate(placed):
+            self.assertLessEqual(rect.right, packer.width)
+            self.assertLessEqual(rect.bottom, packer.height)
+            for other in placed[index + 1 :]:
+                self.assertFalse(rect.intersects(other))
+        self.assertGreater(packer.width * packer.height, 64 * 64)
+
+    def test_returns_none_when_sprite_exceeds_max_size(self) -> None:
+        packer = MaxRectsPacker(width=32, height=32, max_size=64)
+        self.assertIsNone(packer.insert(65, 10))
+
+
+@unittest.skipUnless(ATLAS_AVAILABLE, "pillow is required")
+class TestSpriteAtlas(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+        SPRITE_ATLASES.clear()
+
+    def test_adding_sprite_is_incremental(self) -> None:
+        atlas = SpriteAtlas(initial_size=32)
+        self.assertTrue(atlas.add("wolf", _png(24, 24, (255, 0, 0, 255))))
+        _, _, _, before = atlas.snapshot()
+        self.assertFalse(atlas.add("wolf", _png(24, 24, (255, 0, 0, 255))))
+        self.assertTrue(atlas.add("tree", _png(24, 24, (0, 255, 0, 255))))
+        image, width, height, after = atlas.snapshot()
+
+        self.assertEqual(atlas.version, 2)
+        self.assertEqual(before["wolf"], after["wolf"])
+        with Image.open(io.BytesIO(image)) as sheet:
+            self.assertEqual(sheet.size, (width, height))
+            self.assertEqual(sheet.getpixel((after["tree"].x, after["tree"].y)), (0, 255, 0, 255))
+
+    async def test_endpoint_returns_sheet_with_uv_map_and_per_item_errors(self) -> None:
+        sprites = {"wolf": _png(16, 16, (255, 0, 0, 255)), "tree": _png(8, 24, (0, 255, 0, 255))}
+
+        async def backend(prompt):
+            for name, data in sprites.items():
+                if name in prompt:
+                    return base64.b64encode(data).decode("utf-8"), "image/png"
+            raise RuntimeError("No image data returned from Gemini")
+
+        request = SpriteAtlasRequest(
+            atlas_id="zone-1",
+            items=[
+                GenerateImageRequest(entity_type="wolf"),
+                GenerateImageRequest(entity_type="tree"),
+                GenerateImageRequest(entity_type="ghost"),
+            ],
+        )
+        with patch("main._generate_image_base64", backend):
+            first = await build_sprite_atlas(request)
+            second = await build_sprite_atlas(request)
+
+        frames = first["frames"]
+        self.assertEqual([frame["status"] for frame in frames], ["ok", "ok", "error"])
+        wolf = frames[0]
+        self.assertEqual((wolf["width"], wolf["height"]), (16, 16))
+        u0, v0, u1, v1 = wolf["uv"]
+        self.assertAlmostEqual(u1 - u0, 16 / first["width"])
+        self.assertAlmostEqual(v1 - v0, 16 / first["height"])
+        self.assertEqual(frames[2]["error"]["status_code"], 503)
+        self.assertEqual(second["version"], first["version"])
+        self.assertEqual(second["image_base64"], first["image_base64"])
+
+
+    async def test_full_size_sprites_are_packed_at_frame_size(self) -> None:
+        generated = _png(1024, 1024, (0, 0, 255, 255))
+
+        async def backend(_prompt):
+            return base64.b64encode(generated).decode("utf-8"), "image/png"
+
+        items = [GenerateImageRequest(entity_type=f"slime-{index}") for index in range(40)]
+        with patch("main._generate_image_base64", backend):
+            sheet = await build_sprite_atlas(SpriteAtlasRequest(atlas_id="big", items=items))
+
+        self.assertEqual({frame["status"] for frame in sheet["frames"]}, {"ok"})
+        self.assertEqual({(frame["width"], frame["height"]) for frame in sheet["frames"]}, {(128, 128)})
+        self.assertLessEqual(max(sheet["width"], sheet["height"]), 2048)
+
+    def test_atlases_are_scoped_and_capped_per_caller(self) -> None:
+        store = SpriteAtlasStore(max_atlases=8, max_atlases_per_owner=2)
+        mine = store.get_or_create("zone", owner="ip:10.0.0.1")
+        self.assertIsNot(store.get_or_create("zone", owner="ip:10.0.0.2"), mine)
+        self.assertIs(store.get_or_create("zone", owner="ip:10.0.0.1"), mine)
+
+        for index in range(10):
+            store.get_or_create(f"spam-{index}", owner="ip:10.0.0.1")
+        self.assertEqual(len(store), 3)
+        self.assertIsNot(store.get_or_create("zone", owner="ip:10.0.0.1"), mine)
+
+
+if __name__ == "__main__":
+    unittest.main()
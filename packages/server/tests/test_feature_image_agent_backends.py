@@ -0,0 +1,97 @@
+import base64
+import os
+import pathlib
+import random
+import sys
+import unittest
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.backends import (  # type: ignore  # noqa: E402
+    LocalBackendError,
+    LocalImageBackend,
+    VertexImageBackend,
+    create_image_backend_from_env,
+    parse_latency_spec,
+    render_local_sprite,
+)
+from image_agent.client_pool import GenaiClientPool  # type: ignore  # noqa: E402
+from image_agent.postprocess import (  # type: ignore  # noqa: E402
+    POSTPROCESS_AVAILABLE,
+    SpritePostprocessConfig,
+    postprocess_sprite,
+)
+from main import SPRITE_CACHE, SPRITE_FAILURES, GenerateImageRequest, generate_image  # type: ignore  # noqa: E402
+
+
+class TestLocalImageBackend(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+
+    def test_sprite_bytes_are_deterministic_per_prompt(self) -> None:
+        self.assertEqual(render_local_sprite("wolf"), render_local_sprite("wolf"))
+        self.assertNotEqual(render_local_sprite("wolf"), render_local_sprite("tree"))
+        self.assertTrue(render_local_sprite("wolf").startswith(b"\x89PNG\r\n\x1a\n"))
+        self.assertGreater(len(render_local_sprite("wolf", 512)), len(render_local_sprite("wolf", 64)))
+
+    @unittest.skipUnless(POSTPROCESS_AVAILABLE, "numpy and pillow are required")
+    def test_sprite_has_a_recoverable_pixel_grid(self) -> None:
+        processed = postprocess_sprite(render_local_sprite("wolf", 256), SpritePostprocessConfig(enabled=True))
+        self.assertEqual((processed.width, processed.height, processed.cell_size), (16, 16, 16))
+
+    def test_parse_latency_spec(self) -> None:
+        self.assertEqual(parse_latency_spec("fixed:0.5").sample(random.Random(0)), 0.5)
+        uniform = parse_latency_spec("uniform:0.2,0.4")
+        samples = [uniform.sample(random.Random(seed)) for seed in range(20)]
+        self.assertTrue(all(0.2 <= sample <= 0.4 for sample in samples))
+        for spec in ("gamma:1,2", "uniform:1", "fixed:-1", "lognormal:a,b"):
+            with self.assertRaises(ValueError):
+                parse_latency_spec(spec)
+
+    async def test_error_rate_and_seed_are_reproducible(self) -> None:
+        async def outcomes(seed):
+            backend = LocalImageBackend(error_rate=0.5, seed=seed)
+            results = []
+            for index in range(20):
+                try:
+                    await backend.generate(f"sprite-{index}")
+                    results.append(True)
+                except LocalBackendError as exc:
+                    self.assertEqual(exc.code, 503)
+                    results.append(False)
+            return results
+
+        first = await outcomes(7)
+        self.assertEqual(first, await outcomes(7))
+        self.assertIn(True, first)
+        self.assertIn(False, first)
+
+    async def test_generate_image_runs_against_the_local_backend(self) -> None:
+        backend = LocalImageBackend(size=64)
+        with patch("main.IMAGE_BACKEND", backend):
+            first = await generate_image(GenerateImageRequest(entity_type="wolf"))
+            second = await generate_image(GenerateImageRequest(entity_type="wolf"))
+
+        self.assertEqual(backend.calls, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(base64.b64decode(first["image_base64"])[:4], b"\x89PNG")
+
+    def test_backend_is_selected_from_env(self) -> None:
+        pool = GenaiClientPool()
+        with patch.dict(os.environ, {"IMAGE_BACKEND": "local", "LOCAL_IMAGE_LATENCY": "uniform:0.1,0.2"}):
+            backend = create_image_backend_from_env(pool, model="image-model")
+        self.assertIsInstance(backend, LocalImageBackend)
+        self.assertEqual(backend.latency, parse_latency_spec("uniform:0.1,0.2"))
+
+        with patch.dict(os.environ, {"IMAGE_BACKEND": ""}):
+            backend = create_image_backend_from_env(pool, model="image-model")
+        self.assertIsInstance(backend, VertexImageBackend)
+        self.assertEqual(backend.model, "image-model")
+
+
+if __name__ == "__main__":
+    unittest.main()
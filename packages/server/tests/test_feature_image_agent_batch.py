@@ -0,0 +1,115 @@
+import asyncio
+import json
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.batch import iterate_bounded  # type: ignore  # noqa: E402
+from main import (  # type: ignore  # noqa: E402
+    SPRITE_CACHE,
+    SPRITE_FAILURES,
+    GenerateImageRequest,
+    GenerateImagesRequest,
+    generate_images,
+)
+
+
+class RecordingBackend:
+    def __init__(self, failing=()):
+        self.prompts = []
+        self.failing = failing
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, prompt):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            if any(word in prompt for word in self.failing):
+                raise RuntimeError("No image data returned from Gemini")
+            return ("ZmFrZQ==", "image/png")
+        finally:
+            self.active -= 1
+
+
+class TestBatchImageGeneration(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+
+    async def test_dedupes_items_and_reports_errors_per_item(self) -> None:
+        backend = RecordingBackend(failing=("slime",))
+        request = GenerateImagesRequest(
+            items=[
+                GenerateImageRequest(entity_type="wolf"),
+                GenerateImageRequest(entity_type="slime"),
+                GenerateImageRequest(entity_type=" wolf"),
+                GenerateImageRequest(entity_type=" "),
+            ]
+        )
+        with patch("main._generate_image_base64", backend):
+            response = await generate_images(request)
+
+        results = response["results"]
+        self.assertEqual(len(backend.prompts), 2)
+        self.assertEqual([result["indices"] for result in results], [[0, 2], [1], [3]])
+        self.assertEqual(results[0]["status"], "ok")
+        self.assertEqual(results[0]["image_base64"], "ZmFrZQ==")
+        self.assertEqual(results[1]["status"], "error")
+        self.assertEqual(results[1]["error"]["status_code"], 503)
+        self.assertEqual(results[2]["error"]["status_code"], 400)
+
+    async def test_concurrency_is_bounded(self) -> None:
+        backend = RecordingBackend()
+        request = GenerateImagesRequest(items=[GenerateImageRequest(entity_type=f"tree-{index}") for index in range(10)])
+        with patch("main._generate_image_base64", backend), patch("main.IMAGE_BATCH_CONCURRENCY", 3):
+            response = await generate_images(request)
+
+        self.assertEqual(len(response["results"]), 10)
+        self.assertEqual(backend.peak, 3)
+
+    async def test_stream_mode_returns_ndjson_lines(self) -> None:
+        backend = RecordingBackend()
+        request = GenerateImagesRequest(
+            items=[GenerateImageRequest(entity_type="wolf"), GenerateImageRequest(entity_type="tree")],
+            stream=True,
+        )
+        with patch("main._generate_image_base64", backend):
+            response = await generate_images(request)
+            lines = [line async for line in response.body_iterator]
+
+        self.assertEqual(response.media_type, "application/x-ndjson")
+        payloads = [json.loads(line) for line in lines]
+        self.assertEqual(sorted(payload["entity_type"] for payload in payloads), ["tree", "wolf"])
+
+    async def test_rejects_empty_and_oversized_batches(self) -> None:
+        with self.assertRaises(HTTPException) as empty:
+            await generate_images(GenerateImagesRequest(items=[]))
+        with patch("main.IMAGE_BATCH_MAX_ITEMS", 1), self.assertRaises(HTTPException) as oversized:
+            await generate_images(
+                GenerateImagesRequest(items=[GenerateImageRequest(entity_type="a"), GenerateImageRequest(entity_type="b")])
+            )
+
+        self.assertEqual(empty.exception.status_code, 400)
+        self.assertEqual(oversized.exception.status_code, 400)
+
+    async def test_iterate_bounded_yields_in_completion_order(self) -> None:
+        async def worker(delay):
+            await asyncio.sleep(delay)
+            return delay
+
+        outcomes = [outcome async for _, outcome in iterate_bounded([0.03, 0.01, 0.02], worker, concurrency=3)]
+        self.assertEqual(outcomes, [0.01, 0.02, 0.03])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import pathlib
+import sys
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from main import (  # type: ignore  # noqa: E402
+    SPRITE_CACHE,
+    SPRITE_FAILURES,
+    GenerateImageRequest,
+    app,
+    generate_image,
+    get_generated_image,
+)
+
+
+class TestBinarySpriteDelivery(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+        self.backend = patch("main._generate_image_base64", AsyncMock(return_value=("ZmFrZQ==", "image/png")))
+        self.backend.start()
+
+    def tearDown(self) -> None:
+        self.backend.stop()
+
+    async def test_json_remains_default(self) -> None:
+        response = await generate_image(GenerateImageRequest(entity_type="wolf"))
+        self.assertEqual(response, {"image_base64": "ZmFrZQ==", "mime_type": "image/png"})
+
+    async def test_format_query_returns_raw_bytes_with_cache_headers(self) -> None:
+        response = await generate_image(GenerateImageRequest(entity_type="wolf"), response_format="binary")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, b"fake")
+        self.assertEqual(response.media_type, "image/png")
+        self.assertTrue(response.headers["etag"].startswith('"'))
+        self.assertIn("max-age", response.headers["cache-control"])
+
+    async def test_accept_header_selects_binary_and_json_wins_when_listed(self) -> None:
+        binary = await generate_image(GenerateImageRequest(entity_type="wolf"), accept="image/png,image/*")
+        json_payload = await generate_image(GenerateImageRequest(entity_type="wolf"), accept="application/json, image/*")
+
+        self.assertEqual(binary.body, b"fake")
+        self.assertEqual(json_payload["mime_type"], "image/png")
+
+    async def test_get_variant_honours_if_none_match(self) -> None:
+        first = await get_generated_image(entity_type="wolf", response_format="binary")
+        second = await get_generated_image(
+            entity_type="wolf", response_format="binary", if_none_match=first.headers["etag"]
+        )
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.body, b"")
+        self.assertEqual(second.headers["etag"], first.headers["etag"])
+
+    async def test_both_representations_vary_on_accept(self) -> None:
+        binary = await generate_image(GenerateImageRequest(entity_type="wolf"), response_format="binary")
+        not_modified = await get_generated_image(
+            entity_type="wolf", response_format="binary", if_none_match=binary.headers["etag"]
+        )
+        self.assertEqual(binary.headers["vary"], "Accept")
+        self.assertEqual(not_modified.headers["vary"], "Accept")
+
+        client = TestClient(app)
+        as_json = client.get("/api/generate-image", params={"entity_type": "wolf"})
+        as_image = client.get("/api/generate-image", params={"entity_type": "wolf"}, headers={"Accept": "image/png"})
+        posted = client.post("/api/generate-image", json={"entity_type": "wolf"})
+
+        self.assertEqual(as_json.json()["mime_type"], "image/png")
+        self.assertEqual(as_image.content, b"fake")
+        for response in (as_json, as_image, posted):
+            self.assertEqual(response.headers["vary"], "Accept")
+
+
+if __name__ == "__main__":
+    unittest.main()
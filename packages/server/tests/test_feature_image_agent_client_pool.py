@@ -0,0 +1,108 @@
+import asyncio
+import pathlib
+import sys
+import unittest
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.client_pool import GenaiClientPool  # type: ignore  # noqa: E402
+
+
+class FakeCredentials:
+    def __init__(self):
+        self.expired = False
+
+
+class FakeClient:
+    def __init__(self, project, location):
+        self.key = (project, location)
+        self.closed = False
+        self._api_client = type("ApiClient", (), {"_credentials": FakeCredentials()})()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestGenaiClientPool(unittest.IsolatedAsyncioTestCase):
+    async def test_reuses_client_per_project_and_location(self) -> None:
+        pool = GenaiClientPool(factory=FakeClient)
+        first = await pool.get("p", "us-central1")
+        second = await pool.get("p", "us-central1")
+        other = await pool.get("p", "asia-northeast1")
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(pool.created, 2)
+
+    async def test_recreates_client_when_credentials_expire_or_age_out(self) -> None:
+        clock = FakeClock()
+        pool = GenaiClientPool(factory=FakeClient, max_client_age_seconds=60, clock=clock)
+        first = await pool.get("p", "l")
+        first._api_client._credentials.expired = True
+        second = await pool.get("p", "l")
+        clock.now = 61
+        third = await pool.get("p", "l")
+
+        self.assertTrue(first.closed)
+        self.assertTrue(second.closed)
+        self.assertIsNot(second, third)
+        self.assertEqual(pool.created, 3)
+
+    async def test_invalidate_on_auth_error_and_close_on_shutdown(self) -> None:
+        pool = GenaiClientPool(factory=FakeClient)
+        client = await pool.get("p", "l")
+        auth_error = RuntimeError("unauthenticated")
+        auth_error.code = 401
+        self.assertTrue(pool.is_auth_error(auth_error))
+        self.assertFalse(pool.is_auth_error(RuntimeError("boom")))
+
+        await pool.invalidate("p", "l")
+        self.assertTrue(client.closed)
+        replacement = await pool.get("p", "l")
+
+        await pool.aclose()
+        self.assertTrue(replacement.closed)
+        self.assertEqual(len(pool), 0)
+
+
+    async def test_invalidation_waits_for_in_flight_calls(self) -> None:
+        pool = GenaiClientPool(factory=FakeClient)
+        release = asyncio.Event()
+        started = asyncio.Event()
+
+        async def call():
+            async with pool.lease("p", "l") as client:
+                started.set()
+                await release.wait()
+                self.assertFalse(client.closed)
+                return client
+
+        in_flight = asyncio.create_task(call())
+        await started.wait()
+        stale = await pool.get("p", "l")
+        await pool.invalidate("p", "l")
+        replacement = await pool.get("p", "l")
+
+        self.assertFalse(stale.closed)
+        self.assertIsNot(replacement, stale)
+        release.set()
+        self.assertIs(await in_flight, stale)
+        self.assertTrue(stale.closed)
+        self.assertFalse(replacement.closed)
+
+        await pool.invalidate("p", "l", client=stale)
+        self.assertFalse(replacement.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
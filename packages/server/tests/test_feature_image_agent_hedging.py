@@ -0,0 +1,215 @@
+import asyncio
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.admission import AdmissionController  # type: ignore  # noqa: E402
+from image_agent.backends import ImageBlockedError, LatencyDistribution, LocalImageBackend  # type: ignore  # noqa: E402
+from image_agent.hedging import (  # type: ignore  # noqa: E402
+    BREAKER_CLOSED,
+    BREAKER_OPEN,
+    CircuitBreaker,
+    HedgedImageBackend,
+    LatencyTracker,
+)
+from main import SPRITE_CACHE, SPRITE_FAILURES, GenerateImageRequest, generate_image, image_metrics  # type: ignore  # noqa: E402
+
+
+class ScriptedBackend:
+    def __init__(self, model: str, delays: list[float], failures: int = 0) -> None:
+        self.model = model
+        self.delays = list(delays)
+        self.failures = failures
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate(self, prompt: str):
+        self.calls += 1
+        delay = self.delays.pop(0) if self.delays else 0.0
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("backend failed")
+        return (f"{self.model}:{self.calls}", "image/png")
+
+    async def aclose(self) -> None:
+        return None
+
+
+def _warm_tracker(seconds: float, samples: int = 20) -> LatencyTracker:
+    tracker = LatencyTracker()
+    for _ in range(samples):
+        tracker.record(seconds)
+    return tracker
+
+
+class TestHedgedImageBackend(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+
+    def test_latency_tracker_percentiles(self) -> None:
+        tracker = LatencyTracker(window=100)
+        for value in range(1, 101):
+            tracker.record(value / 100)
+        self.assertEqual(tracker.percentile(50), 0.5)
+        self.assertEqual(tracker.percentile(95), 0.95)
+        self.assertEqual(tracker.percentile(99), 0.99)
+
+    async def test_no_hedge_until_enough_samples(self) -> None:
+        primary = ScriptedBackend("primary", [0.02])
+        backend = HedgedImageBackend(primary, hedge_min_samples=5, hedge_min_delay_seconds=0)
+        self.assertIsNone(backend.hedge_delay())
+        await backend.generate("wolf")
+        self.assertEqual((primary.calls, backend.metrics().hedges), (1, 0))
+
+    async def test_slow_call_is_hedged_and_fastest_wins(self) -> None:
+        primary = ScriptedBackend("primary", [1.0, 0.01])
+        backend = HedgedImageBackend(
+            primary,
+            latency=_warm_tracker(0.02),
+            hedge_percentile=95,
+            hedge_min_delay_seconds=0,
+        )
+
+        started = asyncio.get_running_loop().time()
+        result = await backend.generate("wolf")
+        elapsed = asyncio.get_running_loop().time() - started
+
+        self.assertEqual(result, ("primary:2", "image/png"))
+        self.assertLess(elapsed, 0.5)
+        await asyncio.sleep(0)
+        self.assertEqual(primary.cancelled, 1)
+        metrics = backend.metrics()
+        self.assertEqual((metrics.hedges, metrics.hedge_wins), (1, 1))
+
+    async def test_hedge_survives_a_failed_first_call(self) -> None:
+        primary = ScriptedBackend("primary", [0.1, 0.2], failures=1)
+        backend = HedgedImageBackend(primary, latency=_warm_tracker(0.01), hedge_min_delay_seconds=0)
+        self.assertEqual(await backend.generate("wolf"), ("primary:2", "image/png"))
+
+    async def test_breaker_switches_to_fallback_and_recovers(self) -> None:
+        now = [0.0]
+        primary = ScriptedBackend("primary", [], failures=4)
+        fallback = ScriptedBackend("fallback", [])
+        breaker = CircuitBreaker(window=4, error_rate=0.5, cooldown_seconds=10, clock=lambda: now[0])
+        backend = HedgedImageBackend(primary, fallback=fallback, breaker=breaker, hedge_percentile=0)
+
+        for _ in range(4):
+            with self.assertRaises(RuntimeError):
+                await backend.generate("wolf")
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+
+        self.assertEqual(await backend.generate("wolf"), ("fallback:1", "image/png"))
+        now[0] = 11
+        self.assertEqual(await backend.generate("wolf"), ("primary:5", "image/png"))
+        self.assertEqual(breaker.state, BREAKER_CLOSED)
+
+        metrics = backend.metrics()
+        self.assertEqual((metrics.primary_calls, metrics.fallback_calls, metrics.errors), (5, 1, 4))
+        self.assertEqual(metrics.breaker_opened, 1)
+
+    async def test_hedge_needs_a_spare_admission_slot(self) -> None:
+        admission = AdmissionController(max_in_flight=2, max_queue=0)
+        primary = ScriptedBackend("primary", [0.05, 1.0, 0.01])
+        backend = HedgedImageBackend(
+            primary, latency=_warm_tracker(0.001), hedge_min_delay_seconds=0, admission=admission
+        )
+
+        async with admission.admit():
+            async with admission.admit():
+                self.assertEqual(await backend.generate("wolf"), ("primary:1", "image/png"))
+        self.assertEqual((primary.calls, backend.metrics().hedges, backend.metrics().hedges_skipped), (1, 0, 1))
+
+        async with admission.admit():
+            self.assertEqual(await backend.generate("wolf"), ("primary:3", "image/png"))
+            await asyncio.sleep(0.01)
+            self.assertEqual(admission.in_flight, 1)
+        self.assertEqual((backend.metrics().hedges, backend.metrics().hedge_wins), (1, 1))
+
+    async def test_no_hedge_while_breaker_is_half_open(self) -> None:
+        now = [0.0]
+        primary = ScriptedBackend("primary", [0.05], failures=2)
+        fallback = ScriptedBackend("fallback", [])
+        breaker = CircuitBreaker(window=2, error_rate=0.5, cooldown_seconds=10, clock=lambda: now[0])
+        backend = HedgedImageBackend(
+            primary, fallback=fallback, breaker=breaker, latency=_warm_tracker(0.001), hedge_min_delay_seconds=0
+        )
+        for _ in range(2):
+            breaker.record(False, 0.0)
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+
+        now[0] = 11
+        with self.assertRaises(RuntimeError):
+            await backend.generate("wolf")
+        self.assertEqual(primary.calls, 1)
+        self.assertEqual(backend.metrics().hedges, 0)
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+
+    async def test_blocked_prompts_do_not_trip_the_breaker_or_wait_for_a_hedge(self) -> None:
+        class BlockingBackend(ScriptedBackend):
+            async def generate(self, prompt: str):
+                await super().generate(prompt)
+                raise ImageBlockedError("blocked by safety filters")
+
+        primary = BlockingBackend("primary", [0.05, 1.0] + [0.0] * 8)
+        fallback = ScriptedBackend("fallback", [])
+        breaker = CircuitBreaker(window=4, error_rate=0.5)
+        backend = HedgedImageBackend(
+            primary, fallback=fallback, breaker=breaker, latency=_warm_tracker(0.001), hedge_min_delay_seconds=0
+        )
+
+        started = asyncio.get_running_loop().time()
+        with self.assertRaises(ImageBlockedError):
+            await backend.generate("wolf")
+        self.assertLess(asyncio.get_running_loop().time() - started, 0.5)
+        await asyncio.sleep(0)
+        self.assertEqual(primary.cancelled, 1)
+
+        backend.hedge_percentile = 0
+        for _ in range(8):
+            with self.assertRaises(ImageBlockedError):
+                await backend.generate("wolf")
+        self.assertEqual(breaker.state, BREAKER_CLOSED)
+        self.assertEqual(fallback.calls, 0)
+
+    def test_breaker_opens_on_slow_primary(self) -> None:
+        breaker = CircuitBreaker(window=3, latency_seconds=5.0)
+        for _ in range(3):
+            breaker.record(True, 6.0)
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+        self.assertFalse(breaker.allow())
+
+    async def test_generate_image_against_local_stand_in(self) -> None:
+        primary = LocalImageBackend(latency=LatencyDistribution("fixed", 0.0), error_rate=1.0)
+        fallback = LocalImageBackend(model="local-stand-in:fast")
+        backend = HedgedImageBackend(
+            primary,
+            fallback=fallback,
+            breaker=CircuitBreaker(window=2, error_rate=0.5),
+            hedge_percentile=0,
+        )
+        with patch("main.IMAGE_BACKEND", backend):
+            for entity_type in ("wolf", "tree"):
+                with self.assertRaises(Exception):
+                    await generate_image(GenerateImageRequest(entity_type=entity_type))
+            result = await generate_image(GenerateImageRequest(entity_type="slime"))
+            metrics = await image_metrics()
+
+        self.assertEqual(result["mime_type"], "image/png")
+        self.assertEqual(fallback.calls, 1)
+        self.assertEqual(metrics["backend"]["breaker_state"], BREAKER_OPEN)
+        self.assertEqual(metrics["backend"]["fallback_calls"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
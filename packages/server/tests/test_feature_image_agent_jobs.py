@@ -0,0 +1,205 @@
+import asyncio
+import json
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.jobs import JOB_DONE, JOB_FAILED, ImageJob, ImageJobQueue, JobQueueFull  # type: ignore  # noqa: E402
+from voice.sender import DownstreamSender, SenderConfig  # type: ignore  # noqa: E402
+import main  # type: ignore  # noqa: E402
+from main import (  # type: ignore  # noqa: E402
+    SPRITE_CACHE,
+    SPRITE_FAILURES,
+    VOICE_CONNECTIONS,
+    ImageJobRequest,
+    get_image_job,
+    submit_image_job,
+)
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+async def _wait_until(predicate, timeout: float = 1.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.001)
+
+
+def _job_queue(**kwargs) -> ImageJobQueue:
+    queue = ImageJobQueue(**kwargs)
+    queue.configure(main._run_image_job, error_mapper=main._job_error)
+    queue.add_listener(main._notify_sprite_ready)
+    return queue
+
+
+class TestImageJobQueue(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+        VOICE_CONNECTIONS.clear()
+
+    async def test_submit_returns_immediately_and_poll_returns_sprite(self) -> None:
+        release = asyncio.Event()
+
+        async def backend(_prompt):
+            await release.wait()
+            return ("ZmFrZQ==", "image/png")
+
+        queue = _job_queue()
+        with patch("main.IMAGE_JOBS", queue), patch("main._generate_image_base64", backend):
+            submitted = await submit_image_job(ImageJobRequest(entity_type="wolf"))
+            self.assertEqual(submitted["status"], "queued")
+
+            release.set()
+            await _wait_until(lambda: queue.get(submitted["job_id"]).finished)
+            polled = await get_image_job(submitted["job_id"])
+        await queue.aclose()
+
+        self.assertEqual(polled["status"], JOB_DONE)
+        self.assertEqual(polled["image_base64"], "ZmFrZQ==")
+        self.assertEqual(polled["mime_type"], "image/png")
+
+    async def test_unknown_job_is_404(self) -> None:
+        with patch("main.IMAGE_JOBS", _job_queue()):
+            with self.assertRaises(HTTPException) as ctx:
+                await get_image_job("missing")
+        self.assertEqual(ctx.exception.status_code, 404)
+
+    async def test_jobs_run_in_priority_order(self) -> None:
+        order = []
+        queue = ImageJobQueue(workers=1)
+
+        async def runner(job):
+            order.append(job.entity_type)
+
+        queue.configure(runner)
+        for entity_type, priority in (("bg", 20), ("boss", 0), ("tree", 10)):
+            queue.submit(ImageJob(job_id=entity_type, prompt=entity_type, entity_type=entity_type, priority=priority))
+        await _wait_until(lambda: len(order) == 3)
+        await queue.aclose()
+
+        self.assertEqual(order, ["boss", "tree", "bg"])
+
+    async def test_finished_jobs_expire_after_ttl(self) -> None:
+        now = [100.0]
+        queue = ImageJobQueue(result_ttl_seconds=30, clock=lambda: now[0])
+
+        async def runner(_job):
+            return "done"
+
+        queue.configure(runner)
+        queue.submit(ImageJob(job_id="a", prompt="wolf", entity_type="wolf"))
+        await _wait_until(lambda: queue.get("a").finished)
+        now[0] += 29
+        self.assertIsNotNone(queue.get("a"))
+        now[0] += 2
+        self.assertIsNone(queue.get("a"))
+        await queue.aclose()
+
+    async def test_finished_jobs_are_capped_by_count(self) -> None:
+        queue = ImageJobQueue(max_finished=3)
+
+        async def runner(job):
+            return job.job_id
+
+        queue.configure(runner)
+        for index in range(10):
+            queue.submit(ImageJob(job_id=f"job-{index}", prompt="wolf", entity_type="wolf"))
+        await _wait_until(lambda: queue.pending == 0 and queue.get("job-9") is not None and queue.get("job-9").finished)
+        await queue.aclose()
+
+        self.assertEqual([index for index in range(10) if queue.get(f"job-{index}") is not None], [7, 8, 9])
+
+    async def test_client_priority_cannot_jump_the_queue(self) -> None:
+        release = asyncio.Event()
+
+        async def backend(_prompt):
+            await release.wait()
+            return ("ZmFrZQ==", "image/png")
+
+        queue = _job_queue(workers=1)
+        with patch("main.IMAGE_JOBS", queue), patch("main._generate_image_base64", backend):
+            urgent = await submit_image_job(ImageJobRequest(entity_type="boss", priority=-1000))
+            deferred = await submit_image_job(ImageJobRequest(entity_type="bg", priority=10_000))
+            release.set()
+        await queue.aclose()
+
+        self.assertEqual(queue.get(urgent["job_id"]).priority, 10)
+        self.assertEqual(queue.get(deferred["job_id"]).priority, 20)
+
+    async def test_full_queue_is_rejected_with_retry_after(self) -> None:
+        release = asyncio.Event()
+
+        async def runner(_job):
+            await release.wait()
+
+        queue = ImageJobQueue(workers=1, max_pending=1)
+        queue.configure(runner)
+        queue.submit(ImageJob(job_id="running", prompt="a", entity_type="a"))
+        await asyncio.sleep(0)
+        queue.submit(ImageJob(job_id="queued", prompt="b", entity_type="b"))
+        with self.assertRaises(JobQueueFull):
+            queue.submit(ImageJob(job_id="overflow", prompt="c", entity_type="c"))
+
+        with patch("main.IMAGE_JOBS", queue):
+            with self.assertRaises(HTTPException) as ctx:
+                await submit_image_job(ImageJobRequest(entity_type="wolf"))
+        release.set()
+        await queue.aclose()
+
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertEqual(ctx.exception.headers, {"Retry-After": "1"})
+
+    async def test_sprite_ready_is_pushed_through_the_session_sender(self) -> None:
+        websocket = FakeWebSocket()
+        sender = DownstreamSender(websocket, SenderConfig())
+        sender.start()
+        VOICE_CONNECTIONS[("user-1", "session-1")] = sender
+
+        async def backend(prompt):
+            if "slime" in prompt:
+                raise RuntimeError("No image data returned from Gemini")
+            return ("ZmFrZQ==", "image/png")
+
+        queue = _job_queue()
+        with patch("main.IMAGE_JOBS", queue), patch("main._generate_image_base64", backend):
+            ok = await submit_image_job(ImageJobRequest(entity_type="wolf", user_id="user-1", session_id="session-1"))
+            failed = await submit_image_job(ImageJobRequest(entity_type="slime", user_id="user-1", session_id="session-1"))
+            await _wait_until(lambda: len(websocket.sent) == 2)
+        await queue.aclose()
+        await sender.aclose()
+
+        by_job = {message["jobId"]: message for message in websocket.sent}
+        self.assertEqual(
+            by_job[ok["job_id"]],
+            {
+                "type": "spriteReady",
+                "jobId": ok["job_id"],
+                "entityType": "wolf",
+                "status": JOB_DONE,
+                "imageBase64": "ZmFrZQ==",
+                "mimeType": "image/png",
+            },
+        )
+        self.assertEqual(by_job[failed["job_id"]]["status"], JOB_FAILED)
+        self.assertEqual(by_job[failed["job_id"]]["error"]["status_code"], 503)
+        self.assertEqual(sender.stats.frames_sent, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
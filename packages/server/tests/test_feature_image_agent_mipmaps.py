@@ -0,0 +1,89 @@
+import base64
+import io
+import pathlib
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.backends import render_local_sprite  # type: ignore  # noqa: E402
+from image_agent.mipmaps import MIPMAPS_AVAILABLE, build_mip_chain, parse_mip_sizes  # type: ignore  # noqa: E402
+from image_agent.sprite_cache import SpriteCache, SpriteCacheEntry  # type: ignore  # noqa: E402
+from main import SPRITE_CACHE, SPRITE_FAILURES, GenerateImageRequest, generate_image  # type: ignore  # noqa: E402
+
+if MIPMAPS_AVAILABLE:
+    from PIL import Image
+
+
+def _edge(data: bytes) -> tuple[int, int]:
+    with Image.open(io.BytesIO(data)) as image:
+        return image.size
+
+
+class TestSpriteVariants(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+
+    def test_parse_mip_sizes(self) -> None:
+        self.assertEqual(parse_mip_sizes("16, 128,64,x,0,64"), (128, 64, 16))
+        self.assertEqual(parse_mip_sizes(""), ())
+
+    def test_variant_picks_smallest_level_covering_the_request(self) -> None:
+        levels = tuple((edge, SpriteCacheEntry(data=bytes(edge), mime_type="image/png")) for edge in (128, 64, 32, 16))
+        entry = SpriteCacheEntry(data=bytes(256), mime_type="image/png", variants=levels)
+
+        self.assertIs(entry.variant(None), entry)
+        self.assertIs(entry.variant(300), entry)
+        self.assertEqual(len(entry.variant(128).data), 128)
+        self.assertEqual(len(entry.variant(40).data), 64)
+        self.assertEqual(len(entry.variant(1).data), 16)
+        self.assertEqual(entry.size, 256 + 128 + 64 + 32 + 16)
+
+    @unittest.skipUnless(MIPMAPS_AVAILABLE, "pillow is required")
+    def test_mip_chain_only_downscales(self) -> None:
+        chain = build_mip_chain(render_local_sprite("wolf", 256), (128, 64, 32, 16))
+        self.assertEqual([edge for edge, _ in chain], [128, 64, 32, 16])
+        self.assertEqual([_edge(level) for _, level in chain], [(128, 128), (64, 64), (32, 32), (16, 16)])
+
+        small = build_mip_chain(render_local_sprite("wolf", 64), (128, 64, 32, 16))
+        self.assertEqual([edge for edge, _ in small], [32, 16])
+
+    async def test_variants_survive_the_disk_tier(self) -> None:
+        levels = ((32, SpriteCacheEntry(data=b"level-32", mime_type="image/png")),)
+        with tempfile.TemporaryDirectory() as directory:
+            await SpriteCache(disk_dir=directory).put("ab" * 32, SpriteCacheEntry(b"full", "image/png", levels))
+            restored = await SpriteCache(disk_dir=directory).get("ab" * 32)
+
+        self.assertEqual(restored.data, b"full")
+        self.assertEqual(restored.variant(32).data, b"level-32")
+
+    @unittest.skipUnless(MIPMAPS_AVAILABLE, "pillow is required")
+    async def test_generate_image_serves_requested_size(self) -> None:
+        encoded = base64.b64encode(render_local_sprite("wolf", 256)).decode("ascii")
+        calls = []
+
+        async def backend(prompt):
+            calls.append(prompt)
+            return (encoded, "image/png")
+
+        with patch("main._generate_image_base64", backend):
+            full = await generate_image(GenerateImageRequest(entity_type="wolf"))
+            small = await generate_image(GenerateImageRequest(entity_type="wolf"), size=32)
+            binary = await generate_image(GenerateImageRequest(entity_type="wolf"), response_format="binary", size=16)
+            full_binary = await generate_image(GenerateImageRequest(entity_type="wolf"), response_format="binary")
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(_edge(base64.b64decode(full["image_base64"])), (256, 256))
+        self.assertEqual(_edge(base64.b64decode(small["image_base64"])), (32, 32))
+        self.assertEqual(_edge(binary.body), (16, 16))
+        self.assertLess(len(binary.body), len(full_binary.body))
+        self.assertNotEqual(binary.headers["etag"], full_binary.headers["etag"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import pathlib
+import random
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.admission import AdmissionRejected  # type: ignore  # noqa: E402
+from image_agent.backends import ImageBlockedError, NoImageDataError, extract_inline_image  # type: ignore  # noqa: E402
+from image_agent.negative_cache import (  # type: ignore  # noqa: E402
+    FAILURE_PERMANENT,
+    FAILURE_TRANSIENT,
+    CachedSpriteFailure,
+    NegativeSpriteCache,
+    classify_failure,
+)
+from main import SPRITE_CACHE, GenerateImageRequest, generate_image  # type: ignore  # noqa: E402
+
+
+class CodedError(Exception):
+    def __init__(self, code: int) -> None:
+        super().__init__(f"backend returned {code}")
+        self.code = code
+
+
+class TestNegativeSpriteCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        self.now = [1000.0]
+        self.failures = NegativeSpriteCache(
+            ttl_seconds=60,
+            backoff_seconds=2,
+            backoff_max_seconds=16,
+            clock=lambda: self.now[0],
+            rng=random.Random(3),
+        )
+
+    def test_failures_are_classified(self) -> None:
+        self.assertEqual(classify_failure(NoImageDataError("empty")), FAILURE_PERMANENT)
+        self.assertEqual(classify_failure(ImageBlockedError("blocked")), FAILURE_PERMANENT)
+        self.assertEqual(classify_failure(CodedError(400)), FAILURE_PERMANENT)
+        self.assertEqual(classify_failure(CodedError(429)), FAILURE_TRANSIENT)
+        self.assertEqual(classify_failure(CodedError(503)), FAILURE_TRANSIENT)
+        self.assertEqual(classify_failure(TimeoutError()), FAILURE_TRANSIENT)
+        self.assertIsNone(classify_failure(CodedError(401)))
+        self.assertIsNone(classify_failure(AdmissionRejected(2)))
+
+    def test_safety_blocks_are_detected(self) -> None:
+        blocked_prompt = SimpleNamespace(candidates=[], prompt_feedback=SimpleNamespace(block_reason="SAFETY"))
+        with self.assertRaises(ImageBlockedError):
+            extract_inline_image(blocked_prompt)
+        blocked_image = SimpleNamespace(
+            candidates=[SimpleNamespace(content=None, finish_reason="FinishReason.IMAGE_SAFETY")],
+        )
+        with self.assertRaises(ImageBlockedError):
+            extract_inline_image(blocked_image)
+        with self.assertRaises(NoImageDataError) as ctx:
+            extract_inline_image(SimpleNamespace(candidates=[]))
+        self.assertNotIsInstance(ctx.exception, ImageBlockedError)
+        self.assertEqual(str(ctx.exception), "No image data returned from Gemini")
+
+    def test_transient_backoff_grows_with_jitter_and_resets_on_success(self) -> None:
+        windows = []
+        for _ in range(5):
+            self.failures.record_failure("key", CodedError(503))
+            with self.assertRaises(CachedSpriteFailure) as ctx:
+                self.failures.check("key")
+            windows.append(ctx.exception.retry_after_seconds)
+            self.assertEqual(ctx.exception.status_code, 503)
+            self.now[0] += 20
+
+        bounds = [(1, 2), (2, 4), (4, 8), (4, 16), (4, 16)]
+        for window, (low, high) in zip(windows, bounds):
+            self.assertGreaterEqual(window, low)
+            self.assertLessEqual(window, high)
+
+        self.failures.record_success("key")
+        self.failures.check("key")
+        self.assertEqual(len(self.failures), 0)
+
+    async def test_permanent_failure_is_served_from_cache_until_ttl(self) -> None:
+        calls = []
+
+        async def backend(prompt):
+            calls.append(prompt)
+            raise NoImageDataError("No image data returned from Gemini")
+
+        with patch("main.SPRITE_FAILURES", self.failures), patch("main._generate_image_base64", backend):
+            for _ in range(3):
+                with self.assertRaises(HTTPException) as ctx:
+                    await generate_image(GenerateImageRequest(entity_type="forbidden"))
+                self.assertEqual(ctx.exception.status_code, 422)
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(ctx.exception.headers, {"Retry-After": "60"})
+
+            self.now[0] += 61
+            with self.assertRaises(HTTPException):
+                await generate_image(GenerateImageRequest(entity_type="forbidden"))
+        self.assertEqual(len(calls), 2)
+
+    async def test_transient_failure_backs_off_then_retries(self) -> None:
+        outcomes = [CodedError(503), None]
+
+        async def backend(_prompt):
+            outcome = outcomes.pop(0)
+            if outcome is not None:
+                raise outcome
+            return ("ZmFrZQ==", "image/png")
+
+        with patch("main.SPRITE_FAILURES", self.failures), patch("main._generate_image_base64", backend):
+            with self.assertRaises(HTTPException) as first:
+                await generate_image(GenerateImageRequest(entity_type="wolf"))
+            with self.assertRaises(HTTPException) as backing_off:
+                await generate_image(GenerateImageRequest(entity_type="wolf"))
+            self.now[0] += 2
+            result = await generate_image(GenerateImageRequest(entity_type="wolf"))
+
+        self.assertEqual(first.exception.status_code, 503)
+        self.assertEqual(backing_off.exception.status_code, 503)
+        self.assertIn("Retry-After", backing_off.exception.headers)
+        self.assertEqual(result["image_base64"], "ZmFrZQ==")
+        self.assertEqual(outcomes, [])
+        self.assertEqual(len(self.failures), 0)
+
+    async def test_admission_rejections_are_not_cached(self) -> None:
+        self.assertIsNone(self.failures.record_failure("key", AdmissionRejected(3)))
+        self.failures.check("key")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import base64
+import io
+import pathlib
+import sys
+import unittest
+from unittest.mock import AsyncMock, patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.postprocess import (POSTPROCESS_AVAILABLE, SpritePostprocessConfig,  # type: ignore  # noqa: E402
+                                     detect_pixel_grid, postprocess_sprite)
+from main import SPRITE_CACHE, SPRITE_FAILURES, GenerateImageRequest, generate_image  # type: ignore  # noqa: E402
+
+if POSTPROCESS_AVAILABLE:
+    import numpy as np
+    from PIL import Image
+
+
+def _upscaled_sprite(cell=16, size=32, pad=(5, 7)):
+    rng = np.random.default_rng(7)
+    palette = rng.integers(0, 256, (6, 4), dtype=np.uint8)
+    palette[:, 3] = 255
+    palette[0, 3] = 0
+    sprite = palette[rng.integers(0, len(palette), (size, size))]
+    upscaled = np.repeat(np.repeat(sprite, cell, axis=0), cell, axis=1)
+    upscaled = np.pad(upscaled, ((pad[0], cell - pad[0]), (pad[1], cell - pad[1]), (0, 0)), mode="edge")
+    noise = rng.integers(-5, 6, upscaled.shape)
+    noisy = np.clip(upscaled.astype(int) + noise, 0, 255).astype(np.uint8)
+    noisy[..., 3] = upscaled[..., 3]
+    buffer = io.BytesIO()
+    Image.fromarray(noisy, mode="RGBA").save(buffer, format="PNG")
+    return sprite, noisy, buffer.getvalue()
+
+
+@unittest.skipUnless(POSTPROCESS_AVAILABLE, "numpy and pillow are required")
+class TestSpritePostprocess(unittest.IsolatedAsyncioTestCase):
+    def test_detects_cell_size_and_offset(self) -> None:
+        _, pixels, _ = _upscaled_sprite(cell=12, pad=(3, 9))
+        self.assertEqual(detect_pixel_grid(pixels), (12, 9, 3))
+
+    def test_downsamples_to_true_resolution_with_small_palette(self) -> None:
+        sprite, _, data = _upscaled_sprite()
+        processed = postprocess_sprite(data, SpritePostprocessConfig(enabled=True, palette_size=8))
+
+        self.assertEqual((processed.width, processed.height, processed.cell_size), (32, 32, 16))
+        self.assertLess(len(processed.data) * 10, len(data))
+        with Image.open(io.BytesIO(processed.data)) as image:
+            self.assertEqual(image.mode, "P")
+            pixels = np.asarray(image.convert("RGBA")).astype(int)
+        opaque = sprite[..., 3] == 255
+        self.assertLessEqual(np.abs(pixels[opaque] - sprite[opaque].astype(int)).max(), 8)
+        self.assertTrue((pixels[~opaque][:, 3] == 0).all())
+
+    def test_gridless_images_fall_back_to_target_size(self) -> None:
+        rng = np.random.default_rng(1)
+        noise = rng.integers(0, 256, (256, 256, 4), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(noise, mode="RGBA").save(buffer, format="PNG")
+        processed = postprocess_sprite(buffer.getvalue(), SpritePostprocessConfig(enabled=True, fallback_size=64))
+        self.assertEqual((processed.width, processed.height, processed.cell_size), (64, 64, 1))
+
+    async def test_generate_image_caches_post_processed_sprite(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+        _, _, data = _upscaled_sprite()
+        backend = AsyncMock(return_value=(base64.b64encode(data).decode("utf-8"), "image/png"))
+        with patch("main._generate_image_base64", backend), patch(
+            "main.SPRITE_POSTPROCESS", SpritePostprocessConfig(enabled=True)
+        ):
+            response = await generate_image(GenerateImageRequest(entity_type="wolf"))
+
+        processed = base64.b64decode(response["image_base64"])
+        self.assertEqual(response["mime_type"], "image/png")
+        self.assertLess(len(processed) * 10, len(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
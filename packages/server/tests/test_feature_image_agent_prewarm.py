@@ -0,0 +1,85 @@
+import asyncio
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.admission import AdmissionController  # type: ignore  # noqa: E402
+from image_agent.prewarm import PrewarmItem, SpritePrewarmer, parse_prewarm_list  # type: ignore  # noqa: E402
+from main import SPRITE_CACHE, SPRITE_FAILURES, _prewarm_sprite, health_check  # type: ignore  # noqa: E402
+
+
+class TestSpritePrewarm(unittest.IsolatedAsyncioTestCase):
+    def test_parse_prewarm_list_supports_hints_and_dedupes(self) -> None:
+        items = parse_prewarm_list("wolf, tree ,crystal:glowing blue,,wolf")
+        self.assertEqual(
+            items,
+            [PrewarmItem("wolf"), PrewarmItem("tree"), PrewarmItem("crystal", "glowing blue")],
+        )
+
+    async def test_prewarm_populates_cache_and_continues_after_failures(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+        prompts = []
+
+        async def backend(prompt):
+            prompts.append(prompt)
+            if "slime" in prompt:
+                raise RuntimeError("No image data returned from Gemini")
+            return ("ZmFrZQ==", "image/png")
+
+        prewarmer = SpritePrewarmer(parse_prewarm_list("wolf,slime,tree"), interval_seconds=0)
+        with patch("main._generate_image_base64", backend):
+            await prewarmer.start(_prewarm_sprite, AdmissionController(max_in_flight=4))
+
+        self.assertTrue(prewarmer.finished)
+        self.assertEqual((prewarmer.completed, prewarmer.failed), (2, 1))
+        self.assertEqual(SPRITE_CACHE.stats().memory_entries, 2)
+        self.assertEqual(len(prompts), 3)
+
+    async def test_prewarm_yields_while_interactive_requests_are_queued(self) -> None:
+        admission = AdmissionController(max_in_flight=2, max_queue=4)
+        release = asyncio.Event()
+        started = []
+
+        async def interactive():
+            async with admission.admit():
+                await release.wait()
+
+        async def resolve(item):
+            started.append(item.entity_type)
+
+        busy = asyncio.create_task(interactive())
+        await asyncio.sleep(0)
+        prewarmer = SpritePrewarmer([PrewarmItem("wolf")], idle_poll_seconds=0.005)
+        task = prewarmer.start(resolve, admission)
+        await asyncio.sleep(0.03)
+        self.assertEqual(started, [])
+
+        release.set()
+        await busy
+        await task
+        self.assertEqual(started, ["wolf"])
+
+    async def test_health_waits_for_prewarm_when_gated(self) -> None:
+        gated = SpritePrewarmer([PrewarmItem("wolf")], gates_readiness=True)
+        with patch("main.SPRITE_PREWARMER", gated), self.assertRaises(HTTPException) as context:
+            await health_check()
+        self.assertEqual(context.exception.status_code, 503)
+
+        async def resolve(_item):
+            return None
+
+        await gated.start(resolve, AdmissionController())
+        with patch("main.SPRITE_PREWARMER", gated):
+            self.assertEqual(await health_check(), {"status": "ok"})
+
+
+if __name__ == "__main__":
+    unittest.main()
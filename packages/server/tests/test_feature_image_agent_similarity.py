@@ -0,0 +1,105 @@
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.similarity import SimilarSpriteIndex, canonical_sprite_tokens  # type: ignore  # noqa: E402
+from main import SPRITE_CACHE, SPRITE_FAILURES, SPRITE_SIMILARITY, GenerateImageRequest, generate_image  # type: ignore  # noqa: E402
+
+
+class TestSpriteSimilarity(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+        SPRITE_SIMILARITY.clear()
+
+    def test_canonical_tokens_fold_order_case_and_aliases(self) -> None:
+        expected = ("red", "wolf")
+        self.assertEqual(canonical_sprite_tokens("red wolf"), expected)
+        self.assertEqual(canonical_sprite_tokens("Wolf, RED"), expected)
+        self.assertEqual(canonical_sprite_tokens("赤い狼"), expected)
+        self.assertEqual(canonical_sprite_tokens("wolf", "red"), expected)
+        self.assertEqual(canonical_sprite_tokens("the red wolves"), expected)
+        self.assertNotEqual(canonical_sprite_tokens("blue wolf"), expected)
+
+    def test_threshold_controls_near_duplicate_matches(self) -> None:
+        strict = SimilarSpriteIndex(threshold=0.8)
+        loose = SimilarSpriteIndex(threshold=0.6)
+        for index in (strict, loose):
+            index.add("model", "red wolf", None, "key-red-wolf")
+            index.add("model", "blue slime", None, "key-blue-slime")
+
+        self.assertIsNone(strict.lookup("model", "red wolf pup"))
+        match = loose.lookup("model", "red wolf pup")
+        self.assertEqual(match.cache_key, "key-red-wolf")
+        self.assertLess(match.score, 1.0)
+        self.assertIsNone(loose.lookup("other-model", "red wolf"))
+
+    def test_plural_folding_leaves_singular_words_alone(self) -> None:
+        self.assertEqual(
+            canonical_sprite_tokens("dragons slimes foxes torches fairies"), ("dragon", "fairy", "fox", "slime", "torch")
+        )
+        self.assertEqual(canonical_sprite_tokens("iris cactus glass atlas"), ("atlas", "cactus", "glass", "iris"))
+
+    def test_attribute_tokens_must_match_for_near_duplicates(self) -> None:
+        index = SimilarSpriteIndex(threshold=0.8)
+        index.add("model", "fire breathing dragon", None, "key-dragon")
+
+        self.assertIsNone(index.lookup("model", "red fire breathing dragons"))
+        self.assertIsNone(index.lookup("model", "ice breathing dragon"))
+        self.assertEqual(index.lookup("model", "fire breathing dragons").cache_key, "key-dragon")
+
+    def test_lookup_stays_accurate_with_many_entries_and_evicts_lru(self) -> None:
+        index = SimilarSpriteIndex(threshold=0.6, max_entries=1000)
+        for number in range(1200):
+            index.add("model", f"creature{number} variant{number * 7}", None, f"key-{number}")
+
+        self.assertEqual(len(index), 1000)
+        self.assertNotEqual(getattr(index.lookup("model", "creature3 variant21"), "cache_key", None), "key-3")
+        match = index.lookup("model", "variant7000 creature1000 big")
+        self.assertEqual(match.cache_key, "key-1000")
+
+        index.discard("key-1000")
+        match = index.lookup("model", "creature1000 variant7000")
+        self.assertNotEqual(getattr(match, "cache_key", None), "key-1000")
+
+    async def test_phrasings_of_the_same_sprite_share_one_generation(self) -> None:
+        calls = []
+
+        async def backend(prompt):
+            calls.append(prompt)
+            return ("ZmFrZQ==", "image/png")
+
+        with patch("main._generate_image_base64", backend):
+            first = await generate_image(GenerateImageRequest(entity_type="red wolf"))
+            second = await generate_image(GenerateImageRequest(entity_type="wolf, red"))
+            third = await generate_image(GenerateImageRequest(entity_type="赤い狼"))
+            other = await generate_image(GenerateImageRequest(entity_type="blue wolf"))
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(first, second)
+        self.assertEqual(first, third)
+        self.assertEqual(other["image_base64"], "ZmFrZQ==")
+
+    async def test_evicted_sprite_is_regenerated(self) -> None:
+        calls = []
+
+        async def backend(prompt):
+            calls.append(prompt)
+            return ("ZmFrZQ==", "image/png")
+
+        with patch("main._generate_image_base64", backend):
+            await generate_image(GenerateImageRequest(entity_type="red wolf"))
+            SPRITE_CACHE.clear()
+            await generate_image(GenerateImageRequest(entity_type="wolf, red"))
+            await generate_image(GenerateImageRequest(entity_type="red wolf"))
+
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.singleflight import SingleFlight  # type: ignore  # noqa: E402
+from main import SPRITE_CACHE, SPRITE_FAILURES, SPRITE_FLIGHTS, GenerateImageRequest, generate_image  # type: ignore  # noqa: E402
+
+
+class GatedBackend:
+    def __init__(self, result=("ZmFrZQ==", "image/png"), error=None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.result = result
+        self.error = error
+
+    async def __call__(self, _prompt):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+
+    async def test_hundred_concurrent_identical_requests_trigger_one_backend_call(self) -> None:
+        backend = GatedBackend()
+        with patch("main._generate_image_base64", backend):
+            tasks = [asyncio.create_task(generate_image(GenerateImageRequest(entity_type="wolf"))) for _ in range(100)]
+            await asyncio.sleep(0)
+            backend.release.set()
+            responses = await asyncio.gather(*tasks)
+
+        self.assertEqual(backend.calls, 1)
+        self.assertEqual({response["image_base64"] for response in responses}, {"ZmFrZQ=="})
+        self.assertEqual(SPRITE_FLIGHTS.in_flight(), 0)
+
+    async def test_shared_error_is_delivered_to_every_waiter(self) -> None:
+        backend = GatedBackend(error=RuntimeError("safety block"))
+        with patch("main._generate_image_base64", backend):
+            tasks = [asyncio.create_task(generate_image(GenerateImageRequest(entity_type="wolf"))) for _ in range(5)]
+            await asyncio.sleep(0)
+            backend.release.set()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.assertEqual(backend.calls, 1)
+        for result in results:
+            self.assertIsInstance(result, HTTPException)
+            self.assertEqual(result.status_code, 503)
+
+    async def test_cancelled_waiter_does_not_cancel_shared_call(self) -> None:
+        flights = SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "sprite"
+
+        first = asyncio.create_task(flights.run("wolf", work))
+        second = asyncio.create_task(flights.run("wolf", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        self.assertEqual(await second, "sprite")
+        self.assertTrue(first.cancelled())
+        self.assertEqual(calls, 1)
+
+    async def test_new_flight_starts_after_previous_completes(self) -> None:
+        flights = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        self.assertEqual(await flights.run("k", work), 1)
+        self.assertEqual(await flights.run("k", work), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
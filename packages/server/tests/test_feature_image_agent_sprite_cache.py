@@ -0,0 +1,109 @@
+import pathlib
+import sys
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from image_agent.sprite_cache import SpriteCache, SpriteCacheEntry, sprite_cache_key  # type: ignore  # noqa: E402
+from main import (  # type: ignore  # noqa: E402
+    IMAGE_GENERATION_MODEL,
+    SPRITE_CACHE,
+    SPRITE_FAILURES,
+    GenerateImageRequest,
+    build_pixel_art_prompt,
+    generate_image,
+)
+
+
+class TestSpriteCache(unittest.IsolatedAsyncioTestCase):
+    def test_cache_key_depends_on_prompt_and_model(self) -> None:
+        prompt = build_pixel_art_prompt("wolf")
+        self.assertEqual(sprite_cache_key(prompt, "model-a"), sprite_cache_key(prompt, "model-a"))
+        self.assertNotEqual(sprite_cache_key(prompt, "model-a"), sprite_cache_key(prompt, "model-b"))
+        self.assertNotEqual(sprite_cache_key(prompt, "model-a"), sprite_cache_key(build_pixel_art_prompt("tree"), "model-a"))
+
+    async def test_memory_tier_evicts_least_recently_used_within_byte_budget(self) -> None:
+        cache = SpriteCache(max_memory_bytes=10)
+        await cache.put("a", SpriteCacheEntry(data=b"aaaa", mime_type="image/png"))
+        await cache.put("b", SpriteCacheEntry(data=b"bbbb", mime_type="image/png"))
+        self.assertIsNotNone(await cache.get("a"))
+        await cache.put("c", SpriteCacheEntry(data=b"cccc", mime_type="image/png"))
+
+        self.assertIsNone(await cache.get("b"))
+        self.assertIsNotNone(await cache.get("a"))
+        self.assertIsNotNone(await cache.get("c"))
+        stats = cache.stats()
+        self.assertEqual(stats.evictions, 1)
+        self.assertEqual(stats.memory_hits, 3)
+        self.assertEqual(stats.misses, 1)
+        self.assertLessEqual(stats.memory_bytes, 10)
+
+    async def test_disk_tier_survives_new_cache_instance(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            first = SpriteCache(max_memory_bytes=1024, disk_dir=tmp)
+            await first.put("k", SpriteCacheEntry(data=b"sprite", mime_type="image/webp"))
+
+            second = SpriteCache(max_memory_bytes=1024, disk_dir=tmp)
+            entry = await second.get("k")
+
+            self.assertIsNotNone(entry)
+            self.assertEqual(entry.data, b"sprite")
+            self.assertEqual(entry.mime_type, "image/webp")
+            self.assertEqual(second.stats().disk_hits, 1)
+            self.assertIsNotNone(second.get_memory("k"))
+
+
+    async def test_disk_tier_evicts_oldest_files_within_byte_budget(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SpriteCache(max_memory_bytes=0, disk_dir=tmp, max_disk_bytes=250)
+            for key in ("aa1", "bb2", "cc3"):
+                await cache.put(key, SpriteCacheEntry(data=key.encode() * 20, mime_type="image/png"))
+
+            self.assertIsNone(await cache.get("aa1"))
+            self.assertEqual(list(pathlib.Path(tmp).glob("aa/*")), [])
+            self.assertIsNotNone(await cache.get("bb2"))
+            await cache.put("dd4", SpriteCacheEntry(data=b"dd4" * 20, mime_type="image/png"))
+            self.assertIsNone(await cache.get("cc3"))
+            self.assertIsNotNone(await cache.get("bb2"))
+            stats = cache.stats()
+            self.assertEqual(stats.disk_evictions, 2)
+            self.assertLessEqual(stats.disk_bytes, 250)
+
+            reopened = SpriteCache(max_memory_bytes=0, disk_dir=tmp, max_disk_bytes=120)
+            await reopened.put("ee5", SpriteCacheEntry(data=b"ee5" * 20, mime_type="image/png"))
+            self.assertIsNone(await reopened.get("bb2"))
+            self.assertLessEqual(reopened.stats().disk_bytes, 120)
+
+
+class TestGenerateImageUsesSpriteCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+
+    async def test_repeated_requests_hit_cache_instead_of_backend(self) -> None:
+        backend = AsyncMock(return_value=("ZmFrZQ==", "image/png"))
+        with patch("main._generate_image_base64", backend):
+            first = await generate_image(GenerateImageRequest(entity_type="wolf"))
+            second = await generate_image(GenerateImageRequest(entity_type=" wolf "))
+
+        self.assertEqual(backend.await_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(SPRITE_CACHE.stats().hits, 1)
+        key = sprite_cache_key(build_pixel_art_prompt("wolf"), IMAGE_GENERATION_MODEL)
+        self.assertEqual(SPRITE_CACHE.get_memory(key).data, b"fake")
+
+    async def test_prompt_hint_produces_separate_entry(self) -> None:
+        backend = AsyncMock(return_value=("ZmFrZQ==", "image/png"))
+        with patch("main._generate_image_base64", backend):
+            await generate_image(GenerateImageRequest(entity_type="wolf"))
+            await generate_image(GenerateImageRequest(entity_type="wolf", prompt_hint="red"))
+
+        self.assertEqual(backend.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,10 +9,20 @@ SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
 if str(SERVER_DIR) not in sys.path:
     sys.path.insert(0, str(SERVER_DIR))
 
-from main import GenerateImageRequest, build_pixel_art_prompt, generate_image  # type: ignore  # noqa: E402
+from main import (  # type: ignore  # noqa: E402
+    SPRITE_CACHE,
+    SPRITE_FAILURES,
+    GenerateImageRequest,
+    build_pixel_art_prompt,
+    generate_image,
+)
 
 
 class TestFeatureImageAgentTask21(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+
     def test_build_pixel_art_prompt_includes_entity_type(self) -> None:
         prompt = build_pixel_art_prompt("tree")
         self.assertIn("tree", prompt)
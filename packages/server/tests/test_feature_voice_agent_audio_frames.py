@@ -0,0 +1,139 @@
+import json
+import pathlib
+import sys
+import unittest
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from main import handle_voice_session  # type: ignore  # noqa: E402
+from voice.events import encode_adk_event  # type: ignore  # noqa: E402
+from voice.frames import (  # type: ignore  # noqa: E402
+    AUDIO_FRAME_HEADER,
+    AUDIO_FRAMES_SUBPROTOCOL,
+    AudioFrameWriter,
+    parse_audio_frame,
+    sample_rate_from_mime,
+)
+
+AUDIO = bytes(range(256)) * 8
+
+
+def _audio_event(**extra):
+    return {
+        "author": "ego_world_agent",
+        "content": {
+            "parts": [
+                {"inlineData": {"mimeType": "audio/pcm;rate=24000", "data": AUDIO}},
+                {"text": "ok"},
+            ]
+        },
+        **extra,
+    }
+
+
+class FakeLiveQueue:
+    async def send_realtime(self, _payload):
+        return None
+
+    async def aclose(self):
+        return None
+
+
+class FakeWebSocket:
+    def __init__(self, subprotocols):
+        self.scope = {"type": "websocket", "subprotocols": list(subprotocols)}
+        self.accepted_subprotocol = "unset"
+        self.text = []
+        self.binary = []
+
+    async def accept(self, subprotocol=None):
+        self.accepted_subprotocol = subprotocol
+
+    async def receive(self):
+        return {"type": "websocket.disconnect"}
+
+    async def send_text(self, text):
+        self.text.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        self.binary.append(data)
+
+    async def send_json(self, payload):
+        self.text.append(payload)
+
+    async def close(self, code: int = 1000, reason=None):
+        return None
+
+
+class FakeSessionService:
+    async def get_session(self, user_id, session_id):
+        return {"user_id": user_id, "session_id": session_id}
+
+
+class FakeRunner:
+    def __init__(self, events):
+        self.events = events
+
+    async def run_live(self, **_kwargs):
+        for event in self.events:
+            yield event
+
+
+async def _run_session(websocket, events):
+    await handle_voice_session(
+        websocket=websocket,
+        user_id="frames-user",
+        session_id="s1",
+        session_service=FakeSessionService(),
+        runner=FakeRunner(events),
+        live_request_queue=FakeLiveQueue(),
+    )
+
+
+class TestAudioFrames(unittest.IsolatedAsyncioTestCase):
+    def test_header_round_trip(self) -> None:
+        writer = AudioFrameWriter()
+        writer.frame("audio/pcm;rate=24000", b"\x00\x01")
+        writer.end_turn()
+        frame = writer.frame("audio/pcm; rate=16000", memoryview(b"\x02\x03"))
+
+        sequence, sample_rate, turn_id, payload = parse_audio_frame(frame)
+        self.assertEqual((sequence, sample_rate, turn_id, bytes(payload)), (1, 16000, 1, b"\x02\x03"))
+        self.assertEqual(len(frame), AUDIO_FRAME_HEADER.size + 2)
+        self.assertEqual(sample_rate_from_mime("audio/pcm"), 24000)
+
+    def test_audio_parts_are_lifted_out_of_the_event(self) -> None:
+        inline = encode_adk_event(_audio_event())
+        lifted = encode_adk_event(_audio_event(), binary_audio=True)
+
+        payload = json.loads(lifted.frame)["payload"]
+        self.assertEqual(payload["content"]["parts"], [{}, {"text": "ok"}])
+        self.assertEqual(lifted.audio, (("audio/pcm;rate=24000", AUDIO),))
+        wire = len(lifted.frame) + AUDIO_FRAME_HEADER.size + len(AUDIO)
+        self.assertLess(wire, len(inline.frame) * 0.8)
+
+    async def test_negotiated_session_streams_binary_frames_per_turn(self) -> None:
+        websocket = FakeWebSocket(["other", AUDIO_FRAMES_SUBPROTOCOL])
+        events = [_audio_event(), _audio_event(turnComplete=True), _audio_event()]
+        await _run_session(websocket, events)
+
+        self.assertEqual(websocket.accepted_subprotocol, AUDIO_FRAMES_SUBPROTOCOL)
+        headers = [parse_audio_frame(frame)[:3] for frame in websocket.binary]
+        self.assertEqual(headers, [(0, 24000, 0), (1, 24000, 0), (2, 24000, 1)])
+        self.assertEqual(bytes(parse_audio_frame(websocket.binary[0])[3]), AUDIO)
+        self.assertEqual([frame["type"] for frame in websocket.text], ["adkEvent"] * 3)
+
+    async def test_clients_without_the_subprotocol_keep_inline_audio(self) -> None:
+        websocket = FakeWebSocket([])
+        await _run_session(websocket, [_audio_event()])
+
+        self.assertIsNone(websocket.accepted_subprotocol)
+        self.assertEqual(websocket.binary, [])
+        inline = websocket.text[0]["payload"]["content"]["parts"][0]["inlineData"]
+        self.assertEqual(inline["mimeType"], "audio/pcm;rate=24000")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import base64
+import json
+import pathlib
+import sys
+import unittest
+from typing import Any, Optional
+
+from pydantic import BaseModel, ConfigDict
+from pydantic.alias_generators import to_camel
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from voice.events import encode_adk_event  # type: ignore  # noqa: E402
+
+
+class _Model(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+
+class Blob(_Model):
+    mime_type: Optional[str] = None
+    data: Optional[bytes] = None
+
+
+class FunctionResponse(_Model):
+    name: Optional[str] = None
+    response: Optional[dict[str, Any]] = None
+
+
+class Part(_Model):
+    text: Optional[str] = None
+    inline_data: Optional[Blob] = None
+    function_response: Optional[FunctionResponse] = None
+
+
+class Event(_Model):
+    author: str
+    parts: list[Part] = []
+    turn_complete: Optional[bool] = None
+    timestamp: float = 0.0
+    long_running_tool_ids: Optional[set[str]] = None
+
+
+PATCH = {"effect": "neon", "color": "#00FF99", "intensity": 64, "spawn": None, "caption": "ネオン"}
+
+
+class TestEventEncoder(unittest.TestCase):
+    def test_model_matches_model_dump(self) -> None:
+        event = Event(
+            author="ego_world_agent",
+            parts=[Part(inline_data=Blob(mime_type="audio/pcm;rate=24000", data=b"\x00\xff" * 8)), Part(text="やあ")],
+            turn_complete=False,
+            timestamp=1.5,
+            long_running_tool_ids={"call-1", "call-2"},
+        )
+        frame = json.loads(encode_adk_event(event).frame)
+
+        expected = event.model_dump(by_alias=True, exclude_none=True)
+        expected["parts"][0]["inlineData"]["data"] = base64.b64encode(b"\x00\xff" * 8).decode()
+        expected["longRunningToolIds"] = json.loads(event.model_dump_json(include={"long_running_tool_ids"}))[
+            "long_running_tool_ids"
+        ]
+        self.assertIsInstance(expected["longRunningToolIds"], list)
+        self.assertEqual(frame, {"type": "adkEvent", "payload": expected, "turnComplete": False})
+
+    def test_binary_views_are_base64_encoded_inline(self) -> None:
+        encoded = encode_adk_event({"a": bytearray(b"\x01\x02"), "b": memoryview(b"\x03"), "c": [b"", 1, 2.5, None]})
+        self.assertEqual(
+            encoded.frame,
+            '{"type":"adkEvent","payload":{"a":"AQI=","b":"Aw==","c":["",1,2.5,null]}}',
+        )
+        self.assertIsNone(encoded.turn_complete)
+
+    def test_world_patch_json_is_reused_from_the_event(self) -> None:
+        response = {"status": "applied", "patch": dict(PATCH)}
+        event = Event(
+            author="ego_world_agent",
+            parts=[Part(function_response=FunctionResponse(name="apply_world_patch", response=response))],
+            turn_complete=True,
+        )
+        encoded = encode_adk_event(event, world_patch=event.parts[0].function_response.response["patch"])
+
+        self.assertTrue(encoded.turn_complete)
+        self.assertEqual(json.loads(encoded.world_patch), PATCH)
+        self.assertEqual(json.loads(encoded.world_patch_frame()), {"type": "worldPatch", "patch": PATCH})
+        self.assertIsNone(encode_adk_event(event).world_patch)
+
+    def test_world_patch_outside_the_event_is_encoded_separately(self) -> None:
+        encoded = encode_adk_event({"author": "a"}, world_patch=PATCH)
+        self.assertEqual(json.loads(encoded.world_patch), PATCH)
+
+    def test_unknown_events_encode_as_empty_payload(self) -> None:
+        self.assertEqual(encode_adk_event(object()).frame, '{"type":"adkEvent","payload":{}}')
+
+
+if __name__ == "__main__":
+    unittest.main()
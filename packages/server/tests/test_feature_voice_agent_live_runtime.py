@@ -0,0 +1,77 @@
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from main import websocket_endpoint  # type: ignore  # noqa: E402
+from voice.live import LiveRuntime  # type: ignore  # noqa: E402
+
+
+class FakeRunner:
+    def __init__(self) -> None:
+        self.run_configs = []
+        self.closed = False
+
+    async def run_live(self, **kwargs):
+        self.run_configs.append(kwargs.get("run_config"))
+        if False:
+            yield {}
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.close_code = None
+
+    async def accept(self):
+        return None
+
+    async def receive(self):
+        return {"type": "websocket.disconnect"}
+
+    async def close(self, code: int = 1000, reason=None):
+        self.close_code = code
+
+
+class TestLiveRuntime(unittest.IsolatedAsyncioTestCase):
+    async def test_runner_and_run_config_are_built_once_per_process(self) -> None:
+        runners = []
+
+        def build_runner():
+            runners.append(FakeRunner())
+            return runners[-1]
+
+        runtime = LiveRuntime(build_runner, lambda: {"streaming_mode": "BIDI"})
+        self.assertFalse(runtime.started)
+
+        with patch("main.VOICE_RUNTIME", runtime):
+            for index in range(5):
+                websocket = FakeWebSocket()
+                await websocket_endpoint(websocket, "user-1", f"session-{index}")
+                self.assertEqual(websocket.close_code, 1000)
+
+        self.assertEqual((runtime.builds, len(runners)), (1, 1))
+        self.assertEqual(len(runners[0].run_configs), 5)
+        self.assertTrue(all(config is runtime.run_config for config in runners[0].run_configs))
+
+    async def test_close_releases_the_runner_and_allows_restart(self) -> None:
+        runtime = LiveRuntime(FakeRunner, dict)
+        runtime.start()
+        runtime.start()
+        runner = runtime.runner
+        await runtime.aclose()
+
+        self.assertTrue(runner.closed)
+        self.assertFalse(runtime.started)
+        self.assertIsNot(runtime.runner, runner)
+        self.assertEqual(runtime.builds, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import pathlib
+import struct
+import sys
+import unittest
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from main import (  # type: ignore  # noqa: E402
+    SPRITE_CACHE,
+    SPRITE_FAILURES,
+    GenerateImageRequest,
+    generate_image,
+    process_downstream_events,
+    process_upstream_messages,
+    prometheus_metrics,
+)
+from runtime.metrics import MarkTimer, MetricsRegistry  # type: ignore  # noqa: E402
+from voice.upstream import UpstreamAudioConfig  # type: ignore  # noqa: E402
+from voice.vad import VadConfig, VoiceActivityGate  # type: ignore  # noqa: E402
+
+PATCH = {"effect": "neon", "color": "#00FF99", "intensity": 64, "spawn": None, "caption": "ネオン"}
+
+
+def _sample(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class FakeLiveQueue:
+    def send_realtime(self, _payload):
+        return None
+
+    def send_content(self, _content):
+        return None
+
+
+class FakeWebSocket:
+    def __init__(self, incoming):
+        self._incoming = list(incoming)
+        self.sent = []
+
+    async def receive(self):
+        if self._incoming:
+            return self._incoming.pop(0)
+        return {"type": "websocket.disconnect"}
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+
+class PacedWebSocket(FakeWebSocket):
+    def __init__(self, incoming, now, interval):
+        super().__init__(incoming)
+        self._now = now
+        self._interval = interval
+
+    async def receive(self):
+        self._now[0] += self._interval
+        return await super().receive()
+
+
+async def _events(items):
+    for item in items:
+        yield item
+
+
+class TestMetricsRegistry(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+
+    def test_render_uses_prometheus_text_format(self) -> None:
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Requests.").inc(3)
+        frames = registry.counter("frames_total", "Frames.", ("type",))
+        frames.labels('a"b').inc()
+        histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        registry.gauge_callback("open", "Open things.", lambda: 2)
+
+        self.assertEqual(
+            registry.render().splitlines(),
+            [
+                "# HELP requests_total Requests.",
+                "# TYPE requests_total counter",
+                "requests_total 3",
+                "# HELP frames_total Frames.",
+                "# TYPE frames_total counter",
+                'frames_total{type="a\\"b"} 1',
+                "# HELP latency_seconds Latency.",
+                "# TYPE latency_seconds histogram",
+                'latency_seconds_bucket{le="0.1"} 2',
+                'latency_seconds_bucket{le="1"} 3',
+                'latency_seconds_bucket{le="+Inf"} 4',
+                "latency_seconds_sum 3.65",
+                "latency_seconds_count 4",
+                "# HELP open Open things.",
+                "# TYPE open gauge",
+                "open 2",
+            ],
+        )
+        with self.assertRaises(ValueError):
+            registry.counter("open", "duplicate")
+        with self.assertRaises(ValueError):
+            frames.labels("a", "b")
+
+    def test_mark_timer_observes_once_per_mark(self) -> None:
+        now = [0.0]
+        histogram = MetricsRegistry().histogram("t", "t")
+        timer = MarkTimer(histogram, clock=lambda: now[0])
+        timer.stop()
+        timer.mark()
+        now[0] = 0.2
+        timer.mark()
+        now[0] = 0.5
+        timer.stop()
+        timer.stop()
+        self.assertEqual(histogram.labels().count, 1)
+        self.assertAlmostEqual(histogram.labels().sum, 0.3)
+
+    async def test_response_latency_runs_from_the_end_of_speech(self) -> None:
+        now = [0.0]
+        speech = {"type": "websocket.receive", "bytes": struct.pack("<640h", *([8000] * 20 + [-8000] * 20) * 16)}
+        quiet = {"type": "websocket.receive", "bytes": b"\x00" * 1280}
+        timer = MarkTimer(MetricsRegistry().histogram("t", "t"), clock=lambda: now[0])
+        gate = VoiceActivityGate(VadConfig(enabled=True, hangover_ms=0, preroll_ms=0))
+        websocket = PacedWebSocket([speech, speech, quiet, quiet, quiet], now, 0.04)
+        with patch("main.UPSTREAM_AUDIO", UpstreamAudioConfig(chunk_ms=0)):
+            await process_upstream_messages(websocket, FakeLiveQueue(), vad=gate, response_timer=timer)
+
+        now[0] = 0.5
+        audio_event = {"content": {"parts": [{"inlineData": {"mimeType": "audio/pcm;rate=24000", "data": b"\x00"}}]}}
+        await process_downstream_events(FakeWebSocket([]), _events([audio_event, audio_event]), response_timer=timer)
+
+        # The gate closes on the first quiet chunk, received at 0.12s.
+        self.assertEqual(timer._histogram.labels().count, 1)
+        self.assertAlmostEqual(timer._histogram.labels().sum, 0.38)
+
+    async def test_voice_session_traffic_is_counted(self) -> None:
+        before = (await prometheus_metrics()).body.decode()
+        audio = {"type": "websocket.receive", "bytes": b"\x00" * 640}
+        text = {"type": "websocket.receive", "text": '{"type":"text","text":"hi"}'}
+        with patch("main.UPSTREAM_AUDIO", UpstreamAudioConfig(chunk_ms=0)):
+            await process_upstream_messages(FakeWebSocket([audio, audio, text]), FakeLiveQueue())
+
+        audio_event = {"content": {"parts": [{"inlineData": {"mimeType": "audio/pcm;rate=24000", "data": b"\x00"}}]}}
+        events = [audio_event, audio_event, {"toolResponse": {"status": "applied", "patch": PATCH}, "turnComplete": True}]
+        await process_downstream_events(FakeWebSocket([]), _events(events))
+        response = await prometheus_metrics()
+        after = response.body.decode()
+
+        self.assertTrue(response.media_type.startswith("text/plain; version=0.0.4"))
+        deltas = {
+            name: _sample(after, name) - _sample(before, name)
+            for name in (
+                "ego_voice_upstream_messages_total",
+                "ego_voice_upstream_bytes_total",
+                'ego_voice_downstream_events_total{type="adkEvent"}',
+                'ego_voice_downstream_events_total{type="worldPatch"}',
+                "ego_voice_world_patches_total",
+            )
+        }
+        self.assertEqual(list(deltas.values()), [3, 1280 + len(text["text"]), 3, 1, 1])
+        self.assertEqual(_sample(after, "ego_voice_sessions_active"), 0)
+
+    async def test_image_generation_latency_and_cache_metrics(self) -> None:
+        async def backend(_prompt):
+            return ("ZmFrZQ==", "image/png")
+
+        before = (await prometheus_metrics()).body.decode()
+        with patch("main._generate_image_base64", backend):
+            await generate_image(GenerateImageRequest(entity_type="metrics-wolf"))
+            await generate_image(GenerateImageRequest(entity_type="metrics-wolf"))
+        after = (await prometheus_metrics()).body.decode()
+
+        count = 'ego_image_generation_seconds_count{outcome="ok"}'
+        self.assertEqual(_sample(after, count) - _sample(before, count), 1)
+        self.assertEqual(_sample(after, "ego_image_cache_hits_total"), 1)
+        self.assertEqual(_sample(after, "ego_image_generations_in_flight"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
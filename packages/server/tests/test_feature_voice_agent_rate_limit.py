@@ -0,0 +1,229 @@
+import math
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+import main  # type: ignore  # noqa: E402
+from main import (  # type: ignore  # noqa: E402
+    SPRITE_CACHE,
+    SPRITE_FAILURES,
+    GenerateImageRequest,
+    GenerateImagesRequest,
+    app,
+    generate_image,
+    generate_images,
+    handle_voice_session,
+)
+from runtime.rate_limit import ConcurrencyLimiter, TokenBucketLimiter, client_address  # type: ignore  # noqa: E402
+
+
+class FakeLiveQueue:
+    def __init__(self) -> None:
+        self.realtime_calls = []
+        self.closed = False
+
+    async def send_realtime(self, payload):
+        self.realtime_calls.append(payload)
+
+    async def send_content(self, _content):
+        return None
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeWebSocket:
+    def __init__(self, incoming):
+        self._incoming = list(incoming)
+        self.sent_json = []
+        self.close_code = None
+        self.closed = False
+
+    async def accept(self):
+        return None
+
+    async def receive(self):
+        if self._incoming:
+            return self._incoming.pop(0)
+        return {"type": "websocket.disconnect"}
+
+    async def send_json(self, payload):
+        self.sent_json.append(payload)
+
+    async def close(self, code: int = 1000, reason: str | None = None):
+        self.closed = True
+        self.close_code = code
+
+
+class PacedWebSocket(FakeWebSocket):
+    def __init__(self, incoming, now, interval):
+        super().__init__(incoming)
+        self._now = now
+        self._interval = interval
+
+    async def receive(self):
+        self._now[0] += self._interval
+        return await super().receive()
+
+
+class FakeSessionService:
+    async def get_session(self, user_id, session_id):
+        return {"user_id": user_id, "session_id": session_id}
+
+
+class FakeRunner:
+    async def run_live(self, **_kwargs):
+        if False:
+            yield {}
+
+
+def _bucket(rate: float, burst: float, now: list[float], **kwargs) -> TokenBucketLimiter:
+    return TokenBucketLimiter(rate_per_second=rate, burst=burst, clock=lambda: now[0], **kwargs)
+
+
+async def _run_session(websocket: FakeWebSocket, queue: FakeLiveQueue) -> None:
+    await handle_voice_session(
+        websocket=websocket,
+        user_id="user-1",
+        session_id="session-1",
+        session_service=FakeSessionService(),
+        runner=FakeRunner(),
+        live_request_queue=queue,
+    )
+
+
+class TestRateLimits(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        SPRITE_CACHE.clear()
+        SPRITE_FAILURES.clear()
+
+    def test_token_bucket_refills_and_reports_wait(self) -> None:
+        now = [0.0]
+        limiter = _bucket(2.0, 3, now)
+        self.assertEqual([limiter.acquire("a") for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(limiter.acquire("a"), 0.5)
+        self.assertEqual(limiter.acquire("b"), 0.0)
+
+        now[0] += 0.5
+        self.assertEqual(limiter.acquire("a"), 0.0)
+        self.assertGreater(limiter.acquire("a"), 0.0)
+        self.assertEqual(limiter.acquire("a", tokens=10), math.inf)
+        self.assertAlmostEqual(limiter.acquire("a", tokens=3), 1.5)
+
+    def test_client_address_trusts_only_the_configured_proxy_hops(self) -> None:
+        self.assertEqual(client_address("1.2.3.4, 10.0.0.9", "10.1.1.1", 1), "10.0.0.9")
+        self.assertEqual(client_address("1.2.3.4, 10.0.0.9, 35.0.0.1", "10.1.1.1", 2), "10.0.0.9")
+        self.assertEqual(client_address("1.2.3.4", "10.1.1.1", 0), "10.1.1.1")
+        self.assertEqual(client_address(None, "10.1.1.1", 1), "10.1.1.1")
+        self.assertIsNone(client_address("", None, 1))
+
+    def test_idle_buckets_are_evicted(self) -> None:
+        now = [0.0]
+        limiter = _bucket(1.0, 5, now, idle_seconds=10, max_keys=3)
+        for key in ("a", "b", "c", "d"):
+            limiter.acquire(key)
+        self.assertEqual(len(limiter), 3)
+
+        now[0] += 11
+        limiter.acquire("e")
+        self.assertEqual(len(limiter), 1)
+
+    def test_concurrency_limiter(self) -> None:
+        limiter = ConcurrencyLimiter(max_per_key=2)
+        self.assertTrue(limiter.acquire("a"))
+        self.assertTrue(limiter.acquire("a"))
+        self.assertFalse(limiter.acquire("a"))
+        limiter.release("a")
+        limiter.release("a")
+        self.assertEqual((limiter.active("a"), len(limiter)), (0, 0))
+
+    async def test_image_endpoints_return_429_per_client_address(self) -> None:
+        async def backend(_prompt):
+            return ("ZmFrZQ==", "image/png")
+
+        limiter = _bucket(1.0, 2, [0.0])
+        with patch("main.IMAGE_RATE_LIMIT", limiter), patch("main._generate_image_base64", backend):
+            await generate_image(GenerateImageRequest(entity_type="wolf"), x_forwarded_for="10.0.0.9")
+            await generate_image(GenerateImageRequest(entity_type="wolf"), x_forwarded_for="10.0.0.2")
+            # A forged left-most hop does not give the same caller a fresh bucket.
+            await generate_image(GenerateImageRequest(entity_type="wolf"), x_forwarded_for="1.2.3.4, 10.0.0.9")
+            with self.assertRaises(HTTPException) as ctx:
+                await generate_image(GenerateImageRequest(entity_type="wolf"), x_forwarded_for="5.6.7.8, 10.0.0.9")
+            with self.assertRaises(HTTPException) as batch:
+                items = [GenerateImageRequest(entity_type=name) for name in ("a", "b")]
+                await generate_images(GenerateImagesRequest(items=items), x_forwarded_for="10.0.0.2")
+            await generate_image(GenerateImageRequest(entity_type="wolf"))
+
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertEqual(ctx.exception.headers, {"Retry-After": "1"})
+        self.assertEqual(batch.exception.status_code, 429)
+
+    async def test_direct_callers_are_limited_by_peer_address(self) -> None:
+        async def backend(_prompt):
+            return ("ZmFrZQ==", "image/png")
+
+        client = TestClient(app)
+        with patch("main.IMAGE_RATE_LIMIT", _bucket(1.0, 2, [0.0])), patch("main._generate_image_base64", backend):
+            statuses = [client.post("/api/generate-image", json={"entity_type": "wolf"}).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    async def test_batches_larger_than_the_burst_are_rejected(self) -> None:
+        limiter = _bucket(1.0, 2, [0.0])
+        with patch("main.IMAGE_RATE_LIMIT", limiter):
+            with self.assertRaises(HTTPException) as ctx:
+                items = [GenerateImageRequest(entity_type=name) for name in ("a", "b", "c")]
+                await generate_images(GenerateImagesRequest(items=items), x_forwarded_for="10.0.0.1")
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertEqual(limiter.acquire("ip:10.0.0.1", 2), 0.0)
+
+    async def test_extra_live_sessions_are_closed_with_try_again_later(self) -> None:
+        limiter = ConcurrencyLimiter(max_per_key=1)
+        self.assertTrue(limiter.acquire("user-1"))
+        websocket = FakeWebSocket([])
+        queue = FakeLiveQueue()
+        with patch("main.VOICE_SESSION_LIMIT", limiter):
+            await _run_session(websocket, queue)
+            self.assertEqual(websocket.close_code, 1013)
+            self.assertTrue(queue.closed)
+
+            limiter.release("user-1")
+            websocket = FakeWebSocket([])
+            await _run_session(websocket, FakeLiveQueue())
+        self.assertEqual(websocket.close_code, 1000)
+        self.assertEqual(limiter.active("user-1"), 0)
+
+    async def test_upstream_flood_closes_with_policy_violation(self) -> None:
+        frames = [{"type": "websocket.receive", "bytes": b"\x00\x01"} for _ in range(10)]
+        websocket = FakeWebSocket(frames)
+        queue = FakeLiveQueue()
+        with patch("main.VOICE_UPSTREAM_RATE_LIMIT", _bucket(256.0, 1024, [0.0])):
+            await _run_session(websocket, queue)
+
+        self.assertEqual(b"".join(call["data"] for call in queue.realtime_calls), b"\x00\x01" * 4)
+        self.assertEqual(websocket.close_code, 1008)
+        self.assertEqual(websocket.sent_json, [])
+
+    async def test_small_worklet_frames_stream_within_the_default_limit(self) -> None:
+        # An AudioWorklet posting every 128-sample quantum sends 125 frames/s of 256 bytes.
+        now = [0.0]
+        defaults = main.VOICE_UPSTREAM_RATE_LIMIT
+        frames = [{"type": "websocket.receive", "bytes": b"\x01\x00" * 128} for _ in range(125 * 10)]
+        websocket = PacedWebSocket(frames, now, 128 / 16000)
+        queue = FakeLiveQueue()
+        with patch("main.VOICE_UPSTREAM_RATE_LIMIT", _bucket(defaults.rate_per_second, defaults.burst, now)):
+            await _run_session(websocket, queue)
+
+        self.assertEqual(websocket.close_code, 1000)
+        self.assertEqual(sum(len(call["data"]) for call in queue.realtime_calls), 256 * 125 * 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
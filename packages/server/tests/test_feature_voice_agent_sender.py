@@ -0,0 +1,215 @@
+import asyncio
+import json
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from main import handle_voice_session, process_downstream_events  # type: ignore  # noqa: E402
+from voice.sender import (  # type: ignore  # noqa: E402
+    OVERFLOW_BLOCK,
+    OVERFLOW_DISCONNECT,
+    DownstreamSender,
+    SenderConfig,
+    SlowConsumerError,
+)
+
+PATCH = {"effect": "neon", "color": "#00FF99", "intensity": 64, "spawn": None, "caption": "ネオン"}
+
+
+def _audio_event(index: int):
+    return {"id": index, "content": {"parts": [{"inlineData": {"mimeType": "audio/pcm;rate=24000", "data": b"\x00" * 8}}]}}
+
+
+class SlowWebSocket:
+    def __init__(self) -> None:
+        self.gate = asyncio.Event()
+        self.sent = []
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        await self.gate.wait()
+        self.sent.append(data)
+
+
+class FakeRunner:
+    def __init__(self, events):
+        self.events = events
+
+    async def run_live(self, **_kwargs):
+        for event in self.events:
+            yield event
+
+
+class TestDownstreamSender(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_consumer_does_not_stall_the_event_stream(self) -> None:
+        websocket = SlowWebSocket()
+        sender = DownstreamSender(websocket, SenderConfig(max_frames=4, backlog_seconds=60))
+        events = [_audio_event(index) for index in range(10)]
+        events.append({"toolResponse": {"status": "applied", "patch": PATCH}, "turnComplete": True})
+        events += [_audio_event(index) for index in range(10, 13)]
+
+        producer = asyncio.create_task(process_downstream_events(websocket, FakeRunner(events).run_live(), sender=sender))
+        await asyncio.sleep(0.01)
+        self.assertGreater(sender.stats.audio_dropped, 0)
+        websocket.gate.set()
+        await asyncio.wait_for(producer, 1)
+        await sender.aclose()
+
+        kinds = [frame["type"] for frame in websocket.sent]
+        self.assertIn("worldPatch", kinds)
+        self.assertTrue(any(frame.get("turnComplete") for frame in websocket.sent))
+        self.assertEqual(sender.stats.frames_sent, len(websocket.sent))
+        self.assertEqual(sender.stats.frames_sent + sender.stats.audio_dropped, len(events) + 1)
+        self.assertEqual(sender.stats.depth, 0)
+
+    async def test_interruption_discards_queued_audio(self) -> None:
+        websocket = SlowWebSocket()
+        sender = DownstreamSender(websocket, SenderConfig(max_frames=64))
+        events = [_audio_event(index) for index in range(5)] + [{"interrupted": True}]
+
+        producer = asyncio.create_task(process_downstream_events(websocket, FakeRunner(events).run_live(), sender=sender))
+        await asyncio.sleep(0.01)
+        websocket.gate.set()
+        await producer
+        await sender.aclose()
+
+        self.assertEqual(sender.stats.stale_audio_dropped, 5)
+        self.assertEqual([frame["payload"] for frame in websocket.sent], [{"interrupted": True}])
+
+    async def test_sustained_backlog_raises(self) -> None:
+        now = [0.0]
+        sender = DownstreamSender(SlowWebSocket(), SenderConfig(max_frames=2, backlog_seconds=5), clock=lambda: now[0])
+        for _ in range(3):
+            await sender.put(b"audio", droppable=True)
+        now[0] = 6
+        with self.assertRaises(SlowConsumerError):
+            await sender.put(b"audio", droppable=True)
+        await sender.aclose()
+
+    async def test_undroppable_frames_stay_within_the_queue_bound(self) -> None:
+        websocket = SlowWebSocket()
+        sender = DownstreamSender(websocket, SenderConfig(max_frames=2, backlog_seconds=0.05))
+        sender.start()
+        for _ in range(3):
+            await sender.put("{}")
+        self.assertLessEqual(sender.stats.max_depth, 2)
+
+        waiting = asyncio.create_task(sender.put('{"type":"spriteReady"}'))
+        await asyncio.sleep(0.01)
+        websocket.gate.set()
+        await waiting
+        await sender.drain()
+        self.assertEqual(websocket.sent[-1], {"type": "spriteReady"})
+
+        stalled = DownstreamSender(SlowWebSocket(), SenderConfig(max_frames=2, backlog_seconds=0.02))
+        await stalled.put("{}")
+        await stalled.put("{}")
+        with self.assertRaises(SlowConsumerError):
+            await stalled.put("{}")
+        self.assertEqual(stalled.stats.depth, 2)
+
+    async def test_frames_queued_after_drain_are_still_sent(self) -> None:
+        websocket = SlowWebSocket()
+        websocket.gate.set()
+        sender = DownstreamSender(websocket, SenderConfig())
+        sender.start()
+        await sender.put("{}")
+        await sender.drain()
+
+        sender.start()
+        await sender.put('{"error":{"message":"late"}}')
+        await sender.drain()
+        await sender.aclose()
+        self.assertEqual(websocket.sent, [{}, {"error": {"message": "late"}}])
+
+    async def test_upstream_error_after_downstream_finished_reaches_the_client(self) -> None:
+        class FailingSocket(SlowWebSocket):
+            async def accept(self):
+                return None
+
+            async def receive(self):
+                await asyncio.sleep(0.01)
+                raise RuntimeError("upstream failed")
+
+            async def close(self, code: int = 1000, reason=None):
+                return None
+
+        class FakeSessionService:
+            async def get_session(self, user_id, session_id):
+                return {}
+
+        class FakeLiveQueue:
+            async def aclose(self):
+                return None
+
+        websocket = FailingSocket()
+        websocket.gate.set()
+        await handle_voice_session(
+            websocket=websocket,
+            user_id="late",
+            session_id="s1",
+            session_service=FakeSessionService(),
+            runner=FakeRunner([]),
+            live_request_queue=FakeLiveQueue(),
+        )
+        self.assertEqual(websocket.sent, [{"error": {"message": "upstream failed"}}])
+
+    async def test_block_and_disconnect_policies(self) -> None:
+        blocking = DownstreamSender(SlowWebSocket(), SenderConfig(max_frames=1, overflow=OVERFLOW_BLOCK, backlog_seconds=0.02))
+        await blocking.put("{}")
+        with self.assertRaises(SlowConsumerError):
+            await blocking.put("{}")
+
+        strict = DownstreamSender(SlowWebSocket(), SenderConfig(max_frames=1, overflow=OVERFLOW_DISCONNECT))
+        await strict.put("{}")
+        with self.assertRaises(SlowConsumerError):
+            await strict.put("{}", droppable=True)
+
+    async def test_voice_session_closes_slow_consumers_with_try_again_later(self) -> None:
+        class SessionSocket(SlowWebSocket):
+            close_code = None
+
+            async def accept(self):
+                return None
+
+            async def receive(self):
+                await asyncio.sleep(3600)
+
+            async def close(self, code: int = 1000, reason=None):
+                self.close_code = code
+
+        class FakeSessionService:
+            async def get_session(self, user_id, session_id):
+                return {}
+
+        class FakeLiveQueue:
+            async def aclose(self):
+                return None
+
+        websocket = SessionSocket()
+        events = [{"outputTranscription": {"text": "x"}}] * 5
+        with patch("main.VOICE_SENDER", SenderConfig(max_frames=2, overflow=OVERFLOW_DISCONNECT)):
+            await asyncio.wait_for(
+                handle_voice_session(
+                    websocket=websocket,
+                    user_id="slow",
+                    session_id="s1",
+                    session_service=FakeSessionService(),
+                    runner=FakeRunner(events),
+                    live_request_queue=FakeLiveQueue(),
+                ),
+                1,
+            )
+        self.assertEqual(websocket.close_code, 1013)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import gc
+import pathlib
+import sys
+import tracemalloc
+import unittest
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from main import (  # type: ignore  # noqa: E402
+    APP_NAME,
+    VOICE_CONNECTIONS,
+    VOICE_SESSION_METRICS,
+    InMemorySessionService,
+    _release_evicted_session,
+    handle_voice_session,
+)
+from runtime.rate_limit import TokenBucketLimiter  # type: ignore  # noqa: E402
+from voice.sessions import ADK_SESSIONS_AVAILABLE, BoundedSessionService, SessionStore  # type: ignore  # noqa: E402
+
+
+class FakeRunner:
+    async def run_live(self, **_kwargs):
+        if False:
+            yield {}
+
+
+class FakeLiveQueue:
+    async def aclose(self):
+        return None
+
+
+class FakeWebSocket:
+    async def accept(self):
+        return None
+
+    async def receive(self):
+        return {"type": "websocket.disconnect"}
+
+    async def close(self, code: int = 1000, reason=None):
+        return None
+
+
+def _store(now: list[float], evicted: list, **kwargs) -> SessionStore:
+    return SessionStore(clock=lambda: now[0], on_evict=lambda key, _value: evicted.append(key), **kwargs)
+
+
+class TestSessionStore(unittest.IsolatedAsyncioTestCase):
+    def test_least_recently_used_session_is_evicted(self) -> None:
+        evicted = []
+        store = _store([0.0], evicted, max_entries=2, idle_seconds=0)
+        store.put("a", 1)
+        store.put("b", 2)
+        self.assertEqual(store.get("a"), 1)
+        store.put("c", 3)
+
+        self.assertEqual(evicted, ["b"])
+        self.assertEqual((len(store), "b" in store, store.evictions), (2, False, 1))
+
+    def test_idle_sessions_expire_but_held_ones_do_not(self) -> None:
+        now, evicted = [0.0], []
+        store = _store(now, evicted, max_entries=10, idle_seconds=60)
+        for key in ("a", "b", "c"):
+            store.put(key, key)
+        self.assertTrue(store.hold("a"))
+        self.assertFalse(store.hold("missing"))
+
+        now[0] = 61
+        self.assertEqual(store.evict_idle(), 2)
+        self.assertEqual((sorted(evicted), store.get("a"), store.held), (["b", "c"], "a", 1))
+
+        store.release("a")
+        now[0] = 100
+        self.assertEqual(store.evict_idle(), 0)
+        now[0] = 122
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(len(store), 0)
+
+    async def test_evicted_sessions_are_deleted_from_the_wrapped_service(self) -> None:
+        inner = InMemorySessionService()
+        evicted = []
+        service = BoundedSessionService(
+            inner, app_name=APP_NAME, max_entries=2, on_evict=lambda user_id, session_id: evicted.append(session_id)
+        )
+        for session_id in ("s1", "s2", "s3"):
+            await service.create_session("u1", session_id)
+
+        self.assertEqual(evicted, ["s1"])
+        self.assertIsNone(await service.get_session("u1", "s1"))
+        self.assertIsNotNone(await service.get_session("u1", "s3"))
+        self.assertEqual(len(inner._sessions), 2)
+
+    async def test_eviction_drops_state_left_for_the_session(self) -> None:
+        limiter = TokenBucketLimiter(rate_per_second=1.0, burst=10)
+        for user_id in ("u1", "u2"):
+            limiter.acquire(user_id)
+        live = object()
+        service = BoundedSessionService(
+            InMemorySessionService(), app_name=APP_NAME, max_entries=2, on_evict=_release_evicted_session
+        )
+        with (
+            patch("main.VOICE_UPSTREAM_RATE_LIMIT", limiter),
+            patch.dict(VOICE_CONNECTIONS, {("u1", "stale"): object(), ("u2", "live"): live}, clear=True),
+            patch.dict(VOICE_SESSION_METRICS, {("u1", "stale"): {}, ("u2", "stale"): {}}, clear=True),
+        ):
+            for user_id, session_id in (("u1", "stale"), ("u2", "stale"), ("u2", "live"), ("u3", "new")):
+                await service.create_session(user_id, session_id)
+
+            self.assertEqual(dict(VOICE_CONNECTIONS), {("u2", "live"): live})
+            self.assertEqual(VOICE_SESSION_METRICS, {})
+        # u2 still has a connected session, so its upstream bucket survives.
+        self.assertEqual(list(limiter._buckets), ["u2"])
+
+    @unittest.skipUnless(ADK_SESSIONS_AVAILABLE, "google-adk is not installed")
+    async def test_wrapped_adk_service_is_accepted_by_invocation_context(self) -> None:
+        from google.adk.agents import LlmAgent
+        from google.adk.agents.invocation_context import InvocationContext
+        from google.adk.sessions import InMemorySessionService as AdkInMemorySessionService
+
+        service = BoundedSessionService(AdkInMemorySessionService(), app_name=APP_NAME)
+        session = await service.create_session(app_name=APP_NAME, user_id="u1", session_id="s1")
+        context = InvocationContext(
+            session_service=service,
+            invocation_id="inv-1",
+            agent=LlmAgent(name="probe", model="gemini-2.0-flash"),
+            session=session,
+        )
+
+        self.assertIs(context.session_service, service)
+        self.assertEqual(len(service), 1)
+        listed = await service.list_sessions(app_name=APP_NAME, user_id="u1")
+        self.assertEqual([listed_session.id for listed_session in listed.sessions], ["s1"])
+
+    async def test_session_churn_keeps_memory_flat(self) -> None:
+        inner = InMemorySessionService()
+        service = BoundedSessionService(inner, app_name=APP_NAME, max_entries=50)
+
+        async def churn(start: int, count: int) -> None:
+            for index in range(start, start + count):
+                await handle_voice_session(
+                    websocket=FakeWebSocket(),
+                    user_id=f"user-{index % 7}",
+                    session_id=f"session-{index}",
+                    session_service=service,
+                    runner=FakeRunner(),
+                    live_request_queue=FakeLiveQueue(),
+                )
+
+        await churn(0, 100)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            await churn(100, 600)
+            gc.collect()
+            after, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual((len(service), len(inner._sessions), service.store.held), (50, 50, 0))
+        self.assertEqual(service.store.evictions, 650)
+        # Six hundred leaked sessions would retain several hundred KiB.
+        self.assertLess(after - before, 64 * 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()
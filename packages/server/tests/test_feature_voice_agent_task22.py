@@ -1,3 +1,4 @@
+import json
 import pathlib
 import sys
 import unittest
@@ -7,8 +8,9 @@ SERVER_DIR = ROOT
 if str(SERVER_DIR) not in sys.path:
     sys.path.insert(0, str(SERVER_DIR))
 
-from main import (_normalize_event, build_run_config, handle_voice_session, health_check,  # type: ignore  # noqa: E402
+from main import (build_run_config, handle_voice_session, health_check,  # type: ignore  # noqa: E402
                   process_downstream_events, process_upstream_messages)
+from voice.events import encode_adk_event  # type: ignore  # noqa: E402
 
 
 class FakeLiveQueue:
@@ -45,6 +47,9 @@ class FakeWebSocket:
     async def send_json(self, payload):
         self.sent_json.append(payload)
 
+    async def send_text(self, text):
+        self.sent_json.append(json.loads(text))
+
     async def close(self):
         self.closed = True
 
@@ -87,7 +92,7 @@ class Task22Tests(unittest.IsolatedAsyncioTestCase):
                 ]
             }
         }
-        normalized = _normalize_event(event)
+        normalized = json.loads(encode_adk_event(event).frame)["payload"]
         encoded = normalized["content"]["parts"][0]["inlineData"]["data"]
         self.assertEqual(encoded, "AQID")
 
@@ -0,0 +1,134 @@
+import asyncio
+import pathlib
+import sys
+import unittest
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from main import process_upstream_messages  # type: ignore  # noqa: E402
+from voice.upstream import CoalescingAudioSink, PcmCoalescer, UpstreamAudioConfig  # type: ignore  # noqa: E402
+
+WORKLET_FRAME = bytes(range(256))  # 128 16-bit samples
+
+
+class FakeLiveQueue:
+    def __init__(self) -> None:
+        self.calls = []
+
+    def send_realtime(self, payload):
+        self.calls.append(("audio", payload["data"]))
+
+    def send_content(self, content):
+        self.calls.append(("text", content))
+
+
+class FakeWebSocket:
+    def __init__(self, incoming):
+        self._incoming = list(incoming)
+
+    async def receive(self):
+        if self._incoming:
+            return self._incoming.pop(0)
+        return {"type": "websocket.disconnect"}
+
+
+def _audio(data: bytes = WORKLET_FRAME):
+    return {"type": "websocket.receive", "bytes": data}
+
+
+class TestUpstreamCoalescing(unittest.IsolatedAsyncioTestCase):
+    def test_coalescer_fills_fixed_chunks_in_place(self) -> None:
+        coalescer = PcmCoalescer(UpstreamAudioConfig(chunk_ms=20).chunk_bytes)
+        buffer = coalescer._buffer
+        self.assertEqual(coalescer.chunk_bytes, 640)
+
+        chunks = []
+        for _ in range(6):
+            chunks += coalescer.push(WORKLET_FRAME)
+        self.assertEqual([len(chunk) for chunk in chunks], [640, 640])
+        self.assertEqual(b"".join(chunks) + coalescer.flush(), WORKLET_FRAME * 6)
+        self.assertIs(coalescer._buffer, buffer)
+        self.assertIsNone(coalescer.flush())
+
+    async def test_worklet_frames_become_fewer_sends(self) -> None:
+        sent = []
+
+        async def send(chunk):
+            sent.append(chunk)
+
+        sink = CoalescingAudioSink(send, UpstreamAudioConfig(chunk_ms=40, max_latency_ms=1000))
+        for _ in range(50):
+            await sink.write(WORKLET_FRAME)
+        await sink.aclose()
+
+        self.assertEqual((sink.frames_in, sink.chunks_out), (50, 10))
+        self.assertEqual(b"".join(sent), WORKLET_FRAME * 50)
+
+    async def test_large_frames_pass_through_unsplit(self) -> None:
+        sent = []
+
+        async def send(chunk):
+            sent.append(chunk)
+
+        capture_frame = bytes(range(256)) * 32  # 4096 samples, as posted by the capture processor
+        sink = CoalescingAudioSink(send, UpstreamAudioConfig(chunk_ms=40, max_latency_ms=1000))
+        await sink.write(WORKLET_FRAME)
+        for _ in range(4):
+            await sink.write(capture_frame)
+        await sink.aclose()
+
+        self.assertEqual(sent, [WORKLET_FRAME] + [capture_frame] * 4)
+        self.assertEqual(sink.chunks_out, 5)
+
+    async def test_timer_flushes_a_trailing_partial_chunk(self) -> None:
+        sent = []
+
+        async def send(chunk):
+            sent.append(chunk)
+
+        sink = CoalescingAudioSink(send, UpstreamAudioConfig(chunk_ms=100, max_latency_ms=20))
+        await sink.write(WORKLET_FRAME)
+        self.assertEqual(sent, [])
+        await asyncio.sleep(0.06)
+        self.assertEqual(sent, [WORKLET_FRAME])
+
+    async def test_failed_timer_flush_surfaces_on_the_next_write(self) -> None:
+        async def send(_chunk):
+            raise ConnectionError("live connection closed")
+
+        sink = CoalescingAudioSink(send, UpstreamAudioConfig(chunk_ms=100, max_latency_ms=20))
+        await sink.write(WORKLET_FRAME)
+        await asyncio.sleep(0.06)
+        with self.assertRaises(ConnectionError):
+            await sink.write(WORKLET_FRAME)
+        with self.assertRaises(ConnectionError):
+            await sink.flush()
+        await sink.aclose()
+
+    async def test_text_and_disconnect_flush_buffered_audio_in_order(self) -> None:
+        queue = FakeLiveQueue()
+        websocket = FakeWebSocket(
+            [
+                _audio(),
+                _audio(),
+                {"type": "websocket.receive", "text": '{"type":"text","text":"hello"}'},
+                _audio(b"\x01\x02"),
+            ]
+        )
+        with patch("main.UPSTREAM_AUDIO", UpstreamAudioConfig(chunk_ms=100, max_latency_ms=1000)):
+            await process_upstream_messages(websocket, queue)
+
+        self.assertEqual(queue.calls, [("audio", WORKLET_FRAME * 2), ("text", "hello"), ("audio", b"\x01\x02")])
+
+    async def test_coalescing_can_be_disabled(self) -> None:
+        queue = FakeLiveQueue()
+        with patch("main.UPSTREAM_AUDIO", UpstreamAudioConfig(chunk_ms=0)):
+            await process_upstream_messages(FakeWebSocket([_audio(), _audio()]), queue)
+        self.assertEqual(len(queue.calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
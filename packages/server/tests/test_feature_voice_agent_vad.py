@@ -0,0 +1,140 @@
+import math
+import pathlib
+import random
+import struct
+import sys
+import unittest
+from unittest.mock import patch
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from main import process_upstream_messages, voice_metrics  # type: ignore  # noqa: E402
+from voice import vad as vad_module  # type: ignore  # noqa: E402
+from voice.upstream import UpstreamAudioConfig  # type: ignore  # noqa: E402
+from voice.vad import VadConfig, VoiceActivityGate, frame_features  # type: ignore  # noqa: E402
+
+CHUNK_SAMPLES = 640  # 40ms at 16kHz
+
+
+def _pcm(samples) -> bytes:
+    return struct.pack(f"<{len(samples)}h", *samples)
+
+
+def tone(amplitude: float = 0.3, frequency: float = 220.0) -> bytes:
+    return _pcm([int(amplitude * 32767 * math.sin(2 * math.pi * frequency * i / 16000)) for i in range(CHUNK_SAMPLES)])
+
+
+def silence() -> bytes:
+    return _pcm([random.Random(i).randint(-20, 20) for i in range(CHUNK_SAMPLES)])
+
+
+def hiss() -> bytes:
+    rng = random.Random(7)
+    return _pcm([rng.randint(-4000, 4000) for _ in range(CHUNK_SAMPLES)])
+
+
+class FakeLiveQueue:
+    def __init__(self) -> None:
+        self.audio = []
+
+    def send_realtime(self, payload):
+        self.audio.append(payload["data"])
+
+
+class SignallingLiveQueue:
+    def __init__(self) -> None:
+        self.events = []
+
+    def send_realtime(self, _payload):
+        self.events.append("audio")
+
+    def send_activity_start(self):
+        self.events.append("start")
+
+    def send_activity_end(self):
+        self.events.append("end")
+
+
+class FakeWebSocket:
+    def __init__(self, chunks):
+        self._incoming = [{"type": "websocket.receive", "bytes": chunk} for chunk in chunks]
+
+    async def receive(self):
+        if self._incoming:
+            return self._incoming.pop(0)
+        return {"type": "websocket.disconnect"}
+
+
+class TestVoiceActivityGate(unittest.IsolatedAsyncioTestCase):
+    def test_features_with_and_without_numpy(self) -> None:
+        for numpy_enabled in {False, vad_module.NUMPY_VAD_AVAILABLE}:
+            with patch.object(vad_module, "NUMPY_VAD_AVAILABLE", numpy_enabled):
+                level, zcr = frame_features(tone())
+                self.assertAlmostEqual(level, 0.3 / math.sqrt(2), places=2)
+                self.assertAlmostEqual(zcr, 2 * 220 / 16000, places=2)
+                self.assertLess(frame_features(silence())[0], 0.002)
+                self.assertGreater(frame_features(hiss())[1], 0.45)
+
+    def test_silence_is_dropped_with_preroll_and_hangover(self) -> None:
+        gate = VoiceActivityGate(VadConfig(enabled=True, hangover_ms=80, preroll_ms=40))
+        quiet, speech = silence(), tone()
+
+        self.assertEqual(gate.process(quiet), [])
+        self.assertEqual(gate.process(quiet), [])
+        self.assertEqual(gate.process(speech), [quiet, speech])
+        self.assertTrue(gate.speaking)
+        self.assertEqual(gate.process(quiet), [quiet])
+        self.assertEqual(gate.process(quiet), [quiet])
+        self.assertFalse(gate.speaking)
+        self.assertEqual(gate.process(quiet), [])
+        self.assertEqual(gate.process(hiss()), [])
+
+        stats = gate.stats.as_dict()
+        self.assertEqual((stats["chunks_in"], stats["speech_chunks"], stats["chunks_dropped"]), (7, 1, 3))
+        self.assertEqual(stats["bytes_saved"], 3 * len(quiet))
+
+    def test_silence_can_be_thinned_instead_of_dropped(self) -> None:
+        gate = VoiceActivityGate(VadConfig(enabled=True, hangover_ms=0, preroll_ms=0, silence_keep_every=4))
+        forwarded = sum(len(gate.process(silence())) for _ in range(12))
+        self.assertEqual(forwarded, 3)
+
+    async def test_upstream_gate_forwards_only_voiced_audio(self) -> None:
+        queue = FakeLiveQueue()
+        gate = VoiceActivityGate(VadConfig(enabled=True, hangover_ms=0, preroll_ms=0))
+        chunks = [silence()] * 10 + [tone()] * 3 + [silence()] * 10
+        with patch("main.UPSTREAM_AUDIO", UpstreamAudioConfig(chunk_ms=40, max_latency_ms=1000)):
+            await process_upstream_messages(FakeWebSocket(chunks), queue, vad=gate)
+
+        self.assertEqual(len(queue.audio), 3)
+        self.assertEqual(gate.stats.bytes_saved, 20 * len(tone()))
+
+    async def test_end_of_speech_is_signalled_after_the_hangover(self) -> None:
+        queue = SignallingLiveQueue()
+        gate = VoiceActivityGate(VadConfig(enabled=True, hangover_ms=80, preroll_ms=0))
+        chunks = [silence()] * 3 + [tone()] * 2 + [silence()] * 6 + [tone()] + [silence()] * 3
+        with patch("main.UPSTREAM_AUDIO", UpstreamAudioConfig(chunk_ms=40, max_latency_ms=1000)):
+            await process_upstream_messages(FakeWebSocket(chunks), queue, vad=gate)
+
+        self.assertEqual(
+            queue.events,
+            ["start", "audio", "audio", "audio", "audio", "end", "start", "audio", "audio", "audio", "end"],
+        )
+        self.assertFalse(gate.speaking)
+
+    async def test_voice_metrics_report_totals_without_session_ids(self) -> None:
+        gates = [VoiceActivityGate(VadConfig(enabled=True)) for _ in range(2)]
+        for gate in gates:
+            gate.process(silence())
+        sessions = {("u1", "s1"): {"vad": gates[0].stats}, ("u2", "s2"): {"vad": gates[1].stats}}
+        with patch.dict("main.VOICE_SESSION_METRICS", sessions, clear=True):
+            payload = await voice_metrics()
+        self.assertEqual(payload["sessions"], 2)
+        self.assertEqual(payload["vad"]["bytes_saved"], 2 * len(silence()))
+        self.assertNotIn("u1", repr(payload))
+        self.assertNotIn("s1", repr(payload))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import pathlib
+import sys
+import unittest
+from typing import Any, Optional
+from unittest.mock import patch
+
+from pydantic import BaseModel, Field
+
+SERVER_DIR = pathlib.Path(__file__).resolve().parents[1]
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+from voice import world_patch  # type: ignore  # noqa: E402
+from voice.world_patch import extract_world_patch  # type: ignore  # noqa: E402
+
+try:
+    from google.adk.events import Event as ADK_EVENT
+except Exception:  # pragma: no cover
+    ADK_EVENT = None
+
+PATCH = {"effect": "neon", "color": "#00FF99", "intensity": 64, "spawn": None, "caption": "ネオン"}
+
+
+class FunctionResponse(BaseModel):
+    name: Optional[str] = None
+    response: Optional[dict[str, Any]] = None
+
+
+class Blob(BaseModel):
+    mime_type: Optional[str] = None
+    data: Optional[bytes] = None
+
+
+class Part(BaseModel):
+    text: Optional[str] = None
+    inline_data: Optional[Blob] = None
+    function_response: Optional[FunctionResponse] = None
+
+
+class Content(BaseModel):
+    parts: Optional[list[Part]] = None
+
+
+class EventActions(BaseModel):
+    state_delta: dict[str, Any] = Field(default_factory=dict)
+    skip_summarization: Optional[bool] = None
+
+
+class Event(BaseModel):
+    author: str
+    content: Optional[Content] = None
+    turn_complete: Optional[bool] = None
+    invocation_id: str = ""
+    id: str = ""
+    timestamp: float = 0.0
+    # Shaped like ADK's Event: actions is always populated, the rest are optional.
+    actions: EventActions = Field(default_factory=EventActions)
+    node_info: Optional[dict[str, Any]] = None
+    long_running_tool_ids: Optional[set[str]] = None
+    custom_metadata: Optional[dict[str, Any]] = None
+
+
+class TestWorldPatchExtraction(unittest.TestCase):
+    def test_function_response_on_adk_event(self) -> None:
+        response = {"status": "applied", "patch": PATCH}
+        event = Event(
+            author="ego_world_agent",
+            content=Content(parts=[Part(function_response=FunctionResponse(name="apply_world_patch", response=response))]),
+        )
+        self.assertIs(extract_world_patch(event), PATCH)
+
+    def test_function_response_in_event_dicts(self) -> None:
+        event = {"content": {"parts": [{"functionResponse": {"name": "apply_world_patch", "response": PATCH}}]}}
+        self.assertIs(extract_world_patch(event), PATCH)
+
+    def test_tool_response_shapes(self) -> None:
+        self.assertIs(extract_world_patch({"toolResponse": {"status": "applied", "patch": PATCH}}), PATCH)
+        live = {"toolResponse": {"functionResponses": [{"name": "x", "response": {}}, {"response": {"patch": PATCH}}]}}
+        self.assertIs(extract_world_patch(live), PATCH)
+
+    def test_audio_only_events_are_skipped_without_searching(self) -> None:
+        event = Event(
+            author="ego_world_agent",
+            content=Content(parts=[Part(inline_data=Blob(mime_type="audio/pcm", data=b"\x00" * 64)), Part(text="hi")]),
+            turn_complete=True,
+        )
+        self.assertIn("actions", world_patch._present_fields(event))
+        with patch.object(world_patch, "_search", side_effect=AssertionError("searched")):
+            self.assertIsNone(extract_world_patch(event))
+            self.assertIsNone(extract_world_patch({"author": "a", "outputTranscription": {"text": "こんにちは"}}))
+
+    @unittest.skipUnless(ADK_EVENT is not None, "google-adk is not installed")
+    def test_real_adk_audio_events_are_skipped_without_searching(self) -> None:
+        from google.genai import types
+
+        audio = types.Part(inline_data=types.Blob(mime_type="audio/pcm;rate=24000", data=b"\x00" * 64))
+        event = ADK_EVENT(author="ego_world_agent", invocation_id="inv", content=types.Content(parts=[audio]))
+        with patch.object(world_patch, "_search", side_effect=AssertionError("searched")):
+            self.assertIsNone(extract_world_patch(event))
+
+    def test_unknown_shapes_fall_back_to_a_bounded_search(self) -> None:
+        shallow = {"actions": [{"functionResponse": {"response": {"patch": PATCH}}}]}
+        self.assertIs(extract_world_patch(shallow), PATCH)
+
+        deep: dict[str, Any] = {"patch": PATCH}
+        for _ in range(8):
+            deep = {"nested": deep}
+        self.assertIsNone(extract_world_patch({"custom": deep}))
+        self.assertIs(extract_world_patch({"custom": deep}, max_depth=12), PATCH)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import binascii
+from dataclasses import dataclass
+from enum import Enum
+from json.encoder import encode_basestring
+from typing import Any, Iterable
+
+from pydantic import BaseModel
+
+_BINARY_TYPES = (bytes, bytearray, memoryview)
+
+
+def _audio_blob(value: Any) -> tuple[str, Any] | None:
+    if isinstance(value, dict):
+        mime_type = value.get("mimeType", value.get("mime_type"))
+        data = value.get("data")
+    else:
+        mime_type = getattr(value, "mime_type", None)
+        data = getattr(value, "data", None)
+    if isinstance(mime_type, str) and mime_type.startswith("audio/") and isinstance(data, _BINARY_TYPES):
+        return mime_type, data
+    return None
+
+
+@dataclass(frozen=True)
+class EncodedEvent:
+    frame: str
+    world_patch: str | None = None
+    turn_complete: bool | None = None
+    interrupted: bool = False
+    carries_audio: bool = False
+    # (mime type, raw bytes) for audio parts lifted out of the frame in binary audio mode.
+    audio: tuple[tuple[str, Any], ...] = ()
+
+    def world_patch_frame(self) -> str | None:
+        if self.world_patch is None:
+            return None
+        return '{"type":"worldPatch","patch":' + self.world_patch + "}"
+
+
+def _encode_float(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "Infinity" if value > 0 else "-Infinity"
+    return float.__repr__(value)
+
+
+_MODEL_FIELDS: dict[type, tuple[tuple[str, str], ...]] = {}
+
+
+def _model_fields(model_type: type) -> tuple[tuple[str, str], ...]:
+    fields = _MODEL_FIELDS.get(model_type)
+    if fields is None:
+        fields = tuple(
+            (name, info.serialization_alias or info.alias or name)
+            for name, info in model_type.model_fields.items()
+            if not info.exclude
+        )
+        _MODEL_FIELDS[model_type] = fields
+    return fields
+
+
+def _model_items(model: Any) -> Iterable[tuple[str, Any]]:
+    # Mirrors model_dump(by_alias=True, exclude_none=True) without materialising the dict.
+    values = model.__dict__
+    for name, alias in _model_fields(type(model)):
+        value = values.get(name)
+        if value is not None:
+            yield alias, value
+    extra = model.__pydantic_extra__
+    if extra:
+        for key, value in extra.items():
+            if value is not None:
+                yield key, value
+
+
+class _EventEncoder:
+    __slots__ = ("parts", "world_patch", "turn_complete", "interrupted", "carries_audio", "audio", "_patch_target")
+
+    def __init__(self, binary_audio: bool = False, world_patch: Any = None) -> None:
+        self.parts: list[str] = []
+        self.world_patch: str | None = None
+        self.turn_complete: bool | None = None
+        self.interrupted = False
+        self.carries_audio = False
+        self.audio: list[tuple[str, Any]] | None = [] if binary_audio else None
+        self._patch_target = world_patch
+
+    def value(self, value: Any) -> None:
+        append = self.parts.append
+        if value is None:
+            append("null")
+        elif value is True:
+            append("true")
+        elif value is False:
+            append("false")
+        elif isinstance(value, str):
+            append(encode_basestring(value))
+        elif isinstance(value, int):
+            append(int.__repr__(value))
+        elif isinstance(value, float):
+            append(_encode_float(value))
+        elif isinstance(value, _BINARY_TYPES):
+            # Base64 output never needs escaping, so it goes straight into the buffer.
+            append('"')
+            append(binascii.b2a_base64(value, newline=False).decode("ascii"))
+            append('"')
+        elif isinstance(value, dict):
+            self.mapping(value)
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            # pydantic's JSON mode writes sets as arrays in iteration order.
+            self.sequence(value)
+        elif isinstance(value, BaseModel):
+            self.members(_model_items(value))
+        elif isinstance(value, Enum):
+            self.value(value.value)
+        else:
+            append(encode_basestring(str(value)))
+
+    def sequence(self, values: Iterable[Any]) -> None:
+        append = self.parts.append
+        append("[")
+        first = True
+        for item in values:
+            if not first:
+                append(",")
+            first = False
+            self.value(item)
+        append("]")
+
+    def mapping(self, value: dict[Any, Any], top: bool = False) -> None:
+        # The patch is written as part of the event anyway, so its JSON is sliced out rather than re-encoded.
+        capture = value is self._patch_target and self.world_patch is None
+        start = len(self.parts)
+        self.members(value.items(), top)
+        if capture:
+            self.world_patch = "".join(self.parts[start:])
+
+    def members(self, items: Iterable[tuple[Any, Any]], top: bool = False) -> None:
+        append = self.parts.append
+        append("{")
+        first = True
+        for key, item in items:
+            key = key if isinstance(key, str) else str(key)
+            if key in ("inlineData", "inline_data"):
+                blob = _audio_blob(item)
+                if blob is not None:
+                    self.carries_audio = True
+                    if self.audio is not None:
+                        self.audio.append(blob)
+                        continue
+            if not first:
+                append(",")
+            first = False
+            append(encode_basestring(key))
+            append(":")
+            self.value(item)
+            if top:
+                if key == "turnComplete":
+                    self.turn_complete = bool(item)
+                elif key == "interrupted":
+                    self.interrupted = bool(item)
+        append("}")
+
+
+def encode_adk_event(event: Any, *, binary_audio: bool = False, world_patch: Any = None) -> EncodedEvent:
+    encoder = _EventEncoder(binary_audio, world_patch)
+    encoder.parts.append('{"type":"adkEvent","payload":')
+    if isinstance(event, dict):
+        encoder.mapping(event, top=True)
+    elif isinstance(event, BaseModel):
+        encoder.members(_model_items(event), top=True)
+    elif callable(getattr(event, "model_dump", None)):
+        dumped = event.model_dump(by_alias=True, exclude_none=True)
+        encoder.mapping(dumped if isinstance(dumped, dict) else {}, top=True)
+    else:
+        encoder.parts.append("{}")
+
+    if encoder.turn_complete is not None:
+        encoder.parts.append(',"turnComplete":true' if encoder.turn_complete else ',"turnComplete":false')
+    encoder.parts.append("}")
+    frame = "".join(encoder.parts)
+
+    if world_patch is not None and encoder.world_patch is None:
+        encoder.parts.clear()
+        encoder.value(world_patch)
+        encoder.world_patch = "".join(encoder.parts)
+    return EncodedEvent(
+        frame=frame,
+        world_patch=encoder.world_patch,
+        turn_complete=encoder.turn_complete,
+        interrupted=encoder.interrupted,
+        carries_audio=encoder.carries_audio,
+        audio=tuple(encoder.audio or ()),
+    )
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import struct
+from typing import Any
+
+# Clients that list this websocket subprotocol receive model audio as binary frames.
+AUDIO_FRAMES_SUBPROTOCOL = "ego.audio-frames.v1"
+AUDIO_FRAME_VERSION = 1
+DEFAULT_OUTPUT_SAMPLE_RATE = 24000
+
+# version, flags, header length, sequence, sample rate, turn id; network byte order.
+AUDIO_FRAME_HEADER = struct.Struct("!BBHIII")
+
+_UINT32_MASK = 0xFFFFFFFF
+
+
+def sample_rate_from_mime(mime_type: str, default: int = DEFAULT_OUTPUT_SAMPLE_RATE) -> int:
+    for parameter in mime_type.split(";")[1:]:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "rate" and value.strip().isdigit():
+            return int(value.strip())
+    return default
+
+
+def negotiated_audio_subprotocol(websocket: Any) -> str | None:
+    scope = getattr(websocket, "scope", None)
+    offered = scope.get("subprotocols", ()) if isinstance(scope, dict) else ()
+    return AUDIO_FRAMES_SUBPROTOCOL if AUDIO_FRAMES_SUBPROTOCOL in offered else None
+
+
+class AudioFrameWriter:
+    def __init__(self) -> None:
+        self.sequence = 0
+        self.turn_id = 0
+
+    def frame(self, mime_type: str, data: Any) -> bytes:
+        header = AUDIO_FRAME_HEADER.pack(
+            AUDIO_FRAME_VERSION,
+            0,
+            AUDIO_FRAME_HEADER.size,
+            self.sequence & _UINT32_MASK,
+            sample_rate_from_mime(mime_type),
+            self.turn_id & _UINT32_MASK,
+        )
+        self.sequence += 1
+        return header + data
+
+    def end_turn(self) -> None:
+        self.turn_id += 1
+
+
+def parse_audio_frame(frame: bytes) -> tuple[int, int, int, memoryview]:
+    version, _flags, header_size, sequence, sample_rate, turn_id = AUDIO_FRAME_HEADER.unpack_from(frame)
+    if version != AUDIO_FRAME_VERSION:
+        raise ValueError(f"unsupported audio frame version {version}")
+    return sequence, sample_rate, turn_id, memoryview(frame)[header_size:]
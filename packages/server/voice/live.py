@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import inspect
+from typing import Any, Callable
+
+
+class LiveRuntime:
+    # One runner and run config per process: the agent, session service and streaming settings never vary per
+    # connection, so rebuilding them on every websocket only adds setup latency and garbage.
+    def __init__(self, runner_factory: Callable[[], Any], run_config_factory: Callable[[], Any]) -> None:
+        self._runner_factory = runner_factory
+        self._run_config_factory = run_config_factory
+        self._runner: Any = None
+        self._run_config: Any = None
+        self._started = False
+        self.builds = 0
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    @property
+    def runner(self) -> Any:
+        if not self._started:
+            self.start()
+        return self._runner
+
+    @property
+    def run_config(self) -> Any:
+        if not self._started:
+            self.start()
+        return self._run_config
+
+    def start(self) -> None:
+        if self._started:
+            return
+        self._runner = self._runner_factory()
+        self._run_config = self._run_config_factory()
+        self._started = True
+        self.builds += 1
+
+    async def aclose(self) -> None:
+        runner, self._runner, self._run_config = self._runner, None, None
+        self._started = False
+        close = getattr(runner, "close", None)
+        if callable(close):
+            result = close()
+            if inspect.isawaitable(result):
+                await result
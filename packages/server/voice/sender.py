@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+from runtime.env import env_float, env_int, env_str
+
+OVERFLOW_DROP_AUDIO = "drop_audio"
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DISCONNECT = "disconnect"
+OVERFLOW_POLICIES = (OVERFLOW_DROP_AUDIO, OVERFLOW_BLOCK, OVERFLOW_DISCONNECT)
+
+
+class SlowConsumerError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class SenderConfig:
+    max_frames: int = 256
+    overflow: str = OVERFLOW_DROP_AUDIO
+    backlog_seconds: float = 5.0
+
+
+@dataclass
+class SenderStats:
+    depth: int = 0
+    max_depth: int = 0
+    frames_sent: int = 0
+    bytes_sent: int = 0
+    audio_dropped: int = 0
+    stale_audio_dropped: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class DownstreamSender:
+    def __init__(
+        self,
+        websocket: Any,
+        config: SenderConfig,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._websocket = websocket
+        self._config = config
+        self._clock = clock
+        # (payload, droppable); text payloads go out as text frames, bytes as binary frames.
+        self._queue: deque[tuple[str | bytes, bool]] = deque()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._closing = False
+        self._error: BaseException | None = None
+        self._backlog_since: float | None = None
+        self.stats = SenderStats()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        elif self._task.done() and not self._task.cancelled() and self._error is None:
+            # The writer exits once drained; frames queued afterwards (e.g. a late error) need it running again.
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, payload: str | bytes, *, droppable: bool = False) -> None:
+        self._raise_if_failed()
+        limit = max(1, self._config.max_frames)
+        if len(self._queue) >= limit:
+            if self._config.overflow == OVERFLOW_DISCONNECT:
+                raise SlowConsumerError("downstream send queue overflowed")
+            if self._config.overflow == OVERFLOW_BLOCK:
+                await self._wait_for_space(limit)
+            else:
+                self._check_backlog()
+                if not self._drop_oldest_audio():
+                    if droppable:
+                        # Only undroppable frames are queued, so the new audio is the one to lose.
+                        self.stats.audio_dropped += 1
+                        return
+                    # Neither frame can be dropped, so this one waits for room within the backlog allowance.
+                    await self._wait_for_space(limit)
+
+        self._queue.append((payload, droppable))
+        self._update_depth()
+        self._ready.set()
+
+    def discard_audio(self) -> None:
+        # Audio still queued when the model is interrupted belongs to a turn the player cut off.
+        kept = deque(frame for frame in self._queue if not frame[1])
+        self.stats.stale_audio_dropped += len(self._queue) - len(kept)
+        self._queue = kept
+        self._update_depth()
+
+    async def drain(self) -> None:
+        self._closing = True
+        self._ready.set()
+        if self._task is not None:
+            await self._task
+        self._raise_if_failed()
+
+    async def aclose(self) -> None:
+        self._closing = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _wait_for_space(self, limit: int) -> None:
+        async def space_available() -> None:
+            while len(self._queue) >= limit:
+                self._space.clear()
+                await self._space.wait()
+                self._raise_if_failed()
+
+        try:
+            await asyncio.wait_for(space_available(), timeout=self._config.backlog_seconds or None)
+        except asyncio.TimeoutError:
+            raise SlowConsumerError(
+                f"downstream backlog persisted for {self._config.backlog_seconds:g}s"
+            ) from None
+
+    def _drop_oldest_audio(self) -> bool:
+        for index, (_payload, droppable) in enumerate(self._queue):
+            if droppable:
+                del self._queue[index]
+                self.stats.audio_dropped += 1
+                return True
+        return False
+
+    def _check_backlog(self) -> None:
+        now = self._clock()
+        if self._backlog_since is None:
+            self._backlog_since = now
+        elif now - self._backlog_since >= self._config.backlog_seconds:
+            raise SlowConsumerError(f"downstream backlog persisted for {self._config.backlog_seconds:g}s")
+
+    def _update_depth(self) -> None:
+        depth = len(self._queue)
+        self.stats.depth = depth
+        if depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+        if depth < max(1, self._config.max_frames) // 2:
+            self._backlog_since = None
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    async def _run(self) -> None:
+        websocket = self._websocket
+        stats = self.stats
+        try:
+            while True:
+                while not self._queue:
+                    if self._closing:
+                        return
+                    self._ready.clear()
+                    await self._ready.wait()
+                payload, _droppable = self._queue.popleft()
+                self._update_depth()
+                self._space.set()
+                if isinstance(payload, str):
+                    await websocket.send_text(payload)
+                else:
+                    await websocket.send_bytes(payload)
+                stats.frames_sent += 1
+                stats.bytes_sent += len(payload)
+        except Exception as exc:
+            self._error = exc
+            self._space.set()
+
+
+def sender_config_from_env() -> SenderConfig:
+    overflow = (env_str("VOICE_SEND_OVERFLOW", OVERFLOW_DROP_AUDIO) or OVERFLOW_DROP_AUDIO).lower()
+    return SenderConfig(
+        max_frames=max(1, env_int("VOICE_SEND_QUEUE_MAX_FRAMES", 256)),
+        overflow=overflow if overflow in OVERFLOW_POLICIES else OVERFLOW_DROP_AUDIO,
+        backlog_seconds=max(0.0, env_float("VOICE_SEND_BACKLOG_SECONDS", 5.0)),
+    )
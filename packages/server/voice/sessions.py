@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import inspect
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from runtime.env import env_float, env_int
+
+try:
+    from google.adk.sessions import BaseSessionService
+
+    ADK_SESSIONS_AVAILABLE = True
+except Exception:  # pragma: no cover
+    BaseSessionService = object  # type: ignore[assignment,misc]
+    ADK_SESSIONS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS = 10_000
+DEFAULT_SESSION_IDLE_SECONDS = 1800.0
+
+SessionKey = tuple[str, str]
+
+
+async def call_session_api(method: Callable[..., Any], app_name: str, user_id: str, session_id: str | None) -> Any:
+    # ADK session services take keyword arguments including app_name; the local fallback is positional.
+    try:
+        result = method(app_name=app_name, user_id=user_id, session_id=session_id)
+        return await result if inspect.isawaitable(result) else result
+    except TypeError:
+        result = method(user_id, session_id)
+        return await result if inspect.isawaitable(result) else result
+
+
+class _Entry:
+    __slots__ = ("value", "touched_at")
+
+    def __init__(self, value: Any, touched_at: float) -> None:
+        self.value = value
+        self.touched_at = touched_at
+
+
+class SessionStore:
+    def __init__(
+        self,
+        *,
+        max_entries: int = DEFAULT_MAX_SESSIONS,
+        idle_seconds: float = DEFAULT_SESSION_IDLE_SECONDS,
+        on_evict: Callable[[Hashable, Any], None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.idle_seconds = max(0.0, idle_seconds)
+        self._on_evict = on_evict
+        self._clock = clock
+        # Least recently touched first, so both TTL and capacity eviction pop from the front.
+        self._idle: OrderedDict[Hashable, _Entry] = OrderedDict()
+        # Sessions with a live connection sit outside the LRU order and are never evicted.
+        self._held: dict[Hashable, tuple[_Entry, int]] = {}
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._idle) + len(self._held)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._idle or key in self._held
+
+    @property
+    def held(self) -> int:
+        return len(self._held)
+
+    def get(self, key: Hashable) -> Any:
+        now = self._clock()
+        self._evict_idle(now)
+        held = self._held.get(key)
+        if held is not None:
+            return held[0].value
+        entry = self._idle.get(key)
+        if entry is None:
+            return None
+        entry.touched_at = now
+        self._idle.move_to_end(key)
+        return entry.value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        now = self._clock()
+        self._evict_idle(now)
+        held = self._held.get(key)
+        if held is not None:
+            held[0].value = value
+            return
+        entry = self._idle.get(key)
+        if entry is None:
+            self._idle[key] = _Entry(value, now)
+            if len(self._idle) > self.max_entries:
+                self._evict(*self._idle.popitem(last=False))
+        else:
+            entry.value, entry.touched_at = value, now
+            self._idle.move_to_end(key)
+
+    def pop(self, key: Hashable) -> Any:
+        held = self._held.pop(key, None)
+        if held is not None:
+            return held[0].value
+        entry = self._idle.pop(key, None)
+        return entry.value if entry is not None else None
+
+    def hold(self, key: Hashable) -> bool:
+        held = self._held.get(key)
+        if held is not None:
+            self._held[key] = (held[0], held[1] + 1)
+            return True
+        entry = self._idle.pop(key, None)
+        if entry is None:
+            return False
+        self._held[key] = (entry, 1)
+        return True
+
+    def release(self, key: Hashable) -> None:
+        held = self._held.get(key)
+        if held is None:
+            return
+        entry, count = held
+        if count > 1:
+            self._held[key] = (entry, count - 1)
+            return
+        del self._held[key]
+        entry.touched_at = self._clock()
+        self._idle[key] = entry
+        if len(self._idle) > self.max_entries:
+            self._evict(*self._idle.popitem(last=False))
+
+    def evict_idle(self) -> int:
+        before = self.evictions
+        self._evict_idle(self._clock())
+        return self.evictions - before
+
+    def _evict_idle(self, now: float) -> None:
+        if self.idle_seconds <= 0:
+            return
+        while self._idle:
+            key, entry = next(iter(self._idle.items()))
+            if now - entry.touched_at < self.idle_seconds:
+                break
+            del self._idle[key]
+            self._evict(key, entry)
+
+    def _evict(self, key: Hashable, entry: _Entry) -> None:
+        self.evictions += 1
+        if self._on_evict is not None:
+            try:
+                self._on_evict(key, entry.value)
+            except Exception:
+                logger.warning("session eviction callback failed for %s", key, exc_info=True)
+
+
+class BoundedSessionService(BaseSessionService):
+    # Wraps an ADK (or local fallback) session service so that the sessions it holds are bounded. Evicted
+    # sessions are deleted from the wrapped service on the next session call; everything else is delegated.
+    # It subclasses ADK's BaseSessionService because InvocationContext validates the service with isinstance.
+    def __init__(
+        self,
+        inner: Any,
+        *,
+        app_name: str,
+        max_entries: int = DEFAULT_MAX_SESSIONS,
+        idle_seconds: float = DEFAULT_SESSION_IDLE_SECONDS,
+        on_evict: Callable[[str, str], None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.inner = inner
+        self.app_name = app_name
+        self._on_evict = on_evict
+        self._pending_deletes: list[SessionKey] = []
+        self.store = SessionStore(
+            max_entries=max_entries, idle_seconds=idle_seconds, on_evict=self._evicted, clock=clock
+        )
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    async def get_session(self, *args: Any, **kwargs: Any) -> Any:
+        user_id, session_id = _session_key(args, kwargs)
+        session = await self._call(self.inner.get_session, *args, **kwargs)
+        if session is not None and session_id is not None:
+            self.store.put((user_id, session_id), True)
+        await self._flush_deletes()
+        return session
+
+    async def create_session(self, *args: Any, **kwargs: Any) -> Any:
+        user_id, session_id = _session_key(args, kwargs)
+        session = await self._call(self.inner.create_session, *args, **kwargs)
+        session_id = session_id or getattr(session, "id", None)
+        if session_id is not None:
+            self.store.put((user_id, session_id), True)
+        await self._flush_deletes()
+        return session
+
+    async def delete_session(self, *args: Any, **kwargs: Any) -> Any:
+        self.store.pop(_session_key(args, kwargs))
+        return await self._call(self.inner.delete_session, *args, **kwargs)
+
+    async def list_sessions(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._call(self.inner.list_sessions, *args, **kwargs)
+
+    # BaseSessionService implements these itself, so __getattr__ never sees them and they are forwarded explicitly.
+    async def append_event(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._call(self.inner.append_event, *args, **kwargs)
+
+    async def get_user_state(self, *args: Any, **kwargs: Any) -> Any:
+        return await self._call(self.inner.get_user_state, *args, **kwargs)
+
+    async def flush(self) -> None:
+        flush = getattr(self.inner, "flush", None)
+        if flush is not None:
+            await self._call(flush)
+
+    def hold_session(self, user_id: str, session_id: str) -> bool:
+        return self.store.hold((user_id, session_id))
+
+    def release_session(self, user_id: str, session_id: str) -> None:
+        self.store.release((user_id, session_id))
+
+    async def _call(self, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        result = method(*args, **kwargs)
+        return await result if inspect.isawaitable(result) else result
+
+    def _evicted(self, key: Hashable, _value: Any) -> None:
+        user_id, session_id = key  # type: ignore[misc]
+        self._pending_deletes.append((user_id, session_id))
+        if self._on_evict is not None:
+            self._on_evict(user_id, session_id)
+
+    async def _flush_deletes(self) -> None:
+        delete = getattr(self.inner, "delete_session", None)
+        while self._pending_deletes:
+            user_id, session_id = self._pending_deletes.pop()
+            if delete is None:
+                continue
+            try:
+                await call_session_api(delete, self.app_name, user_id, session_id)
+            except Exception:
+                logger.warning("failed to delete evicted session %s/%s", user_id, session_id, exc_info=True)
+
+
+def _session_key(args: tuple[Any, ...], kwargs: dict[str, Any]) -> SessionKey:
+    if "user_id" in kwargs:
+        return kwargs["user_id"], kwargs.get("session_id")
+    return args[0], args[1] if len(args) > 1 else None
+
+
+def bounded_session_service_from_env(
+    inner: Any, *, app_name: str, on_evict: Callable[[str, str], None] | None = None
+) -> BoundedSessionService:
+    return BoundedSessionService(
+        inner,
+        app_name=app_name,
+        max_entries=env_int("VOICE_SESSION_MAX_ENTRIES", DEFAULT_MAX_SESSIONS),
+        idle_seconds=env_float("VOICE_SESSION_IDLE_SECONDS", DEFAULT_SESSION_IDLE_SECONDS),
+        on_evict=on_evict,
+    )
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from runtime.env import env_int
+
+INPUT_SAMPLE_RATE = 16000
+INPUT_SAMPLE_WIDTH = 2
+MIN_CHUNK_MS = 20
+MAX_CHUNK_MS = 100
+
+
+@dataclass(frozen=True)
+class UpstreamAudioConfig:
+    chunk_ms: int = 40
+    max_latency_ms: int = 60
+    sample_rate: int = INPUT_SAMPLE_RATE
+
+    @property
+    def enabled(self) -> bool:
+        return self.chunk_ms > 0
+
+    @property
+    def chunk_bytes(self) -> int:
+        return self.sample_rate * INPUT_SAMPLE_WIDTH * self.chunk_ms // 1000 // INPUT_SAMPLE_WIDTH * INPUT_SAMPLE_WIDTH
+
+
+class PcmCoalescer:
+    def __init__(self, chunk_bytes: int) -> None:
+        self.chunk_bytes = max(INPUT_SAMPLE_WIDTH, chunk_bytes)
+        # Allocated once per session; chunks are copied out as immutable bytes when full.
+        self._buffer = bytearray(self.chunk_bytes)
+        self._view = memoryview(self._buffer)
+        self._length = 0
+
+    @property
+    def pending(self) -> int:
+        return self._length
+
+    def push(self, data: bytes | bytearray | memoryview) -> list[bytes]:
+        chunks: list[bytes] = []
+        source = memoryview(data)
+        if len(source) >= self.chunk_bytes:
+            # Frames that are already large (e.g. 8 KB ScriptProcessor buffers) go out as they are; only the
+            # audio buffered ahead of them is flushed so the order is kept.
+            pending = self.flush()
+            if pending is not None:
+                chunks.append(pending)
+            chunks.append(bytes(source))
+            return chunks
+        offset = 0
+        remaining = len(source)
+        while remaining:
+            take = min(self.chunk_bytes - self._length, remaining)
+            self._view[self._length:self._length + take] = source[offset:offset + take]
+            self._length += take
+            offset += take
+            remaining -= take
+            if self._length == self.chunk_bytes:
+                chunks.append(bytes(self._buffer))
+                self._length = 0
+        return chunks
+
+    def flush(self) -> bytes | None:
+        if not self._length:
+            return None
+        chunk = bytes(self._view[:self._length])
+        self._length = 0
+        return chunk
+
+
+class CoalescingAudioSink:
+    def __init__(self, send: Callable[[bytes], Awaitable[Any]], config: UpstreamAudioConfig) -> None:
+        self._send = send
+        self._config = config
+        self._coalescer = PcmCoalescer(config.chunk_bytes) if config.enabled else None
+        # Held while taking data out of the buffer and sending it, so timer flushes keep chunk order.
+        self._lock = asyncio.Lock()
+        self._timer: asyncio.TimerHandle | None = None
+        self._flush_task: asyncio.Task[None] | None = None
+        # A failed timer flush is raised from the next write() or flush(), like an inline send failure.
+        self._error: BaseException | None = None
+        self.frames_in = 0
+        self.chunks_out = 0
+
+    async def write(self, data: bytes | bytearray | memoryview) -> None:
+        self._raise_if_failed()
+        self.frames_in += 1
+        if self._coalescer is None:
+            await self._emit(bytes(data))
+            return
+        async with self._lock:
+            had_pending = self._coalescer.pending > 0
+            chunks = self._coalescer.push(data)
+            for chunk in chunks:
+                await self._emit(chunk)
+            if self._coalescer.pending == 0:
+                self._cancel_timer()
+            elif chunks or not had_pending:
+                self._arm_timer()
+
+    async def flush(self) -> None:
+        self._raise_if_failed()
+        if self._coalescer is None:
+            return
+        async with self._lock:
+            self._cancel_timer()
+            chunk = self._coalescer.flush()
+            if chunk is not None:
+                await self._emit(chunk)
+
+    async def aclose(self) -> None:
+        if self._error is None:
+            await self.flush()
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+
+    async def _emit(self, chunk: bytes) -> None:
+        self.chunks_out += 1
+        await self._send(chunk)
+
+    def _arm_timer(self) -> None:
+        self._cancel_timer()
+        delay = self._config.max_latency_ms / 1000
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._flush_task = asyncio.ensure_future(self.flush())
+        self._flush_task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: asyncio.Task[None]) -> None:
+        if not task.cancelled() and task.exception() is not None and self._error is None:
+            self._error = task.exception()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+
+def upstream_audio_config_from_env() -> UpstreamAudioConfig:
+    chunk_ms = env_int("UPSTREAM_AUDIO_CHUNK_MS", 40)
+    if chunk_ms > 0:
+        chunk_ms = min(MAX_CHUNK_MS, max(MIN_CHUNK_MS, chunk_ms))
+    return UpstreamAudioConfig(
+        chunk_ms=chunk_ms,
+        max_latency_ms=max(MIN_CHUNK_MS, env_int("UPSTREAM_AUDIO_MAX_LATENCY_MS", 60)),
+    )
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import math
+import sys
+from array import array
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from runtime.env import env_bool, env_float, env_int
+from voice.upstream import INPUT_SAMPLE_RATE, INPUT_SAMPLE_WIDTH
+
+try:
+    import numpy as np
+
+    NUMPY_VAD_AVAILABLE = True
+except Exception:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+    NUMPY_VAD_AVAILABLE = False
+
+# Adaptive threshold: speech must stand this far above the tracked background level.
+NOISE_FLOOR_RATIO = 3.0
+NOISE_FLOOR_SMOOTHING = 0.05
+
+
+@dataclass(frozen=True)
+class VadConfig:
+    enabled: bool = False
+    energy_threshold: float = 0.01
+    max_zero_crossing_rate: float = 0.45
+    hangover_ms: int = 300
+    preroll_ms: int = 100
+    # 0 drops every silent chunk; n forwards one in n so the model still hears some room tone.
+    silence_keep_every: int = 0
+    sample_rate: int = INPUT_SAMPLE_RATE
+
+
+@dataclass
+class VadStats:
+    bytes_in: int = 0
+    bytes_forwarded: int = 0
+    chunks_in: int = 0
+    chunks_dropped: int = 0
+    speech_chunks: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_in - self.bytes_forwarded
+
+    def as_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "bytes_saved": self.bytes_saved}
+
+
+def frame_features(chunk: bytes) -> tuple[float, float]:
+    # Returns (RMS level in full-scale units, zero-crossing rate) for little-endian 16-bit PCM.
+    usable = len(chunk) - len(chunk) % INPUT_SAMPLE_WIDTH
+    count = usable // INPUT_SAMPLE_WIDTH
+    if count < 2:
+        return 0.0, 0.0
+
+    if NUMPY_VAD_AVAILABLE:
+        samples = np.frombuffer(chunk, dtype="<i2", count=count)
+        level = float(np.sqrt(np.mean(np.square(samples, dtype=np.float32)))) / 32768.0
+        signs = np.signbit(samples)
+        crossings = int(np.count_nonzero(signs[1:] != signs[:-1]))
+        return level, crossings / (count - 1)
+
+    samples = array("h")
+    samples.frombytes(chunk[:usable])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    level = math.sqrt(sum(sample * sample for sample in samples) / count) / 32768.0
+    crossings = sum(1 for previous, current in zip(samples, samples[1:]) if (previous < 0) != (current < 0))
+    return level, crossings / (count - 1)
+
+
+class VoiceActivityGate:
+    def __init__(self, config: VadConfig) -> None:
+        self._config = config
+        self._bytes_per_ms = config.sample_rate * INPUT_SAMPLE_WIDTH / 1000
+        self._hangover_ms = 0.0
+        self._noise_floor = 0.0
+        self._silent_run = 0
+        self._preroll: deque[bytes] = deque()
+        self._preroll_bytes = 0
+        # True from the first voiced chunk until the hangover runs out; callers turn the edges into activity signals.
+        self.speaking = False
+        self.stats = VadStats()
+
+    def is_speech(self, chunk: bytes) -> bool:
+        level, zero_crossing_rate = frame_features(chunk)
+        threshold = max(self._config.energy_threshold, self._noise_floor * NOISE_FLOOR_RATIO)
+        speech = level >= threshold and zero_crossing_rate <= self._config.max_zero_crossing_rate
+        if not speech:
+            self._noise_floor += (level - self._noise_floor) * NOISE_FLOOR_SMOOTHING
+        return speech
+
+    def process(self, chunk: bytes) -> list[bytes]:
+        stats = self.stats
+        stats.chunks_in += 1
+        stats.bytes_in += len(chunk)
+        duration_ms = len(chunk) / self._bytes_per_ms
+
+        if self.is_speech(chunk):
+            stats.speech_chunks += 1
+            self.speaking = True
+            self._hangover_ms = self._config.hangover_ms
+            self._silent_run = 0
+            # Release the buffered lead-in so the onset of the utterance is not clipped.
+            forwarded = [*self._preroll, chunk]
+            stats.chunks_dropped -= len(self._preroll)
+            self._preroll.clear()
+            self._preroll_bytes = 0
+            return self._forward(forwarded)
+
+        if self._hangover_ms > 0:
+            self._hangover_ms -= duration_ms
+            self.speaking = self._hangover_ms > 0
+            return self._forward([chunk])
+
+        self.speaking = False
+        self._silent_run += 1
+        keep_every = self._config.silence_keep_every
+        if keep_every > 0 and self._silent_run % keep_every == 0:
+            return self._forward([chunk])
+
+        self._remember(chunk)
+        stats.chunks_dropped += 1
+        return []
+
+    def _remember(self, chunk: bytes) -> None:
+        limit = self._config.preroll_ms * self._bytes_per_ms
+        if limit <= 0:
+            return
+        self._preroll.append(chunk)
+        self._preroll_bytes += len(chunk)
+        while self._preroll_bytes > limit and len(self._preroll) > 1:
+            self._preroll_bytes -= len(self._preroll.popleft())
+
+    def _forward(self, chunks: list[bytes]) -> list[bytes]:
+        for chunk in chunks:
+            self.stats.bytes_forwarded += len(chunk)
+        return chunks
+
+
+def vad_config_from_env() -> VadConfig:
+    return VadConfig(
+        enabled=env_bool("VOICE_VAD", False),
+        energy_threshold=max(0.0, env_float("VOICE_VAD_ENERGY_THRESHOLD", 0.01)),
+        max_zero_crossing_rate=env_float("VOICE_VAD_MAX_ZERO_CROSSING_RATE", 0.45),
+        hangover_ms=max(0, env_int("VOICE_VAD_HANGOVER_MS", 300)),
+        preroll_ms=max(0, env_int("VOICE_VAD_PREROLL_MS", 100)),
+        silence_keep_every=max(0, env_int("VOICE_VAD_SILENCE_KEEP_EVERY", 0)),
+    )
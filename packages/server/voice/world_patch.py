@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from typing import Any
+
+from pydantic import BaseModel
+
+WORLD_PATCH_KEYS = ("effect", "color", "intensity", "spawn", "caption")
+WORLD_PATCH_TOOL = "apply_world_patch"
+DEFAULT_SEARCH_DEPTH = 6
+
+# Top-level event fields that never carry a tool response; an event made only of these
+# (plus text or audio parts) is skipped without searching.
+_PLAIN_EVENT_FIELDS = frozenset(
+    {
+        "longRunningToolIds",
+        "long_running_tool_ids",
+        "id",
+        "author",
+        "branch",
+        "timestamp",
+        "invocationId",
+        "invocation_id",
+        "partial",
+        "turnComplete",
+        "turn_complete",
+        "interrupted",
+        "inputTranscription",
+        "input_transcription",
+        "outputTranscription",
+        "output_transcription",
+        "usageMetadata",
+        "usage_metadata",
+        "errorCode",
+        "error_code",
+        "errorMessage",
+        "error_message",
+        "finishReason",
+        "finish_reason",
+        "modelVersion",
+        "model_version",
+        "groundingMetadata",
+        "grounding_metadata",
+        "liveSessionResumptionUpdate",
+        "live_session_resumption_update",
+    }
+)
+# ADK sets these as objects on every event (actions is always a default EventActions); other shapes, such as a
+# list of function responses under actions, are still searched.
+_PLAIN_OBJECT_FIELDS = frozenset({"actions", "nodeInfo", "node_info", "customMetadata", "custom_metadata"})
+_PLAIN_PART_FIELDS = frozenset(
+    {
+        "text",
+        "inlineData",
+        "inline_data",
+        "thought",
+        "thoughtSignature",
+        "thought_signature",
+        "fileData",
+        "file_data",
+        "functionCall",
+        "function_call",
+    }
+)
+_OPAQUE_FIELDS = frozenset({"inlineData", "inline_data", "data"})
+
+
+def is_world_patch(candidate: Any) -> bool:
+    if not isinstance(candidate, dict):
+        return False
+    return all(key in candidate for key in WORLD_PATCH_KEYS)
+
+
+def _field(value: Any, camel: str, snake: str) -> Any:
+    if isinstance(value, dict):
+        found = value.get(camel)
+        return found if found is not None else value.get(snake)
+    return getattr(value, snake, None)
+
+
+def _present_fields(value: Any) -> list[str]:
+    if isinstance(value, dict):
+        return [key for key in value if isinstance(key, str)]
+    if isinstance(value, BaseModel):
+        names = [name for name in type(value).model_fields if getattr(value, name, None) is not None]
+        return names + list(value.__pydantic_extra__ or ())
+    return []
+
+
+def _patch_in(response: Any) -> dict[str, Any] | None:
+    if is_world_patch(response):
+        return response
+    if isinstance(response, dict) and is_world_patch(response.get("patch")):
+        return response["patch"]
+    return None
+
+
+def _parts(event: Any) -> list[Any]:
+    content = _field(event, "content", "content")
+    parts = _field(content, "parts", "parts") if content is not None else None
+    return parts if isinstance(parts, list) else []
+
+
+def _from_function_responses(responses: Any) -> dict[str, Any] | None:
+    if not isinstance(responses, list):
+        return None
+    for function_response in responses:
+        patch = _patch_in(_field(function_response, "response", "response"))
+        if patch is not None:
+            return patch
+    return None
+
+
+def _from_known_paths(event: Any, parts: list[Any]) -> dict[str, Any] | None:
+    # ADK surfaces the tool result as content.parts[].functionResponse; raw Live API
+    # messages carry it in toolResponse, either directly or as functionResponses.
+    for part in parts:
+        function_response = _field(part, "functionResponse", "function_response")
+        if function_response is not None:
+            patch = _patch_in(_field(function_response, "response", "response"))
+            if patch is not None:
+                return patch
+
+    tool_response = _field(event, "toolResponse", "tool_response")
+    if tool_response is not None:
+        patch = _patch_in(tool_response)
+        if patch is not None:
+            return patch
+        return _from_function_responses(_field(tool_response, "functionResponses", "function_responses"))
+    return None
+
+
+def _is_plain_event(event: Any, parts: list[Any]) -> bool:
+    for name in _present_fields(event):
+        if name == "content" or name in _PLAIN_EVENT_FIELDS:
+            continue
+        if name in _PLAIN_OBJECT_FIELDS and isinstance(_field(event, name, name), (dict, BaseModel)):
+            continue
+        return False
+    for part in parts:
+        for name in _present_fields(part):
+            if name not in _PLAIN_PART_FIELDS:
+                return False
+    return True
+
+
+def _search(candidate: Any, depth: int) -> dict[str, Any] | None:
+    if isinstance(candidate, dict):
+        patch = _patch_in(candidate)
+        if patch is not None or depth <= 0:
+            return patch
+        for key, value in candidate.items():
+            if key not in _OPAQUE_FIELDS and isinstance(value, (dict, list, BaseModel)):
+                found = _search(value, depth - 1)
+                if found is not None:
+                    return found
+        return None
+
+    if depth <= 0:
+        return None
+    if isinstance(candidate, list):
+        for item in candidate:
+            if isinstance(item, (dict, list, BaseModel)):
+                found = _search(item, depth - 1)
+                if found is not None:
+                    return found
+    elif isinstance(candidate, BaseModel):
+        for name in type(candidate).model_fields:
+            value = getattr(candidate, name, None)
+            if name not in _OPAQUE_FIELDS and isinstance(value, (dict, list, BaseModel)):
+                found = _search(value, depth - 1)
+                if found is not None:
+                    return found
+    return None
+
+
+def extract_world_patch(event: Any, max_depth: int = DEFAULT_SEARCH_DEPTH) -> dict[str, Any] | None:
+    parts = _parts(event)
+    patch = _from_known_paths(event, parts)
+    if patch is not None or _is_plain_event(event, parts):
+        return patch
+    return _search(event, max_depth)